@@ -1,45 +1,58 @@
 import os
 import csv
-from src.txt_extractor import TxtExtractor
+import argparse
+from src.txt_extractor import TxtExtractor, extract_many_parallel, BATCH_SIZE
 
-def main():
-    base_dir = "data/TXT"
-    output_file = os.path.join(base_dir, "extracted_dividends.csv")
-    extractor = TxtExtractor()
-    
-    results = []
-    
-    print(f"Scanning directory: {base_dir}")
-    
+FIELDS = ["company_name", "filename", "year", "amount", "net_profit", "operating_cash_flow", "unit", "raw_context"]
+
+def iter_txt_files(base_dir):
     for root, dirs, files in os.walk(base_dir):
         for file in files:
             if file.endswith(".txt") and "extracted_dividends" not in file:
-                file_path = os.path.join(root, file)
-                print(f"Processing {file}...")
-                
-                try:
-                    data = extractor.extract_from_file(file_path)
-                    if data and data['dividends']:
-                        for div in data['dividends']:
-                            results.append({
-                                "company_name": data['company_name'],
-                                "filename": data['filename'],
-                                "year": div['year'],
-                                "amount": div['amount_text'],
-                                "unit": div['unit'],
-                                "raw_context": div['raw_text']
-                            })
-                except Exception as e:
-                    print(f"Failed to process {file}: {e}")
-
-    # Save to CSV
-    if results:
-        keys = results[0].keys()
-        with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.DictWriter(f, fieldnames=keys)
-            writer.writeheader()
-            writer.writerows(results)
-        print(f"Extraction complete. Results saved to {output_file}")
+                yield os.path.join(root, file)
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract dividends / net profit / operating cash flow from TXT prospectuses to CSV")
+    parser.add_argument('--txt-dir', default="data/TXT")
+    parser.add_argument('--workers', type=int, default=0, help="Process pool size (0: extract in this process)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    base_dir = args.txt_dir
+    output_file = os.path.join(base_dir, "extracted_dividends.csv")
+    print(f"Scanning directory: {base_dir}")
+
+    files = iter_txt_files(base_dir)
+    if args.workers > 0:
+        stream = extract_many_parallel(files, max_workers=args.workers, batch_size=args.batch_size)
+    else:
+        stream = TxtExtractor().extract_many(files)
+
+    # Rows are written as each file finishes; nothing is collected in memory
+    rows = 0
+    with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for file_path, data, elapsed in stream:
+            if data is None:
+                print(f"Failed to process {os.path.basename(file_path)}")
+                continue
+            print(f"Processed {data['filename']} in {elapsed:.2f}s ({len(data['dividends'])} records)")
+            for div in data['dividends']:
+                writer.writerow({
+                    "company_name": data['company_name'],
+                    "filename": data['filename'],
+                    "year": div['year'],
+                    "amount": div.get('amount_text', ''),
+                    "net_profit": div.get('net_profit', ''),
+                    "operating_cash_flow": div.get('operating_cash_flow', ''),
+                    "unit": div.get('unit', '万元'),
+                    "raw_context": div.get('raw_text', '')
+                })
+                rows += 1
+
+    if rows:
+        print(f"Extraction complete. {rows} records saved to {output_file}")
     else:
         print("No dividend information found.")
 
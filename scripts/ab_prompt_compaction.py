@@ -0,0 +1,98 @@
+import os
+import sys
+import csv
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import DATA_DIR
+from src.txt_extractor import TxtExtractor
+
+FIELDS = ('amount_text', 'net_profit', 'operating_cash_flow')
+
+def load_golden(path):
+    """{filename: {(year, field): value}} from a CSV with columns filename, year, field, value (万元)."""
+    golden = {}
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            if row['field'] not in FIELDS:
+                raise ValueError(f"unknown field in golden set: {row['field']}")
+            golden.setdefault(row['filename'], {})[(str(row['year']).strip(), row['field'])] = row['value']
+    return golden
+
+def matches(expected, got, tolerance):
+    try:
+        e = float(expected)
+        g = float(str(got).replace(',', ''))
+    except (TypeError, ValueError):
+        return False
+    return abs(g - e) <= tolerance * max(abs(e), 1.0)
+
+def run_variant(files, golden, api_key, compact, force_ai, tolerance):
+    """Extracts every golden file with prompt compaction on or off; field-level hits and AI usage."""
+    extractor = TxtExtractor()
+    extractor.compact_prompts = compact
+    hits = {}  # (filename, year, field) -> bool
+    cost = 0.0
+    for path in files:
+        name = os.path.basename(path)
+        data = extractor.extract_from_file(path, api_key=api_key, cost_limit=float('inf'), force_ai=force_ai)
+        records = {str(r.get('year')): r for r in (data or {}).get('dividends', [])}
+        for (year, field), value in golden[name].items():
+            hits[(name, year, field)] = matches(value, records.get(year, {}).get(field), tolerance)
+        cost += (data or {}).get('cost', 0.0)
+    # Answers served from the AI cache on a rerun count at their original cost
+    cost += extractor.ai_cache_stats["saved_cost"]
+    return hits, cost, dict(extractor.compaction_stats)
+
+def main():
+    parser = argparse.ArgumentParser(description="A/B of AI prompt compaction: field-level accuracy on a golden set, tokens and cost")
+    parser.add_argument('--txt-dir', default=os.path.join(DATA_DIR, 'TXT'))
+    parser.add_argument('--golden', default=os.path.join(DATA_DIR, 'golden', 'txt_fields.csv'),
+                        help="CSV: filename, year, field (amount_text/net_profit/operating_cash_flow), value in 万元")
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--force-ai', action='store_true', help="Send every keyword chunk to AI, not only regex misses")
+    parser.add_argument('--tolerance', type=float, default=0.01, help="Relative tolerance of a value match")
+    args = parser.parse_args()
+
+    api_key = os.environ.get("DEEPSEEK_API_KEY")
+    if not api_key:
+        sys.exit("DEEPSEEK_API_KEY is not set")
+    golden = load_golden(args.golden)
+    files = []
+    for root, _, names in os.walk(args.txt_dir):
+        files.extend(os.path.join(root, n) for n in names if n in golden)
+    files = sorted(files)[:args.limit]
+    golden = {os.path.basename(p): golden[os.path.basename(p)] for p in files}
+    print(f"{len(files)} golden files, {sum(len(v) for v in golden.values())} fields")
+
+    results = {}
+    print(f"{'Variant':<10} | {'Correct':>9} | {'Accuracy':>8} | {'AI chunks':>9} | {'Chunk tokens':>12} | {'Sent tokens':>11} | {'Cost (¥)':>9}")
+    print("-" * 85)
+    for label, compact in (("full", False), ("compact", True)):
+        hits, cost, compaction = run_variant(files, golden, api_key, compact, args.force_ai, args.tolerance)
+        results[label] = hits
+        correct = sum(hits.values())
+        print(f"{label:<10} | {correct:>4}/{len(hits):<4} | {correct / max(1, len(hits)):>8.1%} | {compaction['chunks']:>9} | "
+              f"{compaction['raw_tokens']:>12} | {compaction['sent_tokens']:>11} | {cost:>9.4f}")
+
+    for field in FIELDS:
+        row = [f"{field:<20}"]
+        for label, hits in results.items():
+            got = [ok for (_, _, f), ok in hits.items() if f == field]
+            row.append(f"{label} {sum(got)}/{len(got)}")
+        print("  ".join(row))
+
+    lost = sorted(k for k, ok in results["full"].items() if ok and not results["compact"][k])
+    gained = sorted(k for k, ok in results["compact"].items() if ok and not results["full"][k])
+    for name, year, field in lost:
+        print(f"LOST   {name} {year} {field}")
+    for name, year, field in gained:
+        print(f"GAINED {name} {year} {field}")
+    if len(lost) > len(gained):
+        print("Compaction loses fields on the golden set")
+        sys.exit(1)
+    print("Field-level accuracy holds with compaction")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import DATA_DIR
+from src import ai_cache
+from src.ai_budget import open_budget_run, get_budget_ledger
+from src.ai_dispatcher import AiDispatcher, DEFAULT_AI_CONCURRENCY, DEFAULT_AI_RATE_LIMIT
+from src.mock_llm_server import MockLlmServer
+from src.txt_extractor import TxtExtractor, ai_usage_cost
+
+def bench(args):
+    files = []
+    for root, _, names in os.walk(args.txt_dir):
+        files.extend(os.path.join(root, n) for n in names if n.lower().endswith('.txt') and 'extracted_dividends' not in n)
+    files = sorted(files)[:args.limit]
+
+    mock = MockLlmServer(port=0, latency=args.latency / 1000, jitter=args.jitter / 1000, error_rate=args.error_rate,
+                         malformed_rate=args.malformed_rate, replay=args.replay, seed=args.seed).start()
+    if not args.keep_cache:
+        # Scratch AI cache: every run pays for (and waits on) every chunk again
+        ai_cache.AI_CACHE_DB = os.path.join(tempfile.mkdtemp(prefix='bench_ai_'), 'ai_responses.sqlite')
+    budget_run = open_budget_run(args.cost_limit)
+    dispatcher = AiDispatcher('mock-key', concurrency=args.concurrency, rate_limit=args.rate_limit, url=mock.url,
+                              pack_tokens=args.pack_tokens, budget_run=budget_run)
+    extractor = TxtExtractor()
+
+    # Same shape as TxtProcessManager: CPU extraction defers AI chunks to the dispatcher
+    start = time.perf_counter()
+    futures, chunks, records, cost = [], 0, 0, 0.0
+    try:
+        for path, data, _ in extractor.extract_many(files, api_key='mock-key', cost_limit=args.cost_limit, defer_ai=True):
+            if data and data["ai_jobs"]:
+                chunks += len(data["ai_jobs"])
+                futures.append(dispatcher.submit(data["ai_jobs"]))
+        extract_done = time.perf_counter() - start
+        for future in futures:
+            ai_records, ai_cost, _, _ = future.result()
+            records += sum(1 for r in ai_records if r.get('is_ai'))
+            cost += ai_cost
+        elapsed = time.perf_counter() - start
+    finally:
+        dispatcher.close()
+        mock.stop()
+
+    stats, server, client = dispatcher.stats, mock.stats, dispatcher.client.stats
+    # Cost the server's usage numbers imply; the pipeline's accounting must agree
+    expected = ai_usage_cost(server)
+    ledger = get_budget_ledger(budget_run).snapshot()
+    print(f"{len(files)} files, {chunks} AI chunks, extraction {extract_done:.2f}s, total {elapsed:.2f}s "
+          f"({len(files) / elapsed if elapsed else 0:.1f} files/s, {chunks / elapsed if elapsed else 0:.1f} chunks/s)")
+    print(f"Requests: {stats['requests']} sent, {server['requests']} received, {server['errors']} injected errors, "
+          f"{server['malformed']} malformed, {stats['errors']} errors seen, {stats['skipped_budget']} chunks skipped for budget")
+    print(f"Client: {client['attempts']} attempts, {client['retries']} retries, {client['failures']} given up, "
+          f"{client['deadline_exceeded']} past deadline, {client['breaker_trips']} breaker trips, "
+          f"{client['skipped_breaker']} chunks skipped by the breaker")
+    print(f"AI records: {records}; replayed {server['replayed']}, synthetic {server['synthetic']}")
+    if server["prompt_tokens"]:
+        print(f"Prompt tokens: {server['prompt_tokens']}, context-cache hits {server['prompt_cache_hit_tokens']} "
+              f"({server['prompt_cache_hit_tokens'] / server['prompt_tokens']:.0%})")
+    print(f"Cost: pipeline ¥{cost:.6f}, ledger ¥{ledger['spent']:.6f}, from server usage ¥{expected:.6f} "
+          f"({'match' if abs(cost - expected) < 1e-9 and abs(ledger['spent'] - expected) < 1e-9 else 'MISMATCH'})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of the TXT AI path against the local mock LLM server")
+    parser.add_argument('--txt-dir', default=os.path.join(DATA_DIR, 'TXT'))
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=300, help="Mock latency in ms")
+    parser.add_argument('--jitter', type=float, default=100, help="Mock latency standard deviation in ms")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--malformed-rate', type=float, default=0.0)
+    parser.add_argument('--replay', help="JSONL recorded with src/mock_llm_server.py --record")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_AI_CONCURRENCY)
+    parser.add_argument('--rate-limit', type=float, default=DEFAULT_AI_RATE_LIMIT)
+    parser.add_argument('--pack-tokens', type=int, default=0)
+    parser.add_argument('--cost-limit', type=float, default=10.0)
+    parser.add_argument('--keep-cache', action='store_true', help="Use the real AI cache instead of a scratch one")
+    args = parser.parse_args()
+    bench(args)
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.getLogger("pdfminer").setLevel(logging.WARNING)
+
+from src.config import PDF_DIR
+from src.extractor import ProspectusExtractor
+
+def run(pdf_path, early_exit):
+    extractor = ProspectusExtractor(use_corpus=False, early_exit=early_exit)
+    start = time.time()
+    items = extractor.extract(pdf_path)
+    elapsed = time.time() - start
+    values = {str(i['year']): round(i['amount'], 2) for i in items if 'amount' in i and i.get('year')}
+    return values, extractor.last_stats, elapsed
+
+def bench(pdf_dir, limit):
+    files = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf'))[:limit]
+    print(f"{'File':<30} | {'Scan':>4} | {'Skip':>4} | {'Full(s)':>7} | {'Early(s)':>8} | Same result")
+    print("-" * 80)
+    scanned, skipped, exits, same, compared = 0, 0, 0, 0, 0
+    for f in files:
+        path = os.path.join(pdf_dir, f)
+        try:
+            full_values, _, full_t = run(path, False)
+            early_values, stats, early_t = run(path, True)
+        except Exception as e:
+            print(f"{f[:30]:<30} | ERROR: {e}")
+            continue
+        match = full_values == early_values
+        compared += 1
+        same += match
+        scanned += stats.get('scan_pages', 0)
+        skipped += stats.get('scan_pages_skipped', 0)
+        exits += bool(stats.get('early_exit'))
+        print(f"{f[:30]:<30} | {stats.get('scan_pages', 0):>4} | {stats.get('scan_pages_skipped', 0):>4} | {full_t:>7.2f} | {early_t:>8.2f} | {match}")
+        if not match:
+            print(f"    full:  {full_values}")
+            print(f"    early: {early_values}")
+    print("-" * 80)
+    if compared:
+        print(f"Early exit on {exits}/{compared} files; scan pages skipped {skipped}/{scanned}; "
+              f"results identical to full mode on {same}/{compared} files ({same / compared:.0%})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan pages skipped by the early-exit policy and agreement with full mode")
+    parser.add_argument('--pdf-dir', default=PDF_DIR)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+    bench(args.pdf_dir, args.limit)
@@ -0,0 +1,85 @@
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.extraction_rules import get_rules
+from src.txt_extractor import TxtExtractor
+
+# The unbounded patterns FinancialMatcher replaced
+AMOUNT_NUM = r"(-?\d{1,4}(?:,\d{3})*(?:\.\d+)?)"
+AMOUNT_UNIT = r"(?:万?元|亿元|亿)"
+LEGACY_PATTERNS = [
+    re.compile(f"((?:合计|共计|总额|总计|派发现金|现金分红)[^0-9\n]{{0,50}}?{AMOUNT_NUM}\\s*({AMOUNT_UNIT}))"),
+    re.compile(f"(归.*?净利润)[^0-9\n]{{0,30}}?{AMOUNT_NUM}\\s*({AMOUNT_UNIT})"),
+    re.compile(f"(经营.*?现金流量净额)[^0-9\n]{{0,30}}?{AMOUNT_NUM}\\s*({AMOUNT_UNIT})"),
+]
+
+# Adversarial inputs: (name, generator of a text of about n characters)
+CASES = [
+    ('归 without 净利润', lambda n: '2021年' + '归' * n),
+    ('经营 without 净额', lambda n: '2021年' + '经营现金流量' * (n // 6)),
+    ('label + long gap', lambda n: '2021年' + ('归属于母公司净利润' + '甲' * 25) * (n // 34)),
+    ('digits without unit', lambda n: '2021年现金分红' + '1,000' * (n // 5)),
+    ('amount + spaces', lambda n: '2021年' + ('归母净利润1' + ' ' * 40 + '元x') * (n // 49)),
+    ('value lists', lambda n: '2021年、2020年归母净利润分别为' + '1,000万元、' * (n // 8)),
+]
+TOKENS = ['归', '属于', '母公司', '净利润', '经营', '现金流量净额', '现金分红', '合计', '派发现金', '每10股',
+          '2021年', '2020年度', '1,000', '2.5', '-3', '万元', '亿元', '元', '、', '，', '和', ' ', '\n', '甲乙']
+
+def timed(fn, text, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return best
+
+def legacy(text):
+    for p in LEGACY_PATTERNS:
+        p.findall(text)
+
+def bench(sizes, fuzz_docs, seed):
+    extractor = TxtExtractor()
+    matcher = get_rules().txt_financial_matcher
+    current = lambda text: matcher.match(text, extractor._normalize_amount)
+
+    print(f"{'Case':<22} | {'Chars':>7} | {'Legacy(ms)':>10} | {'Matcher(ms)':>11} | {'Matcher us/KB':>13}")
+    print("-" * 75)
+    for name, gen in CASES:
+        per_kb = []
+        for n in sizes:
+            text = gen(n)
+            t_old = timed(legacy, text, repeat=1)
+            t_new = timed(current, text)
+            per_kb.append(t_new * 1e6 / (len(text) / 1024))
+            print(f"{name:<22} | {len(text):>7} | {t_old * 1000:>10.2f} | {t_new * 1000:>11.3f} | {per_kb[-1]:>13.1f}")
+        # Linear cost: time per KB stays flat as the input grows
+        print(f"{'':<22}   growth of matcher cost per KB from smallest to largest input: {per_kb[-1] / per_kb[0]:.2f}x")
+
+    rng = random.Random(seed)
+    worst, worst_len, total_chars, total_t = 0.0, 0, 0, 0.0
+    for _ in range(fuzz_docs):
+        text = ''.join(rng.choice(TOKENS) for _ in range(rng.randint(100, 3000)))
+        t = timed(current, text, repeat=1)
+        total_chars += len(text)
+        total_t += t
+        if t > worst:
+            worst, worst_len = t, len(text)
+    print("-" * 75)
+    if fuzz_docs:
+        print(f"Random fuzz: {fuzz_docs} token-soup chunks, {total_chars / 1024 / 1024 / total_t:.1f} MB/s overall, "
+              f"slowest chunk {worst * 1000:.2f} ms ({worst_len} chars)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Adversarial/fuzz timing of FinancialMatcher vs the unbounded legacy patterns")
+    parser.add_argument('--sizes', default='1000,4000,16000,64000', help="Comma-separated input sizes (chars)")
+    parser.add_argument('--fuzz-docs', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    bench([int(s) for s in args.sizes.split(',')], args.fuzz_docs, args.seed)
@@ -0,0 +1,108 @@
+import os
+import re
+import sys
+import time
+import random
+import logging
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.getLogger("pdfminer").setLevel(logging.WARNING)
+
+from src.config import PDF_DIR
+from src.extractor import ProspectusExtractor
+
+def legacy_score(ex, text):
+    """Page score as computed before the keyword scanner (one substring search per keyword)."""
+    score = 0
+    if '现金分红' in text:
+        score += 15
+    for kw in ex.keywords:
+        if kw in text:
+            score += 5
+    if score == 0:
+        return 0
+    if ex.year_pattern.search(text):
+        score += 10
+    else:
+        score -= 5
+    for cw in ex.context_positive:
+        if cw in text:
+            score += 5
+    for nw in ex.context_negative:
+        if nw in text:
+            score -= 15
+    for line in text.split('\n'):
+        line = line.strip()
+        if any(kw in line for kw in ex.keywords):
+            if len(line) < 60 and (
+                line.startswith('十') or
+                line.startswith('九') or
+                line.startswith('八') or
+                line.startswith('七') or
+                line.startswith('（') or
+                line[0].isdigit() or
+                re.match(r'^[一二三四五六七八九十]、', line)
+            ):
+                score += 30
+            if '......' in line:
+                score -= 50
+            if '政策' in line or '规划' in line or '原则' in line:
+                score -= 5
+    return score
+
+def load_pages(pdf_dir, limit):
+    from src.text_corpus import read_pages
+    pages = []
+    files = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf'))[:limit]
+    for f in files:
+        try:
+            pages.extend(t for t in read_pages(os.path.join(pdf_dir, f)).values() if t)
+        except Exception as e:
+            print(f"{f}: ERROR {e}")
+    return pages
+
+def synthetic_pages(count, seed=0):
+    rng = random.Random(seed)
+    filler = "公司主营业务收入稳定增长，主要产品市场占有率保持行业前列，研发投入持续增加。"
+    snippets = [
+        "十、股利分配情况", "报告期内，公司现金分红金额为 3,000.00 万元。", "2021 年度利润分配方案",
+        "公司章程规定的分配政策", "详见本招股说明书之风险因素", "经股东大会审议通过，派发现金股利",
+        "未来三年分红回报规划", "利润分配............................................ 235",
+    ]
+    pages = []
+    for _ in range(count):
+        lines = [filler * rng.randint(1, 3) for _ in range(40)]
+        for _ in range(rng.choice([0, 0, 0, 1, 3, 8])):
+            lines[rng.randrange(len(lines))] = rng.choice(snippets)
+        pages.append('\n'.join(lines))
+    return pages
+
+def timed(func, ex, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scores = [func(ex, p) for p in pages]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return scores, best
+
+def bench(pages, repeat):
+    ex = ProspectusExtractor(use_corpus=False)
+    legacy, legacy_t = timed(legacy_score, ex, pages, repeat)
+    scanner, scanner_t = timed(lambda e, p: e._score_page_text(p), ex, pages, repeat)
+    mismatches = sum(1 for a, b in zip(legacy, scanner) if a != b)
+    print(f"Pages: {len(pages)}")
+    print(f"legacy  (substring per keyword): {legacy_t * 1e6 / len(pages):8.1f} us/page")
+    print(f"scanner (single keyword pass):   {scanner_t * 1e6 / len(pages):8.1f} us/page")
+    print(f"Score mismatches: {mismatches}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-page scoring cost: per-keyword substring search vs single-pass keyword scanner")
+    parser.add_argument('--pdf-dir', default=None, help="score real pages from this directory (default: synthetic pages)")
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--synthetic', type=int, default=2000, help="number of synthetic pages")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    pages = load_pages(args.pdf_dir, args.limit) if args.pdf_dir else synthetic_pages(args.synthetic)
+    bench(pages, args.repeat)
@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.getLogger("pdfminer").setLevel(logging.WARNING)
+
+import pdfplumber
+from src.config import PDF_DIR
+from src.extractor import ProspectusExtractor, PageTextCache
+
+def run_locator(pdf_path, mode):
+    extractor = ProspectusExtractor(use_corpus=False, locator_mode=mode)
+    start = time.time()
+    with pdfplumber.open(pdf_path) as pdf, PageTextCache(pdf, os.path.basename(pdf_path)) as page_text:
+        pages = extractor._locate_target_pages(page_text)
+    return pages, page_text.stats['pages_touched'], page_text.stats['pages'], time.time() - start
+
+def bench(pdf_dir, limit):
+    files = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf'))[:limit]
+    print(f"{'File':<30} | {'Pages':>5} | {'Full':>5} | {'TOC':>5} | {'Full(s)':>7} | {'TOC(s)':>6} | Top page match")
+    print("-" * 90)
+    total_full, total_toc = 0, 0
+    for f in files:
+        path = os.path.join(pdf_dir, f)
+        try:
+            full_pages, full_touched, n_pages, full_t = run_locator(path, 'full')
+            toc_pages, toc_touched, _, toc_t = run_locator(path, 'toc')
+        except Exception as e:
+            print(f"{f[:30]:<30} | ERROR: {e}")
+            continue
+        total_full += full_touched
+        total_toc += toc_touched
+        same_top = bool(full_pages and toc_pages and full_pages[0] == toc_pages[0])
+        print(f"{f[:30]:<30} | {n_pages:>5} | {full_touched:>5} | {toc_touched:>5} | {full_t:>7.2f} | {toc_t:>6.2f} | {same_top}")
+    print("-" * 90)
+    print(f"Pages touched (sum): full={total_full}, toc={total_toc}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pages touched per document by _locate_target_pages: full scan vs outline/TOC jump")
+    parser.add_argument('--pdf-dir', default=PDF_DIR)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+    bench(args.pdf_dir, args.limit)
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.getLogger("pdfminer").setLevel(logging.WARNING)
+
+from src.config import PDF_DIR
+
+def run(pdf_path, locator_mode, rss_budget_mb, memory_bounded):
+    """Runs in a fresh process so each measurement starts from the same baseline."""
+    logging.disable(logging.WARNING)
+    from src.extractor import ProspectusExtractor
+    extractor = ProspectusExtractor(use_corpus=False, locator_mode=locator_mode,
+                                    memory_bounded=memory_bounded, rss_budget_mb=rss_budget_mb)
+    start = time.time()
+    items = extractor.extract(pdf_path)
+    values = sorted((str(i.get('year')), round(i.get('amount') or 0, 2)) for i in items)
+    stats = extractor.last_stats
+    return values, stats.get('rss_start_mb'), stats.get('peak_rss_mb'), stats.get('memory_releases'), time.time() - start
+
+def measure(pdf_path, locator_mode, rss_budget_mb=None, memory_bounded=False):
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(run, pdf_path, locator_mode, rss_budget_mb, memory_bounded).result()
+
+def bench(pdf_dir, limit, locator_mode, rss_budget_mb):
+    files = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf'))[:limit]
+    print(f"{'File':<30} | {'Mode':<10} | {'Start MB':>8} | {'Peak MB':>7} | {'Releases':>8} | {'Time(s)':>7} | Same result")
+    print("-" * 95)
+    for f in files:
+        path = os.path.join(pdf_dir, f)
+        baseline = None
+        for label, budget, bounded in [('default', None, False), ('bounded', None, True), ('budget', rss_budget_mb, True)]:
+            try:
+                values, start_mb, peak_mb, releases, elapsed = measure(path, locator_mode, budget, bounded)
+            except Exception as e:
+                print(f"{f[:30]:<30} | {label:<10} | ERROR: {e}")
+                continue
+            if baseline is None:
+                baseline = values
+            print(f"{f[:30]:<30} | {label:<10} | {start_mb or 0:>8.0f} | {peak_mb or 0:>7.0f} | {releases:>8} | {elapsed:>7.2f} | {values == baseline}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak RSS per document: default vs memory-bounded extraction (with and without an RSS budget)")
+    parser.add_argument('--pdf-dir', default=PDF_DIR)
+    parser.add_argument('--limit', type=int, default=5)
+    parser.add_argument('--locator-mode', default='full', choices=['full', 'toc'], help="'full' touches every page (worst case)")
+    parser.add_argument('--rss-budget-mb', type=int, default=300)
+    args = parser.parse_args()
+    bench(args.pdf_dir, args.limit, args.locator_mode, args.rss_budget_mb)
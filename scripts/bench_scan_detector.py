@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.getLogger("pdfminer").setLevel(logging.WARNING)
+
+import pdfplumber
+from src.config import PDF_DIR
+from src.scan_detector import classify_document
+
+def legacy_probe(pdf):
+    """Text probing as extract() did it: first 20 pages for any text, then 10 pages from page 5."""
+    total = len(pdf.pages)
+    has_text = any(pdf.pages[i].extract_text() for i in range(min(20, total)))
+    sample = list(range(5, min(15, max(total - 2, int(total * 0.99)))))
+    empty = sum(1 for i in sample if not pdf.pages[i].extract_text())
+    looks_scanned = bool(sample) and empty / len(sample) > 0.8
+    if not has_text:
+        return 'scanned'
+    return 'scanned' if looks_scanned else 'text'
+
+def bench(pdf_dir, limit):
+    files = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf'))[:limit]
+    print(f"{'File':<30} | {'Pages':>5} | {'Label':>7} | {'Text':>4} | {'Image':>5} | {'Probe(ms)':>9} | {'Legacy':>7} | {'Legacy(ms)':>10}")
+    print("-" * 100)
+    total_probe, total_legacy = 0.0, 0.0
+    for f in files:
+        path = os.path.join(pdf_dir, f)
+        try:
+            with pdfplumber.open(path) as pdf:
+                n_pages = len(pdf.pages)
+                info = classify_document(pdf)
+            with pdfplumber.open(path) as pdf:
+                len(pdf.pages)
+                start = time.perf_counter()
+                legacy = legacy_probe(pdf)
+                legacy_ms = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            print(f"{f[:30]:<30} | ERROR: {e}")
+            continue
+        total_probe += info['elapsed_ms']
+        total_legacy += legacy_ms
+        print(f"{f[:30]:<30} | {n_pages:>5} | {info['label']:>7} | {info['text_pages']:>4} | {info['image_pages']:>5} | {info['elapsed_ms']:>9.1f} | {legacy:>7} | {legacy_ms:>10.1f}")
+    print("-" * 100)
+    print(f"Total: structural probe {total_probe:.1f} ms, text probing {total_legacy:.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Structural text/mixed/scanned classification vs extract_text() probing")
+    parser.add_argument('--pdf-dir', default=PDF_DIR)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+    bench(args.pdf_dir, args.limit)
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.getLogger("pdfminer").setLevel(logging.WARNING)
+
+import pdfplumber
+from src.config import PDF_DIR
+from src.extractor import ProspectusExtractor, PageTextCache
+
+def table_rows(extractor, pdf_path, pages=None):
+    """Rows recovered by _process_tables on the extractor's scan pages (or the given pages), and table time."""
+    rows, elapsed, skipped = set(), 0.0, 0
+    with pdfplumber.open(pdf_path) as pdf, PageTextCache(pdf, os.path.basename(pdf_path)) as page_text:
+        if pages is None:
+            targets = extractor._locate_target_pages(page_text) or []
+            pages = sorted({p + o for p in targets for o in range(3) if p + o < len(pdf.pages)})
+        for page_num in pages:
+            text = page_text.text(page_num)
+            start = time.perf_counter()
+            tables = extractor._extract_page_tables(pdf.pages[page_num], text)
+            elapsed += time.perf_counter() - start
+            if tables is None:
+                skipped += 1
+                continue
+            for item in extractor._process_tables(tables, page_num, text):
+                rows.add((item['page'], item['year'], round(item['amount'], 2)))
+    return rows, elapsed, skipped, pages
+
+def bench(pdf_dir, limit):
+    files = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf'))[:limit]
+    full = ProspectusExtractor(use_corpus=False, table_mode='full')
+    region = ProspectusExtractor(use_corpus=False, table_mode='region')
+    print(f"{'File':<30} | {'Pages':>5} | {'Skip':>4} | {'Full(s)':>7} | {'Region(s)':>9} | {'Rows F/R':>8} | Lost | Gained")
+    print("-" * 95)
+    total_full, total_region, total_lost, total_gained = 0.0, 0.0, 0, 0
+    for f in files:
+        path = os.path.join(pdf_dir, f)
+        try:
+            full_rows, full_t, _, pages = table_rows(full, path)
+            region_rows, region_t, skipped, _ = table_rows(region, path, pages)
+        except Exception as e:
+            print(f"{f[:30]:<30} | ERROR: {e}")
+            continue
+        lost, gained = len(full_rows - region_rows), len(region_rows - full_rows)
+        total_full += full_t
+        total_region += region_t
+        total_lost += lost
+        total_gained += gained
+        print(f"{f[:30]:<30} | {len(pages):>5} | {skipped:>4} | {full_t:>7.3f} | {region_t:>9.3f} | {len(full_rows):>3}/{len(region_rows):<4} | {lost:>4} | {gained:>6}")
+    print("-" * 95)
+    print(f"Table time: full={total_full:.3f}s, region={total_region:.3f}s; rows lost={total_lost}, gained={total_gained}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Table extraction on scan pages: whole page vs keyword regions with adaptive strategy")
+    parser.add_argument('--pdf-dir', default=PDF_DIR)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+    bench(args.pdf_dir, args.limit)
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+logging.getLogger("pdfminer").setLevel(logging.WARNING)
+
+import pdfplumber
+from src.config import PDF_DIR
+from src.extractor import ProspectusExtractor, PageTextCache
+from src.text_backends import TEXT_BACKENDS, HAS_PDFIUM, open_text_backend, open_locator_backend
+
+def pages_per_sec(pdf_path, backend, max_pages):
+    reader = open_text_backend(backend, pdf_path)
+    try:
+        pages = min(len(reader), max_pages) if max_pages else len(reader)
+        start = time.perf_counter()
+        chars = sum(len(reader.page_text(n)) for n in range(pages))
+        elapsed = time.perf_counter() - start
+    finally:
+        reader.close()
+    return pages, chars, pages / elapsed if elapsed else 0.0
+
+def locator_hits(pdf_path, backend):
+    """Full-scan page scores (the locator's view of the document) under one backend."""
+    extractor = ProspectusExtractor(use_corpus=False, locator_mode='full', text_backend=backend)
+    with pdfplumber.open(pdf_path) as pdf, PageTextCache(pdf, os.path.basename(pdf_path), text_backend=open_locator_backend(backend, pdf_path)) as page_text:
+        start_page, end_page = extractor._scan_range(len(page_text))
+        scores = extractor._score_pages(page_text, range(start_page, end_page), False, end_page)
+    return {n: s for n, s in scores.items() if s > 0}
+
+def extraction(pdf_path, backend):
+    extractor = ProspectusExtractor(use_corpus=False, text_backend=backend)
+    start = time.time()
+    items = extractor.extract(pdf_path)
+    values = sorted((str(i.get('year')), round(i.get('amount') or 0, 2)) for i in items)
+    return values, time.time() - start
+
+def bench(pdf_dir, limit, max_pages):
+    backends = [b for b in TEXT_BACKENDS if b != 'pdfium' or HAS_PDFIUM]
+    files = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf'))[:limit]
+    header = " | ".join(f"{b + ' p/s':>14}" for b in backends)
+    print(f"{'File':<30} | {'Pages':>5} | {header} | {'Same hits':>9} | {'Same result':>11} | Extract(s)")
+    print("-" * 110)
+    totals = {b: [0, 0.0] for b in backends}
+    same_hits, same_results, compared = 0, 0, 0
+    for f in files:
+        path = os.path.join(pdf_dir, f)
+        try:
+            speed, hits, results, times = {}, {}, {}, {}
+            for b in backends:
+                pages, _, speed[b] = pages_per_sec(path, b, max_pages)
+                totals[b][0] += pages
+                totals[b][1] += pages / speed[b] if speed[b] else 0.0
+                hits[b] = locator_hits(path, b)
+                results[b], times[b] = extraction(path, b)
+        except Exception as e:
+            print(f"{f[:30]:<30} | ERROR: {e}")
+            continue
+        compared += 1
+        hit_match = all(hits[b] == hits[backends[0]] for b in backends)
+        result_match = all(results[b] == results[backends[0]] for b in backends)
+        same_hits += hit_match
+        same_results += result_match
+        cols = " | ".join(f"{speed[b]:>14.0f}" for b in backends)
+        print(f"{f[:30]:<30} | {pages:>5} | {cols} | {str(hit_match):>9} | {str(result_match):>11} | "
+              + " / ".join(f"{times[b]:.2f}" for b in backends))
+        if not hit_match:
+            for b in backends:
+                print(f"    {b}: {sorted(hits[b].items(), key=lambda x: -x[1])[:5]}")
+    print("-" * 110)
+    if compared:
+        rates = ", ".join(f"{b} {totals[b][0] / totals[b][1]:.0f} pages/s" for b in backends if totals[b][1])
+        print(f"Text throughput: {rates}")
+        print(f"Locator hits identical on {same_hits}/{compared} files, extraction results identical on {same_results}/{compared} files")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pages/sec and locator/result parity of the text backends")
+    parser.add_argument('--pdf-dir', default=PDF_DIR)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--max-pages', type=int, default=0, help="Pages timed per file (0 = all)")
+    args = parser.parse_args()
+    bench(args.pdf_dir, args.limit, args.max_pages)
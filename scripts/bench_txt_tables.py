@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import DATA_DIR
+from src.txt_extractor import TxtExtractor
+from src.txt_ingest import read_text
+
+def bench(txt_dir, limit):
+    extractor = TxtExtractor()
+    files = []
+    for root, _, names in os.walk(txt_dir):
+        files.extend(os.path.join(root, n) for n in names if n.lower().endswith('.txt') and 'extracted_dividends' not in n)
+    files = sorted(files)[:limit]
+    print(f"{'File':<30} | {'Tables':>6} | {'Years':>5} | {'Chunks':>6} | {'AI before':>9} | {'AI after':>8} | {'Table MB/s':>10}")
+    print("-" * 95)
+    totals = [0, 0, 0, 0]
+    table_t, total_mb = 0.0, 0.0
+    for path in files:
+        content = read_text(path)
+        mb = len(content.encode('utf-8')) / 1024 / 1024
+        start = time.perf_counter()
+        tables = extractor._find_tables(content)
+        t = time.perf_counter() - start
+        chunks = list(extractor.rules.txt_chunk_scanner.spans(content))
+        # Chunks that would go to AI: regex found nothing and (after) no table covers them
+        before = [(s, e) for s, e in chunks if not extractor._extract_financials_with_regex(content[s:e])]
+        after = [(s, e) for s, e in before if not any(ts < e and s < te for ts, te, _ in tables)]
+        years = {r['year'] for _, _, records in tables for r in records}
+        for i, v in enumerate((len(tables), len(chunks), len(before), len(after))):
+            totals[i] += v
+        table_t += t
+        total_mb += mb
+        print(f"{os.path.basename(path)[:30]:<30} | {len(tables):>6} | {len(years):>5} | {len(chunks):>6} | "
+              f"{len(before):>9} | {len(after):>8} | {mb / t if t else 0:>10.1f}")
+    print("-" * 95)
+    if files:
+        print(f"{len(files)} files: {totals[0]} tables, {totals[1]} chunks, AI candidates {totals[2]} -> {totals[3]}, "
+              f"table detection {total_mb / table_t if table_t else 0:.1f} MB/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-year table reconstruction on the TXT corpus: tables found and AI fallbacks avoided")
+    parser.add_argument('--txt-dir', default=os.path.join(DATA_DIR, 'TXT'))
+    parser.add_argument('--limit', type=int, default=200)
+    args = parser.parse_args()
+    bench(args.txt_dir, args.limit)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the tesseract binary, for exercising the OCR pipeline without Tesseract:
+
+    export TESSERACT_CMD=/path/to/scripts/tesseract_stub.py   (then run the extraction as usual)
+
+Accepts the same command line as src/ocr_service.run_tesseract (image on stdin, text on stdout).
+TESSERACT_STUB_TEXT  text to print (default: a short dividend paragraph)
+TESSERACT_STUB_LOG   file that gets one line per call, to count tesseract runs
+TESSERACT_STUB_DELAY seconds to sleep per call, to simulate a slow OCR
+TESSERACT_STUB_FAIL  if set, exit with status 1
+"""
+import os
+import sys
+import time
+import hashlib
+
+DEFAULT_TEXT = (
+    "十、股利分配情况\n"
+    "报告期内，公司现金分红情况如下：\n"
+    "2021年度，公司派发现金红利3,000.00万元（含税）。\n"
+    "2020年度，公司派发现金红利2,500.00万元（含税）。\n"
+)
+
+def main():
+    image = sys.stdin.buffer.read()
+    if os.environ.get('TESSERACT_STUB_FAIL'):
+        sys.stderr.write("stub: simulated failure\n")
+        return 1
+    delay = float(os.environ.get('TESSERACT_STUB_DELAY') or 0)
+    if delay:
+        time.sleep(delay)
+    log_path = os.environ.get('TESSERACT_STUB_LOG')
+    if log_path:
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(f"{os.getpid()} {hashlib.sha1(image).hexdigest()} {' '.join(sys.argv[1:])}\n")
+    sys.stdout.buffer.write(os.environ.get('TESSERACT_STUB_TEXT', DEFAULT_TEXT).encode('utf-8'))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import time
+import uuid
+import logging
+import threading
+
+from src.text_corpus import CACHE_DIR, connect_db
+
+logger = logging.getLogger(__name__)
+
+AI_BUDGET_DB = os.path.join(CACHE_DIR, 'ai_budget.sqlite')
+
+
+class AiBudgetLedger:
+    """
+    AI spend ledger of one run, shared by every process and thread taking part in it.
+    A caller reserves the estimated cost of a request before sending it and settles the
+    reservation with the actual cost afterwards; a reservation that would take spent +
+    reserved over the limit is refused, so concurrent workers cannot overshoot the
+    budget by more than the estimation error.
+    """
+    def __init__(self, run_id, db_path=AI_BUDGET_DB):
+        self.run_id = run_id
+        self.db_path = db_path
+        self.conn = connect_db(db_path)
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS ai_budget ('
+                'run_id TEXT PRIMARY KEY, cost_limit REAL, spent REAL, reserved REAL, created_at REAL)'
+            )
+
+    def reserve(self, amount):
+        """True when amount fits the remaining budget (and is now reserved)."""
+        with self.conn:
+            cur = self.conn.execute(
+                'UPDATE ai_budget SET reserved = reserved + ? '
+                'WHERE run_id = ? AND spent + reserved + ? <= cost_limit',
+                (amount, self.run_id, amount)
+            )
+        return cur.rowcount == 1
+
+    def settle(self, reserved, actual):
+        """Replaces a reservation (0 for unreserved forced calls) by the actual cost."""
+        with self.conn:
+            self.conn.execute(
+                'UPDATE ai_budget SET reserved = MAX(0, reserved - ?), spent = spent + ? WHERE run_id = ?',
+                (reserved, actual, self.run_id)
+            )
+
+    def set_limit(self, cost_limit):
+        with self.conn:
+            self.conn.execute('UPDATE ai_budget SET cost_limit = ? WHERE run_id = ?', (cost_limit, self.run_id))
+
+    def snapshot(self):
+        """{'limit', 'spent', 'reserved'} of the run."""
+        row = self.conn.execute(
+            'SELECT cost_limit, spent, reserved FROM ai_budget WHERE run_id = ?', (self.run_id,)
+        ).fetchone()
+        if not row:
+            return {"limit": 0.0, "spent": 0.0, "reserved": 0.0}
+        return {"limit": row[0], "spent": row[1], "reserved": row[2]}
+
+
+def open_budget_run(cost_limit, spent=0.0, db_path=AI_BUDGET_DB):
+    """Starts a ledger for a new run; returns its run id (hand it to workers)."""
+    run_id = uuid.uuid4().hex
+    ledger = AiBudgetLedger(run_id, db_path)
+    with ledger.conn:
+        ledger.conn.execute(
+            'INSERT INTO ai_budget (run_id, cost_limit, spent, reserved, created_at) VALUES (?, ?, ?, 0, ?)',
+            (run_id, cost_limit, spent, time.time())
+        )
+    logger.debug(f"AI 预算账本已创建: {run_id} (上限 ¥{cost_limit:.4f})")
+    return run_id
+
+
+_local = threading.local()
+
+def get_budget_ledger(run_id):
+    """Ledger of run_id for the calling thread (SQLite connections are thread-bound)."""
+    if getattr(_local, 'pid', None) != os.getpid():
+        _local.ledgers = {}
+        _local.pid = os.getpid()
+    ledger = _local.ledgers.get(run_id)
+    if ledger is None:
+        ledger = _local.ledgers[run_id] = AiBudgetLedger(run_id)
+    return ledger
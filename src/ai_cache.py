@@ -0,0 +1,76 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+
+from src.text_corpus import CACHE_DIR, connect_db
+
+logger = logging.getLogger(__name__)
+
+AI_CACHE_DB = os.path.join(CACHE_DIR, 'ai_responses.sqlite')
+
+
+def cache_key(model, prompt_version, text):
+    """Content address of one AI request: model, prompt template version and chunk text."""
+    h = hashlib.sha256()
+    for part in (model, prompt_version, text):
+        h.update(part.encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+class AiResponseCache:
+    """
+    Persistent AI response cache, keyed by cache_key(). Stores the parsed result, the raw
+    response and the token usage/cost of the original call, so reruns after a crash or a
+    rule change do not pay for (or wait on) the same chunk twice. Safe to share between
+    worker processes (WAL; each process opens its own connection via get_ai_cache()).
+    """
+    def __init__(self, db_path=AI_CACHE_DB):
+        self.db_path = db_path
+        self.conn = connect_db(db_path)
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS ai_responses ('
+                'key TEXT PRIMARY KEY, model TEXT, prompt_version TEXT, result TEXT, raw_response TEXT, '
+                'prompt_tokens INTEGER, completion_tokens INTEGER, cost REAL, created_at REAL)'
+            )
+
+    def get(self, key):
+        """(result, raw_response, cost) of a cached call, or None."""
+        row = self.conn.execute(
+            'SELECT result, raw_response, cost FROM ai_responses WHERE key = ?', (key,)
+        ).fetchone()
+        if not row:
+            return None
+        try:
+            return json.loads(row[0]), row[1], row[2]
+        except json.JSONDecodeError:
+            logger.warning(f"AI 缓存条目损坏，将重新请求: {key[:12]}")
+            return None
+
+    def put(self, key, model, prompt_version, result, raw_response, prompt_tokens, completion_tokens, cost):
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO ai_responses '
+                '(key, model, prompt_version, result, raw_response, prompt_tokens, completion_tokens, cost, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, model, prompt_version, json.dumps(result, ensure_ascii=False), raw_response,
+                 prompt_tokens, completion_tokens, cost, time.time())
+            )
+
+
+_local = threading.local()
+
+def get_ai_cache():
+    """
+    AI response cache connection of the calling thread (SQLite connections are bound to
+    the thread that opened them); re-opened after fork or when AI_CACHE_DB is repointed
+    (benchmarks use a scratch cache).
+    """
+    if getattr(_local, 'pid', None) != os.getpid() or _local.cache.db_path != AI_CACHE_DB:
+        _local.cache = AiResponseCache(AI_CACHE_DB)
+        _local.pid = os.getpid()
+    return _local.cache
@@ -0,0 +1,309 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.ai_budget import AI_BUDGET_DB
+from src.text_corpus import connect_db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AI_MAX_RETRIES = 2
+DEFAULT_AI_BACKOFF_BASE = 0.5  # seconds; attempt n waits up to base * 2**n (full jitter)
+DEFAULT_AI_BACKOFF_MAX = 8.0
+# Wall-clock budget of one request including its retries and backoff
+DEFAULT_AI_DEADLINE = 60.0
+AI_CONNECT_TIMEOUT = 5.0
+AI_READ_TIMEOUT = 30.0
+# Statuses worth retrying (rate limit, provider overload/outage); others are final
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 8
+BREAKER_ERROR_RATE = 0.5
+BREAKER_COOLDOWN = 30.0
+# A half-open probe is given up (another caller may probe) if its owner never reports back
+BREAKER_PROBE_LEASE = DEFAULT_AI_DEADLINE
+
+
+class LocalBreakerState:
+    """Open / half-open state of a breaker used by one process only."""
+    def __init__(self):
+        self.until = 0.0
+        self.probe_until = 0.0
+
+    def open_until(self):
+        return self.until
+
+    def trip(self, cooldown):
+        self.until = time.time() + cooldown
+        self.probe_until = 0.0
+
+    def claim_probe(self, lease):
+        now = time.time()
+        if not self.until or self.until > now or self.probe_until > now:
+            return False
+        self.probe_until = now + lease
+        return True
+
+    def close(self):
+        self.until = self.probe_until = 0.0
+
+
+class SharedBreakerState(LocalBreakerState):
+    """
+    Open / half-open state of a run's breaker, kept next to the run's budget ledger so a
+    trip in any process pauses AI calls in every process of the run, and only one of
+    them probes after the cooldown.
+    """
+    def __init__(self, run_id, db_path=AI_BUDGET_DB):
+        self.run_id = run_id
+        self.conn = connect_db(db_path)
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS ai_breaker ('
+                'run_id TEXT PRIMARY KEY, open_until REAL, probe_until REAL)'
+            )
+            self.conn.execute('INSERT OR IGNORE INTO ai_breaker (run_id, open_until, probe_until) VALUES (?, 0, 0)', (run_id,))
+
+    def open_until(self):
+        row = self.conn.execute('SELECT open_until FROM ai_breaker WHERE run_id = ?', (self.run_id,)).fetchone()
+        return row[0] if row else 0.0
+
+    def trip(self, cooldown):
+        with self.conn:
+            self.conn.execute('UPDATE ai_breaker SET open_until = ?, probe_until = 0 WHERE run_id = ?',
+                              (time.time() + cooldown, self.run_id))
+
+    def claim_probe(self, lease):
+        now = time.time()
+        with self.conn:
+            cur = self.conn.execute(
+                'UPDATE ai_breaker SET probe_until = ? '
+                'WHERE run_id = ? AND open_until > 0 AND open_until <= ? AND probe_until <= ?',
+                (now + lease, self.run_id, now, now)
+            )
+        return cur.rowcount == 1
+
+    def close(self):
+        with self.conn:
+            self.conn.execute('UPDATE ai_breaker SET open_until = 0, probe_until = 0 WHERE run_id = ?', (self.run_id,))
+
+
+_local = threading.local()
+
+def get_breaker_state(run_id):
+    """Shared breaker state of run_id for the calling thread (SQLite connections are thread-bound)."""
+    if getattr(_local, 'pid', None) != os.getpid():
+        _local.states = {}
+        _local.pid = os.getpid()
+    state = _local.states.get(run_id)
+    if state is None:
+        state = _local.states[run_id] = SharedBreakerState(run_id)
+    return state
+
+
+class CircuitBreaker:
+    """
+    Trips when at least error_rate of the last `window` attempts (once min_calls are in)
+    failed at the provider (connection errors, timeouts, RETRY_STATUSES); while open,
+    allow() refuses every call for `cooldown` seconds. After the cooldown one probe call
+    is let through: success closes the breaker, failure re-opens it. Thread-safe; one
+    breaker is shared by all callers of an AiClient.
+    With a run_id (the budget run, see ai_budget) the open / half-open state is shared by
+    every process of the run (SharedBreakerState); each process still counts its own
+    error window, and whichever trips first pauses them all.
+    """
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS, error_rate=BREAKER_ERROR_RATE,
+                 cooldown=BREAKER_COOLDOWN, run_id=None):
+        self.outcomes = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.run_id = run_id
+        self.local_state = LocalBreakerState()
+        self.probe_thread = None  # thread holding this process's half-open probe
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def state(self):
+        return get_breaker_state(self.run_id) if self.run_id else self.local_state
+
+    def allow(self):
+        with self._lock:
+            state = self.state()
+            open_until = state.open_until()
+            if not open_until:
+                return True
+            if time.time() < open_until or self.probe_thread is not None:
+                return False
+            # Cooldown over: half-open, one probe at a time
+            if not state.claim_probe(BREAKER_PROBE_LEASE):
+                return False
+            self.probe_thread = threading.get_ident()
+            return True
+
+    def is_open(self):
+        return bool(self.state().open_until())
+
+    def record(self, ok):
+        with self._lock:
+            state = self.state()
+            if self.probe_thread == threading.get_ident():
+                self.probe_thread = None
+                if ok:
+                    state.close()
+                    self.outcomes.clear()
+                    logger.info("AI 服务已恢复，熔断关闭")
+                else:
+                    self._trip(state)
+                return
+            if state.open_until():
+                # A call that was already in flight when the breaker tripped (here or elsewhere)
+                return
+            self.outcomes.append(ok)
+            failures = len(self.outcomes) - sum(self.outcomes)
+            if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.error_rate:
+                self._trip(state)
+
+    def _trip(self, state):
+        state.trip(self.cooldown)
+        self.trips += 1
+        self.outcomes.clear()
+        logger.warning(f"AI 请求错误率过高，熔断 {self.cooldown:.0f} 秒 (暂停所有 AI 调用)")
+
+
+class AiClient:
+    """
+    Chat-completions transport with bounded retries, per-request deadlines and a circuit
+    breaker. send() retries connection errors, timeouts, RETRY_STATUSES and answers
+    whose content is not a JSON list of objects, up to max_retries times with full-jitter
+    exponential backoff (Retry-After honoured), never past `deadline` seconds from the
+    first attempt; every attempt's read timeout is cut to the time left. While the
+    breaker is open, requests are refused without touching the network.
+
+    stats: attempts, retries, failures (gave up without a usable answer), malformed,
+    deadline_exceeded, breaker_trips, skipped_breaker (chunks not sent because the
+    breaker was open).
+    """
+    def __init__(self, max_retries=DEFAULT_AI_MAX_RETRIES, backoff_base=DEFAULT_AI_BACKOFF_BASE,
+                 backoff_max=DEFAULT_AI_BACKOFF_MAX, deadline=DEFAULT_AI_DEADLINE, read_timeout=AI_READ_TIMEOUT,
+                 breaker=None, pool_size=10):
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.read_timeout = read_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = {"attempts": 0, "retries": 0, "failures": 0, "malformed": 0, "deadline_exceeded": 0,
+                      "breaker_trips": 0, "skipped_breaker": 0}
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def send(self, url, headers, body, n_chunks=1):
+        """
+        (response, error, discarded_usages): the accepted (or last) HTTP response, else
+        None and the error text. discarded_usages are the billed `usage` dicts of the
+        malformed answers that were retried (their cost is the caller's to book).
+        """
+        if not self.breaker.allow():
+            self._count("skipped_breaker", n_chunks)
+            return None, "Circuit open: AI 调用已熔断，跳过请求", []
+        deadline = time.monotonic() + self.deadline
+        discarded = []
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            self._count("attempts")
+            response, error = None, None
+            try:
+                response = self.session.post(url, headers=headers, json=body,
+                                             timeout=(max(0.1, min(AI_CONNECT_TIMEOUT, remaining)),
+                                                      max(0.1, min(self.read_timeout, remaining))))
+            except requests.RequestException as e:
+                error = f"Exception: {str(e)}"
+            finally:
+                # Recorded on every path (an unexpected exception counts as a failure), so a
+                # half-open probe can never leave the breaker refusing calls for good
+                self.breaker.record(response is not None and response.status_code not in RETRY_STATUSES)
+                self.stats["breaker_trips"] = self.breaker.trips
+
+            if response is not None and response.status_code == 200:
+                usage = _usage_if_malformed(response)
+                if usage is None:
+                    return response, None, discarded
+                self._count("malformed")
+            retryable = response is None or response.status_code in RETRY_STATUSES or response.status_code == 200
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            if response is not None:
+                try:
+                    delay = max(delay, float(response.headers.get('Retry-After', 0)))
+                except (TypeError, ValueError):
+                    pass
+            if not retryable or attempt >= self.max_retries or self.breaker.is_open():
+                break
+            if time.monotonic() + delay >= deadline:
+                self._count("deadline_exceeded")
+                break
+            if response is not None and response.status_code == 200:
+                discarded.append(usage)
+            logger.info(f"AI 请求失败 ({error or response.status_code})，{delay:.1f} 秒后重试 ({attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+            attempt += 1
+            self._count("retries")
+
+        # Gave up: the caller books the last answer (error status or malformed) as before
+        self._count("failures")
+        return response, error, discarded
+
+    def close(self):
+        self.session.close()
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+
+def _usage_if_malformed(response):
+    """None when a 200 response carries a JSON list-of-objects answer, else its usage dict (billed anyway)."""
+    try:
+        result = response.json()
+    except ValueError:
+        return {}
+    try:
+        content = result['choices'][0]['message']['content']
+        content = content.replace("```json", "").replace("```", "").strip()
+        items = json.loads(content)
+        if isinstance(items, list) and all(isinstance(item, dict) for item in items):
+            return None
+    except (KeyError, IndexError, TypeError, ValueError):
+        pass
+    return result.get('usage', {}) if isinstance(result, dict) else {}
+
+
+_clients = {}
+_clients_pid = None
+
+def get_ai_client(run_id=None):
+    """
+    Per-process AiClient (re-created after fork) for the budget run run_id: its breaker
+    state is shared with every other process of the run; without a run it is this
+    process's own.
+    """
+    global _clients, _clients_pid
+    if _clients_pid != os.getpid():
+        _clients = {}
+        _clients_pid = os.getpid()
+    client = _clients.get(run_id)
+    if client is None:
+        client = _clients[run_id] = AiClient(breaker=CircuitBreaker(run_id=run_id))
+    return client
@@ -0,0 +1,238 @@
+import time
+import asyncio
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.txt_extractor import (TxtExtractor, AI_API_URL, ai_headers, ai_request_body, estimate_tokens, estimate_ai_cost,
+                               pack_ai_jobs)
+from src.ai_budget import get_budget_ledger
+from src.ai_client import AiClient, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AI_CONCURRENCY = 8
+DEFAULT_AI_RATE_LIMIT = 5.0  # requests per second
+# Prompt-token budget of one packed request (0: one request per chunk)
+DEFAULT_AI_PACK_TOKENS = 0
+
+
+class RateLimiter:
+    """Token bucket for one event loop: `rate` requests per second, bursts up to `burst`."""
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AiDispatcher:
+    """
+    AI stage of the TXT pipeline, run in the manager process so that CPU workers never
+    wait on the network. Workers return the chunks that need AI (TxtExtractor with
+    defer_ai); submit() queues one file's chunks and returns a concurrent.futures.Future
+    of (records, cost, ai_cache_stats, packing) with the AI answers already applied.
+
+    With pack_tokens set, a file's uncached chunks are packed into as few requests as
+    fit the token budget (_ai_packed_prompt, chunk IDs map the answer back); packing
+    reports chunks, requests and estimated prompt tokens packed vs one request each.
+
+    Uncached requests of all files wait in one priority queue, highest value (missing
+    fields the chunks may fill, see TxtExtractor.ai_chunk_value) per estimated yuan
+    first, and each reserves its estimated cost in the budget_run ledger before it is
+    sent (forced requests are only recorded); a refused reservation keeps the regex
+    records. Without a ledger, can_spend() is asked instead.
+
+    Requests run on a private asyncio loop thread: `concurrency` queue consumers, paced
+    by a token-bucket rate limiter, posted through one AiClient (pooled session, retries,
+    deadline, circuit breaker; blocking sends run on a thread pool of the same size). While
+    the breaker is open every queued chunk falls back to its regex records, so one outage
+    pauses AI for all workers feeding the dispatcher. The AI cache and the ledger are only
+    touched from the loop thread (one connection per thread). url can point at a local
+    mock server.
+    """
+    def __init__(self, api_key, concurrency=DEFAULT_AI_CONCURRENCY, rate_limit=DEFAULT_AI_RATE_LIMIT,
+                 url=AI_API_URL, timeout=30, can_spend=None, pack_tokens=DEFAULT_AI_PACK_TOKENS, budget_run=None):
+        self.api_key = api_key
+        self.concurrency = max(1, int(concurrency))
+        self.rate_limit = max(0.1, float(rate_limit))
+        self.url = url
+        self.timeout = timeout
+        self.can_spend = can_spend or (lambda: True)
+        self.budget_run = budget_run
+        self.extractor = TxtExtractor()
+        self.pack_tokens = max(0, int(pack_tokens or 0))
+        # Instruction block of a packed prompt, counted against each pack's budget
+        self.pack_overhead = estimate_tokens(self.extractor._ai_packed_prompt([]))
+        self.stats = {"queued": 0, "in_flight": 0, "requests": 0, "errors": 0, "cache_hits": 0, "skipped_budget": 0}
+
+        # With a budget run, worker processes calling AI themselves share this breaker
+        self.client = AiClient(read_timeout=timeout, breaker=CircuitBreaker(run_id=budget_run), pool_size=self.concurrency)
+        self.pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='ai-http')
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._init_limits(), self.loop).result()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _init_limits(self):
+        self.limiter = RateLimiter(self.rate_limit, burst=self.concurrency)
+        self.queue = asyncio.PriorityQueue()
+        self.order = itertools.count()
+        self.consumers = [self.loop.create_task(self._consume()) for _ in range(self.concurrency)]
+
+    def submit(self, ai_jobs, force_ai=False):
+        """Queues one file's deferred chunks; Future of (records, cost, ai_cache_stats, packing)."""
+        self.stats["queued"] += len(ai_jobs)
+        return asyncio.run_coroutine_threadsafe(self._run_file(ai_jobs, force_ai), self.loop)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._stop_consumers(), self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
+
+    async def _stop_consumers(self):
+        for task in self.consumers:
+            task.cancel()
+        await asyncio.gather(*self.consumers, return_exceptions=True)
+
+    async def _run_file(self, ai_jobs, force_ai):
+        cache_stats = {"hits": 0, "misses": 0, "saved_cost": 0.0}
+        records, cost, pending = [], 0.0, []
+        for job in ai_jobs:
+            done = self._from_cache(job, force_ai, cache_stats)
+            if done is None:
+                pending.append(job)
+            else:
+                records.extend(done)
+        packing = {"chunks": len(pending), "requests": 0, "prompt_tokens": 0, "unpacked_prompt_tokens": 0}
+        if self.pack_tokens:
+            # Valuable chunks share requests, so a pack at the back of the queue is all low value
+            pending.sort(key=lambda job: job.get("value", 0) / estimate_ai_cost(self.extractor._ai_prompt(job["text"])), reverse=True)
+            groups = pack_ai_jobs(pending, self.pack_tokens, self.pack_overhead)
+        else:
+            groups = [[job] for job in pending]
+        futures = []
+        for group in groups:
+            texts = [job["text"] for job in group]
+            prompt_content = self.extractor._ai_packed_prompt(texts) if self.pack_tokens else self.extractor._ai_prompt(texts[0])
+            estimate = estimate_ai_cost(prompt_content, len(group))
+            value = sum(job.get("value", 0) for job in group)
+            future = self.loop.create_future()
+            await self.queue.put((-value / estimate, next(self.order), group, prompt_content, estimate, force_ai, packing, future))
+            futures.append(future)
+        for job_records, job_cost in await asyncio.gather(*futures):
+            records.extend(job_records)
+            cost += job_cost
+        return records, cost, cache_stats, packing
+
+    def _from_cache(self, job, force_ai, cache_stats):
+        """Records for a job answered from the AI cache, else None."""
+        before = dict(self.extractor.ai_cache_stats)
+        cached = self.extractor.ai_cached(job["text"], packed=bool(self.pack_tokens))
+        for k, v in self.extractor.ai_cache_delta(before).items():
+            cache_stats[k] += v
+        if cached is None:
+            return None
+        self.stats["cache_hits"] += 1
+        self.stats["queued"] -= 1
+        return self.extractor.apply_ai_result(job["regex_results"], *cached, job["chunk_span"], force_ai)
+
+    async def _consume(self):
+        while True:
+            _, _, group, prompt_content, estimate, force_ai, packing, future = await self.queue.get()
+            if future.cancelled():
+                # Its file was given up (run stopped): nothing to send or pay for
+                self.stats["queued"] -= len(group)
+                continue
+            try:
+                result = await self._run_group(group, prompt_content, estimate, force_ai, packing)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _reserve(self, estimate, force_ai):
+        """Reserved amount (0.0 for forced requests), or None when the budget refuses it."""
+        if force_ai:
+            return 0.0
+        if self.budget_run:
+            return estimate if get_budget_ledger(self.budget_run).reserve(estimate) else None
+        return 0.0 if self.can_spend() else None
+
+    async def _run_group(self, group, prompt_content, estimate, force_ai, packing):
+        reserved = self._reserve(estimate, force_ai)
+        if reserved is None:
+            self.stats["skipped_budget"] += len(group)
+            self.stats["queued"] -= len(group)
+            logger.info("跳过 AI: 费用达到上限")
+            records = []
+            for job in group:
+                for item in job["regex_results"]:
+                    item.update({'is_ai': False, 'is_forced_ai': force_ai, 'chunk_span': job["chunk_span"]})
+                records.extend(job["regex_results"])
+            return records, 0.0
+
+        texts = [job["text"] for job in group]
+        packing["requests"] += 1
+        packing["prompt_tokens"] += estimate_tokens(prompt_content)
+        packing["unpacked_prompt_tokens"] += sum(estimate_tokens(self.extractor._ai_prompt(t)) for t in texts)
+        response, raw, discarded = await self._request(prompt_content, len(group))
+        # Malformed answers the client retried were billed all the same
+        retry_cost = self.extractor.book_discarded(discarded)
+        if response is None:
+            answers = [([], 0.0, prompt_content, raw)] * len(group)
+        elif self.pack_tokens:
+            answers = self.extractor.ai_parse_packed_response(texts, prompt_content, response)
+        else:
+            answers = [self.extractor.ai_parse_response(texts[0], prompt_content, response)]
+        records, cost = [], retry_cost
+        for job, (results, share, prompt_used, raw_resp) in zip(group, answers):
+            records.extend(self.extractor.apply_ai_result(job["regex_results"], results, share, prompt_used, raw_resp,
+                                                          job["chunk_span"], force_ai))
+            cost += share
+        if self.budget_run:
+            get_budget_ledger(self.budget_run).settle(reserved, cost)
+        return records, cost
+
+    async def _request(self, prompt_content, n_chunks):
+        """
+        (response, None, discarded_usages), or (None, error text, discarded_usages) when the
+        client gave up or the breaker is open.
+        """
+        try:
+            await self.limiter.acquire()
+            self.stats["in_flight"] += 1
+            self.stats["requests"] += 1
+            try:
+                response, error, discarded = await self.loop.run_in_executor(self.pool, self._send, prompt_content, n_chunks)
+            finally:
+                self.stats["in_flight"] -= 1
+            if response is None or response.status_code != 200:
+                self.stats["errors"] += 1
+            return response, error, discarded
+        except Exception as e:
+            self.stats["errors"] += 1
+            return None, f"Exception: {str(e)}", []
+        finally:
+            self.stats["queued"] -= n_chunks
+
+    def _send(self, prompt_content, n_chunks):
+        return self.client.send(self.url, ai_headers(self.api_key), ai_request_body(prompt_content), n_chunks)
@@ -1,6 +1,5 @@
 import os
 import logging
-import pdfplumber
 import pandas as pd
 import sys
 from concurrent.futures import ProcessPoolExecutor, as_completed
@@ -12,6 +11,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.downloader import Downloader
 from src.config import PDF_DIR, DATA_DIR
+from src.text_corpus import read_pages
 
 logger = logging.getLogger(__name__)
 
@@ -29,36 +29,35 @@ def check_single_file(filename):
     filepath = os.path.join(PDF_DIR, filename)
     
     try:
-        with pdfplumber.open(filepath) as pdf:
-            if len(pdf.pages) > 0:
-                text = pdf.pages[0].extract_text()
-                if text:
-                    # Check first 15 lines for title
-                    lines = [line.strip() for line in text.split('\n')[:15] if line.strip()]
-                    header_text = "".join(lines)
-                    
-                    # 1. Direct wrong keywords
-                    for kw in wrong_keywords:
-                        if kw in header_text:
-                            if "招股说明书" not in header_text and "招股意向书" not in header_text:
-                                return filename
-                    
-                    # 2. Appendix/Summary check
-                    # If it says "招股说明书摘要" or has "附录" etc. without being the main doc
-                    for kw in appendix_keywords:
-                        if kw in header_text:
-                            # Usually if it has "摘要" or "附录" in the first few lines as a standalone title
-                            # it's not the main doc. The main doc would have "招股说明书" as the most prominent title.
-                            if len(header_text) < 200: # Heuristic: if it's a short title page
-                                return filename
-
-                    # 3. Content-based sanity check
-                    # Prospectus are usually very long. Appendices/summaries are shorter.
-                    # But some summaries are also long. Let's use keyword ratio or presence.
+        # First page text comes from the shared text corpus (extracted once per file version)
+        text = read_pages(filepath, [0]).get(0)
+        if text:
+            # Check first 15 lines for title
+            lines = [line.strip() for line in text.split('\n')[:15] if line.strip()]
+            header_text = "".join(lines)
+            
+            # 1. Direct wrong keywords
+            for kw in wrong_keywords:
+                if kw in header_text:
                     if "招股说明书" not in header_text and "招股意向书" not in header_text:
-                        # If neither is in the first page header, it's highly suspicious
                         return filename
-                         
+            
+            # 2. Appendix/Summary check
+            # If it says "招股说明书摘要" or has "附录" etc. without being the main doc
+            for kw in appendix_keywords:
+                if kw in header_text:
+                    # Usually if it has "摘要" or "附录" in the first few lines as a standalone title
+                    # it's not the main doc. The main doc would have "招股说明书" as the most prominent title.
+                    if len(header_text) < 200: # Heuristic: if it's a short title page
+                        return filename
+
+            # 3. Content-based sanity check
+            # Prospectus are usually very long. Appendices/summaries are shorter.
+            # But some summaries are also long. Let's use keyword ratio or presence.
+            if "招股说明书" not in header_text and "招股意向书" not in header_text:
+                # If neither is in the first page header, it's highly suspicious
+                return filename
+                 
     except Exception:
         pass
         
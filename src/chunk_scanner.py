@@ -0,0 +1,126 @@
+import re
+
+# Paragraph break as the TXT conversions write it: an empty (or whitespace-only) line
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+
+class ChunkScanner:
+    """
+    Single-pass chunker for long documents. Keyword hits are found with their positions
+    (KeywordScanner) and each hit is given a bounded window:
+
+    - the enclosing paragraph, when it is shorter than max_chars;
+    - otherwise before/after characters of context around the hit, grown to take in
+      following hits as long as the window stays under max_chars (the next window then
+      starts before its own hit, so neighbouring windows may overlap).
+
+    Paragraph breaks are only searched within max_chars of a hit (never twice over the
+    same stretch), and the keyword search resumes at the end of each paragraph window, so
+    every character is looked at a bounded number of times.
+    Windows are returned as (start, end) offsets; only the windows themselves are ever
+    sliced out of the document.
+    """
+    def __init__(self, scanner, before=200, after=300, min_chars=10, max_chars=3000):
+        self.scanner = scanner
+        self.before = before
+        self.after = after
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+
+    def spans(self, text):
+        """(start, end) offsets of the relevant windows of text, in document order."""
+        spans = []
+        if not text:
+            return spans
+        n = len(text)
+        # Paragraph breaks are searched only near hits: para_start is the paragraph start
+        # as known from everything scanned before `scanned`
+        para_start, scanned = 0, 0
+        # A keyword straddling the end of a window is still picked up
+        overlap = max(self.scanner.max_len - 1, 0)
+
+        window = None  # [start, end, is_paragraph, para_start]
+        hit = self.scanner.search(text)
+        while hit:
+            pos, kw = hit
+            hit_end = pos + len(kw)
+            grown_end = min(n, hit_end + self.after)
+            if window and not window[2] and pos < window[1] and grown_end - window[0] <= self.max_chars:
+                # Inside a context window: grow it to this hit's context while it stays bounded
+                window[1] = max(window[1], grown_end)
+            elif window and hit_end <= window[1]:
+                pass
+            else:
+                if window:
+                    spans.append(self._strip(text, window[0], window[1]))
+                window = self._window(text, pos, hit_end, para_start, scanned)
+                para_start, scanned = window[3], pos
+            # Paragraph windows cover every hit inside them; context windows may still grow
+            hit = self.scanner.search(text, max(pos + 1, window[1] - overlap) if window[2] else pos + 1)
+        if window:
+            spans.append(self._strip(text, window[0], window[1]))
+        return [(start, end) for start, end in spans if end - start > self.min_chars]
+
+    def _window(self, text, pos, hit_end, para_start, scanned):
+        """[start, end, is_paragraph, para_start] for a hit that starts a new window."""
+        n = len(text)
+        lo = max(scanned, pos - self.max_chars)
+        known_start = lo == scanned
+        for m in PARAGRAPH_BREAK.finditer(text, lo, pos):
+            para_start, known_start = m.end(), True
+        m = PARAGRAPH_BREAK.search(text, hit_end, hit_end + self.max_chars)
+        para_end = m.start() if m else n
+        if known_start and para_end - para_start < self.max_chars:
+            return [para_start, para_end, True, para_start]
+        return [max(0, pos - self.before), min(n, hit_end + self.after), False, para_start]
+
+    def chunks(self, text):
+        """Yields (start, end, chunk_text) for every window of text."""
+        for start, end in self.spans(text):
+            yield start, end, text[start:end]
+
+    def scan_stream(self, blocks, on_piece=None):
+        """
+        Windows over text arriving in blocks (e.g. from an incremental decoder), as
+        (start, end, chunk_text) with offsets into the whole stream. What has arrived is
+        cut at the last paragraph break at least max_chars before its end (or at a line
+        break when there is none) and each piece is scanned as soon as it is complete, so
+        at most one block plus max_chars of text is held at a time. Windows match spans()
+        on the whole text except in text without paragraph breaks, where a cut can split
+        a context window.
+        on_piece(base, piece): optional callback given each complete piece (and its stream
+        offset) before that piece's windows are yielded.
+        """
+        buf, base, searched, cut = '', 0, 0, 0
+        for block in blocks:
+            buf = buf + block if buf else block
+            limit = len(buf) - self.max_chars
+            if limit <= searched:
+                continue
+            for m in PARAGRAPH_BREAK.finditer(buf, searched, limit):
+                cut = m.end()
+            searched = limit
+            if not cut:
+                if limit < self.max_chars:
+                    continue
+                cut = buf.rfind('\n', 0, limit) + 1 or limit
+            piece = buf[:cut]
+            if on_piece:
+                on_piece(base, piece)
+            for start, end in self.spans(piece):
+                yield base + start, base + end, piece[start:end]
+            base += cut
+            buf = buf[cut:]
+            searched, cut = max(0, searched - len(piece)), 0
+        if on_piece and buf:
+            on_piece(base, buf)
+        for start, end in self.spans(buf):
+            yield base + start, base + end, buf[start:end]
+
+    @staticmethod
+    def _strip(text, start, end):
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
@@ -0,0 +1,162 @@
+import os
+import re
+import hashlib
+import logging
+
+from src.keyword_scanner import get_scanner
+from src.chunk_scanner import ChunkScanner
+from src.financial_matcher import FinancialMatcher
+from src.txt_tables import TxtTableDetector
+from src.prompt_compactor import PromptCompactor
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a keyword list, pattern or threshold below changes; every output row is
+# stamped with ExtractionRules.stamp so results can be traced back to the rule set.
+RULES_VERSION = "2026.10-6"
+
+# --- ProspectusExtractor (PDF) ---
+LOCATOR_KEYWORDS = ['股利分配', '现金分红', '利润分配']
+CONTEXT_POSITIVE = ['每10股', '派发现金', '含税', '实施完毕', '分红金额', '现金分红', '报告期', '最近三年', '分配方案']
+CONTEXT_NEGATIVE = ['风险', '不确定性', '......', '目录', '详见', '参见', '分配政策', '分配原则', '章程', '规划', '未来']
+TEXT_KEYWORDS = [
+    '分红', '派发', '分配', '股利', '利润分配', '现金分红', '分红金额', '股利分配',
+    '现金流量', '资产', '资产总额', '净利润', '筹资', '投资', '流入', '流出', '万元', '亿元'
+]
+SECTION_KEYWORDS = ['股利分配', '利润分配', '分红']
+TABLE_KEYWORDS = ['分红', '股利', '利润分配', '现金分配']
+# A table row containing one of these is not a dividend row unless overridden
+TABLE_NEGATIVE_KEYWORDS = ['收到', '流入', '流出', '支付', '筹资', '投资', '资产', '余额', '净额', '费用', '收入', '成本', '总额', '净利润', '未分配利润']
+YEAR_PATTERN = r'(201[5-9]|202[0-9])'
+AMOUNT_PATTERN = r'(\d{1,3}(,\d{3})*(\.\d+)?)'
+AMOUNT_UNIT_PATTERN = r'(\d{1,3}(,\d{3})*(\.\d+)?)\s*(万?元|亿元)'
+AMOUNT_OPTIONAL_UNIT_PATTERN = r'(\d{1,3}(,\d{3})*(\.\d+)?)\s*(万?元|亿元)?'
+TOC_LINE_PATTERN = r'^(.{2,60}?)\s*[\.…·．\-\s]{4,}\s*(?:\d+-\d+-)?(\d{1,4})$'
+PAGE_NUMBER_PATTERN = r'^(?:\d+-\d+-)?(\d{1,4})$'
+HEADING_PATTERN = r'^[一二三四五六七八九十]、'
+# Fiscal years accepted as dividend years
+MIN_YEAR = 2015
+MAX_YEAR = 2024
+SECTION_WINDOW_MAX = 40
+TABLE_MARGIN_ABOVE = 200  # pt above a keyword hit (header row with years)
+TABLE_MARGIN_BELOW = 120
+
+# --- TxtExtractor ---
+TXT_KEYWORDS = [
+    "分红", "股利分配", "现金分红", "派发现金", "利润分配", "股利支付",
+    "权益分派", "分配方案", "每10股", "利益分配",
+    "归属于母公司所有者的净利润", "归母净利润", "净利润",
+    "经营活动产生的现金流量净额", "经营现金净流", "现金流量净额"
+]
+TXT_CHUNK_MIN_CHARS = 10
+TXT_CHUNK_MAX_CHARS = 3000
+TXT_WINDOW_BEFORE = 200
+TXT_WINDOW_AFTER = 300
+TXT_YEAR_PATTERN = r"(20(?:1[7-9]|2[0-5]))年(?:度)?"
+# Output field -> (label regex, max non-digit characters between label and amount).
+# Labels must stay bounded (no .*?) to keep FinancialMatcher linear.
+TXT_FIELD_LABELS = {
+    'amount_text': (r"合计|共计|总额|总计|派发现金|现金分红", 50),
+    'net_profit': (r"归[^0-9\n]{0,20}?净利润", 30),
+    'operating_cash_flow': (r"经营[^0-9\n]{0,20}?现金流量净额", 30),
+}
+# Years accepted as table header columns (same range as TXT_YEAR_PATTERN, no capture group)
+TXT_TABLE_YEAR = r"20(?:1[7-9]|2[0-5])"
+# Output field -> regex a table row label must match; first match wins
+TXT_TABLE_ROW_LABELS = {
+    'net_profit': r"^(?!.*(?:扣除|扣非)).*(?:归属于(?:母公司|发行人)(?:所有者|股东|普通股股东)?的?净利润|归母净利润)",
+    'operating_cash_flow': r"经营活动(?:产生的)?现金流量净额|经营活动现金净流量",
+    'amount_text': r"^(?!.*(?:比例|占|每股|每10股|每十股)).*(?:现金分红|分红金额|现金股利|派发现金)",
+}
+TXT_TABLE_MAX_ROWS = 60
+# Output field -> words suggesting a chunk holds that field; ranks AI chunks by the
+# missing fields they could fill when the budget cannot cover them all
+TXT_FIELD_HINTS = {
+    'amount_text': r"分红|股利|派发现金|利润分配|权益分派|每10股",
+    'net_profit': r"净利润",
+    'operating_cash_flow': r"现金流量净额|经营现金净流",
+}
+# Amount-like tokens that keep a sentence in the compacted AI prompt: grouped or
+# decimal numbers, 3+ digit runs, and numbers with a currency unit or percent sign
+TXT_COMPACT_AMOUNT = r"\d{1,3}(?:,\d{3})+|\d+\.\d+|\d{3,}|\d+\s*(?:万元|亿元|元|%)"
+
+
+class ExtractionRules:
+    """
+    Every keyword set, compiled pattern and threshold used by ProspectusExtractor and
+    TxtExtractor. Built once per process through get_rules().
+    """
+    def __init__(self):
+        self.version = RULES_VERSION
+
+        self.locator_keywords = LOCATOR_KEYWORDS
+        self.context_positive = CONTEXT_POSITIVE
+        self.context_negative = CONTEXT_NEGATIVE
+        self.section_keywords = SECTION_KEYWORDS
+        self.table_keywords = TABLE_KEYWORDS
+        self.table_negative_keywords = TABLE_NEGATIVE_KEYWORDS
+        self.min_year = MIN_YEAR
+        self.max_year = MAX_YEAR
+        self.section_window_max = SECTION_WINDOW_MAX
+        self.table_margin_above = TABLE_MARGIN_ABOVE
+        self.table_margin_below = TABLE_MARGIN_BELOW
+
+        self.year_pattern = re.compile(YEAR_PATTERN)
+        self.amount_pattern = re.compile(AMOUNT_PATTERN)
+        self.amount_unit_pattern = re.compile(AMOUNT_UNIT_PATTERN)
+        self.amount_optional_unit_pattern = re.compile(AMOUNT_OPTIONAL_UNIT_PATTERN)
+        self.toc_line_pattern = re.compile(TOC_LINE_PATTERN)
+        self.page_number_pattern = re.compile(PAGE_NUMBER_PATTERN)
+        self.heading_pattern = re.compile(HEADING_PATTERN)
+
+        self.page_scanner = get_scanner(['现金分红'] + LOCATOR_KEYWORDS + CONTEXT_POSITIVE + CONTEXT_NEGATIVE)
+        self.text_scanner = get_scanner(TEXT_KEYWORDS)
+        self.table_scanner = get_scanner(TABLE_KEYWORDS)
+        self.table_row_scanner = get_scanner(TABLE_KEYWORDS + TABLE_NEGATIVE_KEYWORDS)
+
+        self.txt_keywords = TXT_KEYWORDS
+        self.txt_scanner = get_scanner(TXT_KEYWORDS)
+        self.txt_chunk_min_chars = TXT_CHUNK_MIN_CHARS
+        self.txt_chunk_max_chars = TXT_CHUNK_MAX_CHARS
+        self.txt_window_before = TXT_WINDOW_BEFORE
+        self.txt_window_after = TXT_WINDOW_AFTER
+        self.txt_chunk_scanner = ChunkScanner(self.txt_scanner, TXT_WINDOW_BEFORE, TXT_WINDOW_AFTER,
+                                              TXT_CHUNK_MIN_CHARS, TXT_CHUNK_MAX_CHARS)
+        self.txt_year_pattern = re.compile(TXT_YEAR_PATTERN)
+        self.txt_field_labels = TXT_FIELD_LABELS
+        self.txt_financial_matcher = FinancialMatcher(TXT_FIELD_LABELS, self.txt_year_pattern)
+        self.txt_table_year = TXT_TABLE_YEAR
+        self.txt_table_row_labels = TXT_TABLE_ROW_LABELS
+        self.txt_table_max_rows = TXT_TABLE_MAX_ROWS
+        self.txt_table_detector = TxtTableDetector(TXT_TABLE_ROW_LABELS, TXT_TABLE_YEAR, TXT_TABLE_MAX_ROWS)
+        self.txt_field_hints = {field: re.compile(p) for field, p in TXT_FIELD_HINTS.items()}
+        self.txt_compact_amount = re.compile(TXT_COMPACT_AMOUNT)
+        self.txt_prompt_compactor = PromptCompactor(self.txt_scanner, re.compile(TXT_TABLE_YEAR),
+                                                    self.txt_compact_amount, self.page_number_pattern)
+
+        # Content fingerprint: a rule edit without a version bump still yields a new stamp
+        digest = hashlib.sha1(repr(self._definition()).encode('utf-8')).hexdigest()[:8]
+        self.stamp = f"{RULES_VERSION}+{digest}"
+
+    def _definition(self):
+        return sorted(
+            (k, v.pattern if isinstance(v, re.Pattern) else v)
+            for k, v in vars(self).items()
+            if isinstance(v, (str, int, float, list, dict, re.Pattern)) and k not in ('version', 'stamp')
+        )
+
+    def valid_year(self, year):
+        return self.min_year <= int(year) <= self.max_year
+
+
+_rules_instance = None
+_rules_pid = None
+
+def get_rules():
+    """Per-process rule registry, compiled on first use in each worker."""
+    global _rules_instance, _rules_pid
+    if _rules_instance is None or _rules_pid != os.getpid():
+        _rules_instance = ExtractionRules()
+        _rules_pid = os.getpid()
+        logger.debug(f"抽取规则已加载: {_rules_instance.stamp} [PID: {_rules_pid}]")
+    return _rules_instance
@@ -3,51 +3,273 @@ import re
 import logging
 import pandas as pd
 import os
+import gc
+from src.text_corpus import get_corpus
+from src.extraction_rules import get_rules
+from src.ocr_service import PageOcr, tesseract_cmd
+from src.scan_detector import classify_document
+from src.text_backends import open_locator_backend, DEFAULT_TEXT_BACKEND
+
+# Tesseract runs as a subprocess (see src/ocr_service.py); TESSERACT_CMD may point to a stub
+HAS_OCR = tesseract_cmd() is not None
 
 try:
-    import pytesseract
-    from PIL import Image
-    # Help Tesseract find its path on Windows
-    common_tesseract_paths = [
-        r'C:\Program Files\Tesseract-OCR\tesseract.exe',
-        r'C:\Users\wxx11\AppData\Local\Tesseract-OCR\tesseract.exe',
-        r'D:\Program Files\Tesseract-OCR\tesseract.exe'
-    ]
-    for path in common_tesseract_paths:
-        if os.path.exists(path):
-            pytesseract.pytesseract.tesseract_cmd = path
-            break
-    HAS_OCR = True
+    import psutil
+    HAS_PSUTIL = True
 except ImportError:
-    HAS_OCR = False
+    HAS_PSUTIL = False
 
 logger = logging.getLogger(__name__)
 
+_process = None
+_process_pid = None
+
+def _rss_mb():
+    """Resident memory of this process in MB, or None without psutil."""
+    global _process, _process_pid
+    if not HAS_PSUTIL:
+        return None
+    if _process is None or _process_pid != os.getpid():
+        _process = psutil.Process(os.getpid())
+        _process_pid = os.getpid()
+    return _process.memory_info().rss / (1024 * 1024)
+
+class PageTextCache:
+    """
+    Per-document page text layer.
+    Each page's text (and OCR text) is extracted at most once while the PDF is open;
+    the locator, table, text and OCR fallback passes all read through this object.
+    With a TextCorpus attached, pages already in the corpus are never re-extracted
+    and newly extracted pages are written back when the document is closed.
+    Memory-bounded mode drops a page's parsed layout objects on release(): right after a
+    locator-only read, and once the scan loop has taken the page's tables and text; with
+    an RSS budget, every page's objects and pdfminer's object cache are dropped whenever
+    the process goes over budget. Peak RSS is always recorded.
+    With a fast text backend attached (see text_backends.open_locator_backend), locate_text()
+    serves the locator from it; without one it reads `pdf` itself. text() stays pdfplumber
+    for the pages whose tables/layout are processed. The cache owns the backend and closes
+    it on exit.
+    """
+    def __init__(self, pdf, name="", corpus=None, file_hash=None, memory_bounded=False, rss_budget_mb=None, text_backend=None):
+        self.pdf = pdf
+        self.name = name
+        self.corpus = corpus
+        self.file_hash = file_hash
+        self._text = {}
+        self._ocr_text = {}
+        self._stored = corpus.get_pages(file_hash) if corpus else {}
+        self._new_pages = {}
+        self.stats = {'pages': len(pdf.pages), 'pages_touched': 0, 'text_extractions': 0, 'ocr_runs': 0, 'extractions_saved': 0, 'corpus_hits': 0}
+        self.memory_bounded = memory_bounded or rss_budget_mb is not None
+        self.rss_budget_mb = rss_budget_mb
+        self._pages_since_release = 0
+        rss = _rss_mb()
+        self.stats.update({'rss_start_mb': rss, 'peak_rss_mb': rss, 'pages_released': 0, 'memory_releases': 0})
+        self.backend = text_backend
+        self._fast_text = {}
+        self._fast_stored = corpus.get_pages(file_hash, self.backend.name) if corpus and self.backend else {}
+        self._new_fast_pages = {}
+        self.stats.update({'text_backend': self.backend.name if self.backend else 'pdfplumber', 'fast_text_extractions': 0})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stats['pages_touched'] = len(set(self._text) | set(self._ocr_text) | set(self._fast_text))
+        if self.corpus and self._new_pages:
+            try:
+                self.corpus.put_pages(self.file_hash, self._new_pages, page_count=len(self))
+            except Exception as e:
+                logger.warning(f"写入文本语料失败 {self.name}: {e}")
+        if self.backend:
+            if self.corpus and self._new_fast_pages:
+                try:
+                    self.corpus.put_pages(self.file_hash, self._new_fast_pages, source=self.backend.name, page_count=len(self))
+                except Exception as e:
+                    logger.warning(f"写入文本语料失败 {self.name}: {e}")
+            self.backend.close()
+            self._fast_text.clear()
+        self._sample_memory()
+        logger.info(f"页面文本缓存: 共提取 {self.stats['text_extractions']} 页文本 (快速后端 {self.stats['fast_text_extractions']} 页), 语料命中 {self.stats['corpus_hits']} 页, OCR {self.stats['ocr_runs']} 页, 复用 {self.stats['extractions_saved']} 次 (File: {self.name})")
+        if self.stats['peak_rss_mb'] is not None:
+            logger.info(f"内存峰值: {self.stats['peak_rss_mb']:.0f} MB (起始 {self.stats['rss_start_mb']:.0f} MB, 释放页面 {self.stats['pages_released']} 次, 超预算回收 {self.stats['memory_releases']} 次) (File: {self.name})")
+        self._text.clear()
+        self._ocr_text.clear()
+        return False
+
+    def __len__(self):
+        return len(self.pdf.pages)
+
+    def page(self, page_num):
+        return self.pdf.pages[page_num]
+
+    def text(self, page_num):
+        if page_num in self._text:
+            self.stats['extractions_saved'] += 1
+            return self._text[page_num]
+        if page_num in self._stored:
+            text = self._stored.pop(page_num)
+            self.stats['corpus_hits'] += 1
+        else:
+            text = self.pdf.pages[page_num].extract_text() or ""
+            self.stats['text_extractions'] += 1
+            self._new_pages[page_num] = text
+        self._text[page_num] = text
+        return text
+
+    def locate_text(self, page_num):
+        """
+        Raw page text for locating (scoring, TOC, probing) from the fast backend.
+        Pages whose pdfplumber text is already at hand are served from it instead.
+        A page the locator had to parse with pdfplumber is released at once; scan pages
+        are released by the caller after their tables are captured.
+        """
+        if self.backend is None or page_num in self._text or (page_num in self._stored and page_num not in self._fast_stored):
+            parsed = page_num not in self._text and page_num not in self._stored
+            text = self.text(page_num)
+            if parsed:
+                self.release(page_num)
+            return text
+        if page_num in self._fast_text:
+            self.stats['extractions_saved'] += 1
+            return self._fast_text[page_num]
+        if page_num in self._fast_stored:
+            text = self._fast_stored.pop(page_num)
+            self.stats['corpus_hits'] += 1
+        else:
+            text = self.backend.page_text(page_num)
+            self.stats['fast_text_extractions'] += 1
+            self._new_fast_pages[page_num] = text
+        self._fast_text[page_num] = text
+        return text
+
+    def release(self, page_num):
+        """Memory-bounded mode: drop the page's parsed layout objects (re-parsed if needed again)."""
+        if self.memory_bounded:
+            self.pdf.pages[page_num].close()
+            self.stats['pages_released'] += 1
+        self._pages_since_release += 1
+        self._sample_memory()
+
+    def _sample_memory(self):
+        rss = _rss_mb()
+        if rss is None:
+            return
+        self.stats['peak_rss_mb'] = max(self.stats['peak_rss_mb'] or 0, rss)
+        # Re-check only after a few pages: freed memory is not always returned to the OS at once
+        if self.rss_budget_mb and rss > self.rss_budget_mb and self._pages_since_release >= 10:
+            self._release_all()
+            logger.info(f"内存超出预算 ({rss:.0f} MB > {self.rss_budget_mb} MB)，已释放页面缓存: {_rss_mb():.0f} MB (File: {self.name})")
+
+    def _release_all(self):
+        for page in self.pdf.pages:
+            page.close()
+        cached_objs = getattr(self.pdf.doc, '_cached_objs', None)
+        if cached_objs:
+            cached_objs.clear()
+        gc.collect()
+        self.stats['memory_releases'] += 1
+        self._pages_since_release = 0
+
+    def ocr_text(self, page_num, ocr_func):
+        if page_num in self._ocr_text:
+            self.stats['extractions_saved'] += 1
+            return self._ocr_text[page_num]
+        text = ocr_func(self.pdf.pages[page_num]) or ""
+        self.stats['ocr_runs'] += 1
+        self._ocr_text[page_num] = text
+        return text
+
 class ProspectusExtractor:
-    def __init__(self):
-        self.keywords = ['股利分配', '现金分红', '利润分配']
-        self.context_positive = ['每10股', '派发现金', '含税', '实施完毕', '分红金额', '现金分红', '报告期', '最近三年', '分配方案']
-        self.context_negative = ['风险', '不确定性', '......', '目录', '详见', '参见', '分配政策', '分配原则', '章程', '规划', '未来']
-        self.year_pattern = re.compile(r'(201[5-9]|202[0-9])') 
-        self.amount_pattern = re.compile(r'(\d{1,3}(,\d{3})*(\.\d+)?)')
+    def __init__(self, use_corpus=True, locator_mode='toc', table_mode='region', ocr_mode='inline',
+                 early_exit=False, early_exit_years=3, early_exit_min_score=40,
+                 memory_bounded=False, rss_budget_mb=None, text_backend=DEFAULT_TEXT_BACKEND):
+        self.use_corpus = use_corpus
+        # 'toc': jump to the section found via outline/目录, 'full': score every page
+        self.locator_mode = locator_mode
+        # 'region': extract tables only around dividend keywords, 'full': whole page, default settings
+        self.table_mode = table_mode
+        # 'inline': run tesseract in this process, 'deferred': leave cache misses to the OCR pool
+        self.ocr_mode = ocr_mode
+        self.ocr = PageOcr()
+        # 'text' / 'mixed' / 'scanned' from scan_detector, set per document
+        self.doc_type = None
+        # Early exit: stop scanning once a page of a candidate window scoring >= early_exit_min_score
+        # has produced early_exit_years consecutive years that agree with every other amount found.
+        # Off by default: it can miss rows on later pages that full mode would add (see
+        # scripts/bench_early_exit.py); TaskManager turns it on via its "early_exit" setting
+        self.early_exit = early_exit
+        self.early_exit_years = early_exit_years
+        self.early_exit_min_score = early_exit_min_score
+        # Locator scores of the candidates returned by the last _locate_target_pages call
+        self.candidate_scores = {}
+        # Memory-bounded mode: release page objects as soon as they are used (see PageTextCache)
+        self.memory_bounded = memory_bounded or rss_budget_mb is not None
+        self.rss_budget_mb = rss_budget_mb
+        # Text backend for locating pages ('pdfium' / 'pdfplumber'); tables always use pdfplumber
+        self.text_backend = text_backend
+        # Keyword sets, patterns and thresholds come from the per-process rule registry
+        self.rules = get_rules()
+        self.keywords = self.rules.locator_keywords
+        self.context_positive = self.rules.context_positive
+        self.context_negative = self.rules.context_negative
+        self.year_pattern = self.rules.year_pattern
+        self.amount_pattern = self.rules.amount_pattern
+        self.amount_unit_pattern = self.rules.amount_unit_pattern
+        self.page_scanner = self.rules.page_scanner
+        self.text_scanner = self.rules.text_scanner
+        # Section jump (outline / printed TOC)
+        self.section_keywords = self.rules.section_keywords
+        self.section_window_max = self.rules.section_window_max
+        self.toc_line_pattern = self.rules.toc_line_pattern
+        self.page_number_pattern = self.rules.page_number_pattern
+        # Region-restricted table extraction
+        self.table_keywords = self.rules.table_keywords
+        self.table_scanner = self.rules.table_scanner
+        self.table_margin_above = self.rules.table_margin_above
+        self.table_margin_below = self.rules.table_margin_below
+        # Page text cache stats of the last extract() call
+        self.last_stats = {}
         
-    def extract(self, pdf_path):
+    def extract(self, pdf_path, page_scores=None):
+        """
+        page_scores: optional {page_num: score} already computed by score_page_shard workers;
+        when given, the locator ranks these instead of scanning the document itself.
+        """
         result = []
+        self.last_stats = {}
+        self.candidate_scores = {}
         try:
             import os
             
             # Using pdfplumber to open the file.
             # Some PDFs might have restrictions. If extract_text fails for all pages, 
             # we might need to consider if it's a scanned PDF or has permissions issues.
-            with pdfplumber.open(pdf_path) as pdf:
+            corpus, file_hash = None, None
+            if self.use_corpus:
+                try:
+                    corpus = get_corpus()
+                    file_hash = corpus.file_hash(pdf_path)
+                except Exception as e:
+                    logger.warning(f"文本语料不可用，直接解析 PDF: {e}")
+                    corpus = None
+
+            with pdfplumber.open(pdf_path) as pdf, PageTextCache(pdf, os.path.basename(pdf_path), corpus, file_hash, self.memory_bounded, self.rss_budget_mb,
+                                                                             open_locator_backend(self.text_backend, pdf_path)) as page_text:
+                self.last_stats = page_text.stats
+                self.ocr = PageOcr(file_hash, deferred=self.ocr_mode == 'deferred', stats=page_text.stats)
                 # 0. Check if PDF is text-searchable
-                has_text_content = False
-                # Check first 20 pages or all pages if less
-                check_pages = range(min(20, len(pdf.pages)))
-                for i in check_pages:
-                    if pdf.pages[i].extract_text():
-                        has_text_content = True
-                        break
+                # Text documents skip probing; scanned documents go straight to the OCR route
+                self.doc_type = self._document_type(pdf, corpus, file_hash, os.path.basename(pdf_path))
+                page_text.stats['doc_type'] = self.doc_type
+                has_text_content = self.doc_type == 'text' or (self.doc_type == 'scanned' and HAS_OCR)
+                if self.doc_type == 'mixed':
+                    # Check first 20 pages or all pages if less
+                    check_pages = range(min(20, len(pdf.pages)))
+                    for i in check_pages:
+                        if page_text.locate_text(i):
+                            has_text_content = True
+                            break
                 
                 if not has_text_content:
                     logger.warning(f"文件似乎是纯图片/扫描件或有权限限制 (File: {os.path.basename(pdf_path)})")
@@ -56,7 +278,9 @@ class ProspectusExtractor:
 
                 # 1. Locate target pages
                 logger.debug(f"Scanning {pdf_path} for dividend sections...")
-                target_pages = self._locate_target_pages(pdf)
+                target_pages = self._locate_target_pages(page_text, page_scores)
+                if self.ocr.pending:
+                    return self._ocr_pending_result()
                 
                 if not target_pages:
                     logger.warning(f"未定位到分红章节: {pdf_path}")
@@ -69,15 +293,16 @@ class ProspectusExtractor:
                         if i in seen_fallback: continue
                         seen_fallback.add(i)
                         try:
-                            page = pdf.pages[i]
-                            text = page.extract_text()
+                            text = page_text.locate_text(i)
                             if (not text or len(text.strip()) < 50) and HAS_OCR:
-                                text = self._ocr_page(page)
+                                text = page_text.ocr_text(i, self._ocr_page)
                             if text and "201" in text and ("派发" in text or "股利" in text or "现金分红" in text):
                                 fallback_pages.append(i)
                                 if len(fallback_pages) >= 10: break
                         except: pass
                     
+                    if self.ocr.pending:
+                        return self._ocr_pending_result()
                     if fallback_pages:
                          target_pages = fallback_pages
                          logger.info(f"使用备选搜索逻辑定位到页面: {target_pages}")
@@ -87,29 +312,40 @@ class ProspectusExtractor:
                 logger.info(f"定位到目标页面: {target_pages} (File: {os.path.basename(pdf_path)})")
 
                 pages_to_scan = set()
+                window_score = {} # page -> best locator score of the candidate windows containing it
                 for p in target_pages:
                     # Scan current page + next 2 pages (reduced to avoid noise, but enough for tables)
                     for offset in range(3): 
                         if p + offset < len(pdf.pages):
                             pages_to_scan.add(p + offset)
+                            window_score[p + offset] = max(window_score.get(p + offset, 0), self.candidate_scores.get(p, 0))
                 
                 scan_list = sorted(list(pages_to_scan))
+                if self.early_exit:
+                    scan_list = self._rank_scan_list(scan_list, window_score)
+                page_text.stats.update({'scan_pages': len(scan_list), 'scan_pages_skipped': 0, 'early_exit': False})
                 found_data = False
                 
                 # Keep track of previous page text/header logic if needed for cross-page tables
                 last_page_header_years = []
+                page_text.stats.update({'table_pages': 0, 'table_pages_skipped': 0})
 
                 for idx, page_num in enumerate(scan_list):
                     logger.info(f"正在处理页面 {page_num + 1}/{len(pdf.pages)} ({idx + 1}/{len(scan_list)}) - {os.path.basename(pdf_path)}")
                     page = pdf.pages[page_num]
                     
-                    # A. Table Extraction
-                    tables = page.extract_tables()
+                    # A. Table Extraction (only around dividend keywords, strategy from page geometry)
+                    tables = self._extract_page_tables(page, page_text.text(page_num))
+                    if tables is None:
+                        page_text.stats['table_pages_skipped'] += 1
+                        tables = []
+                    else:
+                        page_text.stats['table_pages'] += 1
                     # Capture table context
                     table_context = ""
                     if tables:
                         # Extract some text context from around tables or just use page text
-                        table_context = page.extract_text() or ""
+                        table_context = page_text.text(page_num)
                     
                     data_from_table = self._process_tables(tables, page_num, table_context)
                     if data_from_table:
@@ -117,26 +353,35 @@ class ProspectusExtractor:
                         found_data = True
                     
                     # B. Text Extraction
-                    text = page.extract_text()
+                    text = page_text.text(page_num)
                     extract_method = "Text"
                     
                     # C. OCR Fallback (ENABLED)
                     if (not text or len(text.strip()) < 50) and HAS_OCR:
                         logger.info(f"页面 {page_num + 1} 文本较少，尝试 OCR 识别...")
-                        text = self._ocr_page(page)
+                        text = page_text.ocr_text(page_num, self._ocr_page)
                         extract_method = "OCR"
 
                     prev_text = ""
                     if idx > 0 and scan_list[idx-1] == page_num - 1:
                          try:
-                             prev_text = pdf.pages[scan_list[idx-1]].extract_text()
+                             prev_text = page_text.text(scan_list[idx-1])
                          except: pass
 
                     data_from_text = self._process_text(text, page_num, prev_text, extract_method)
                     if data_from_text:
                         result.extend(data_from_text)
                         found_data = True
+                    page_text.release(page_num)
+
+                    if self.early_exit and idx + 1 < len(scan_list) and self._confident(result, window_score):
+                        skipped = len(scan_list) - idx - 1
+                        page_text.stats.update({'scan_pages_skipped': skipped, 'early_exit': True})
+                        logger.info(f"提取结果已完整一致，提前结束: 跳过剩余 {skipped}/{len(scan_list)} 页 (File: {os.path.basename(pdf_path)})")
+                        break
                 
+                if self.ocr.pending:
+                    return self._ocr_pending_result()
                 if result:
                     return self._clean_result(result)
                 else:
@@ -147,18 +392,11 @@ class ProspectusExtractor:
             return [{'note': f'解析出错: {str(e)}', 'status': 'error'}]
 
     def _ocr_page(self, page):
-        """Perform OCR on a pdfplumber page object"""
+        """Perform OCR on a pdfplumber page object (300 dpi, cached by page-image hash)"""
         if not HAS_OCR:
             return ""
         try:
-            # High resolution for better OCR
-            # Some PDFs have very small text
-            im = page.to_image(resolution=300)
-            # Use custom config for Tesseract to handle financial numbers better
-            # --oem 1 (LSTM), --psm 6 (Assume a single uniform block of text)
-            custom_config = r'--oem 1 --psm 6'
-            text = pytesseract.image_to_string(im.original, lang='chi_sim+eng', config=custom_config)
-            return text
+            return self.ocr(page)
         except Exception as e:
             # Suppress noisy tesseract not found errors if we know it might fail
             if "tesseract is not installed" in str(e):
@@ -167,21 +405,51 @@ class ProspectusExtractor:
                 logger.warning(f"OCR 失败: {e}")
             return ""
 
-    def _locate_target_pages(self, pdf):
-        scores = {}
-        total_pages = len(pdf.pages)
+    def _ocr_pending_result(self):
+        """Deferred OCR: pages still waiting for the OCR pool; the manager re-queues the file once they are done."""
+        logger.info(f"等待 OCR 队列识别 {len(self.ocr.pending)} 页后重新提取")
+        return [{'note': f'等待 OCR: {len(self.ocr.pending)} 页', 'status': 'ocr_pending', 'ocr_images': list(self.ocr.pending)}]
+
+    def _scan_range(self, total_pages):
         # Scan from page 5 to 98%
         start_page = 5 
         end_page = max(total_pages - 2, int(total_pages * 0.99))
+        return start_page, end_page
+
+    def _document_type(self, pdf, corpus=None, file_hash=None, name=""):
+        """Structural text/mixed/scanned label, read from or recorded in the corpus per file hash."""
+        info = None
+        if corpus:
+            try:
+                info = corpus.get_doc_type(file_hash)
+            except Exception as e:
+                logger.warning(f"读取文档类型失败 {name}: {e}")
+        if info is None:
+            info = classify_document(pdf)
+            logger.info(f"文档类型判定: {info['label']} (抽样 {info['sampled']} 页, 文本页 {info['text_pages']}, 图片页 {info['image_pages']}, 用时 {info['elapsed_ms']} ms) (File: {name})")
+            if corpus:
+                try:
+                    corpus.put_doc_type(file_hash, info)
+                except Exception as e:
+                    logger.warning(f"记录文档类型失败 {name}: {e}")
+        return info['label']
 
-        # Heuristic: Check if this looks like a scanned PDF
+    def _looks_scanned(self, page_text, start_page, end_page):
+        if self.doc_type == 'text':
+            return False
+        if self.doc_type == 'scanned':
+            if HAS_OCR:
+                logger.info("文档结构判定为扫描件，启用OCR搜索模式...")
+            return True
+
+        # Mixed / unknown: Check if this looks like a scanned PDF
         is_scanned_pdf = False
         # Even if HAS_OCR is False, we check if text extraction works
         empty_pages_count = 0
         check_sample_indices = list(range(start_page, min(start_page + 10, end_page)))
         if check_sample_indices:
             for i in check_sample_indices:
-                if not pdf.pages[i].extract_text():
+                if not page_text.locate_text(i):
                     empty_pages_count += 1
             if empty_pages_count / len(check_sample_indices) > 0.8:
                 is_scanned_pdf = True
@@ -189,84 +457,383 @@ class ProspectusExtractor:
                     logger.info("检测到可能是扫描版/纯图片PDF，启用OCR搜索模式...")
                 else:
                     logger.warning("检测到可能是扫描版/纯图片PDF，但未启用OCR，可能无法定位章节")
+        return is_scanned_pdf
+
+    def _locate_target_pages(self, page_text, page_scores=None):
+        if page_scores is not None:
+            # Scores were merged from parallel page-range shards
+            return self._top_candidates(page_scores)
+
+        total_pages = len(page_text)
+        start_page, end_page = self._scan_range(total_pages)
+        is_scanned_pdf = self._looks_scanned(page_text, start_page, end_page)
 
         # In OCR mode, we increase step to avoid taking forever
         step = 5 if (is_scanned_pdf and HAS_OCR) else 1
 
-        for i in range(start_page, end_page, step):
+        # Section jump: score only the dividend section found via outline/TOC, full scan as fallback
+        if self.locator_mode == 'toc':
+            window = self._find_section_window(page_text)
+            if window:
+                scores = self._score_pages(page_text, window, is_scanned_pdf, end_page)
+                if scores:
+                    logger.info(f"通过目录/书签定位到分红章节窗口: {len(window)} 页 (共 {total_pages} 页)")
+                    return self._top_candidates(scores)
+                logger.info("目录/书签窗口内未找到候选页面，回退到全量扫描")
+
+        scores = self._score_pages(page_text, range(start_page, end_page, step), is_scanned_pdf, end_page)
+        return self._top_candidates(scores)
+
+    def _top_candidates(self, scores):
+        # Return top 15 candidates
+        sorted_pages = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        self.candidate_scores = dict(sorted_pages[:15])
+        return [p[0] for p in sorted_pages[:15]]
+
+    def _rank_scan_list(self, scan_list, window_score):
+        """
+        Orders the scan pages so the best candidate windows come first.
+        Runs of consecutive pages are kept together and in page order, so the cross-page
+        (previous page) logic sees the same neighbours as in a sorted scan.
+        """
+        runs = []
+        for page_num in scan_list:
+            if runs and runs[-1][-1] == page_num - 1:
+                runs[-1].append(page_num)
+            else:
+                runs.append([page_num])
+        runs.sort(key=lambda run: max(window_score.get(n, 0) for n in run), reverse=True)
+        return [n for run in runs for n in run]
+
+    def _confident(self, result, window_score):
+        """
+        Early-exit check: True when one page from a candidate window scoring at least
+        early_exit_min_score covers early_exit_years consecutive years, and every amount
+        found so far for those years agrees with it (within 1%).
+        """
+        by_year = {}
+        by_page = {}
+        for item in result:
+            year = str(item.get('year', '')).split('年')[0]
+            amount = item.get('amount') or 0
+            if not year.isdigit() or amount < 1:
+                continue
+            by_year.setdefault(year, []).append(amount)
+            page = item.get('page')
+            if isinstance(page, int) and window_score.get(page - 1, 0) >= self.early_exit_min_score:
+                by_page.setdefault(page, set()).add(int(year))
+
+        n = self.early_exit_years
+        for years in by_page.values():
+            years = sorted(years)
+            for i in range(len(years) - n + 1):
+                run = years[i:i + n]
+                if run[-1] - run[0] != n - 1:
+                    continue
+                if all(max(by_year[str(y)]) <= min(by_year[str(y)]) * 1.01 for y in run):
+                    return True
+        return False
+
+    def _score_pages(self, page_text, page_range, is_scanned_pdf, end_page):
+        """Scores each page in page_range; returns {page_num: score} for likely dividend pages."""
+        scores = {}
+        for i in page_range:
             try:
-                page = pdf.pages[i]
-                text = page.extract_text()
+                text = page_text.locate_text(i)
                 
                 # Fallback to OCR if text is missing and we suspect scanned PDF
                 if (not text or len(text.strip()) < 10) and is_scanned_pdf and HAS_OCR:
-                    text = self._ocr_page(page)
+                    text = page_text.ocr_text(i, self._ocr_page)
 
                 if not text:
                     # Final attempt: use empty check but if it's the last few pages, 
                     # we might still want to try OCR once
                     if i > end_page - 10 and HAS_OCR:
-                         text = self._ocr_page(page)
+                         text = page_text.ocr_text(i, self._ocr_page)
                     else:
                          continue
                 
                 if not text: continue
                 
-                score = 0
-                
-                # Check for "Cash Dividend" keywords specifically for high score
-                if '现金分红' in text:
-                    score += 15
-                
-                for kw in self.keywords:
-                    if kw in text:
-                        score += 5
-                
-                if score == 0:
-                    continue
-
-                if self.year_pattern.search(text):
-                    score += 10
-                else:
-                    score -= 5
-
-                for cw in self.context_positive:
-                    if cw in text:
-                        score += 5
-                
-                for nw in self.context_negative:
-                    if nw in text:
-                        score -= 15
-                
-                lines = text.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    # Check for section titles
-                    if any(kw in line for kw in self.keywords):
-                        if len(line) < 60 and (
-                            line.startswith('十') or 
-                            line.startswith('九') or 
-                            line.startswith('八') or 
-                            line.startswith('七') or 
-                            line.startswith('（') or 
-                            line[0].isdigit() or
-                            re.match(r'^[一二三四五六七八九十]、', line)
-                        ):
-                            score += 30
-                        if '......' in line: 
-                            score -= 50 # TOC
-                        if '政策' in line or '规划' in line or '原则' in line:
-                            score -= 5
-
+                score = self._score_page_text(text)
                 if score > 8:
                     scores[i] = score
 
             except Exception:
                 continue
+
+        return scores
+
+    def _score_page_text(self, text):
+        """Dividend-section score of one page's text (pages scoring > 8 are candidates)."""
+        # One keyword pass over the page; hits are mapped back to their lines
+        lines, line_found = self.page_scanner.line_hits(text)
+        found = set().union(*line_found)
+        score = 0
         
-        # Return top 15 candidates
-        sorted_pages = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        return [p[0] for p in sorted_pages[:15]]
+        # Check for "Cash Dividend" keywords specifically for high score
+        if '现金分红' in found:
+            score += 15
+        
+        for kw in self.keywords:
+            if kw in found:
+                score += 5
+        
+        if score == 0:
+            return 0
+
+        if self.year_pattern.search(text):
+            score += 10
+        else:
+            score -= 5
+
+        for cw in self.context_positive:
+            if cw in found:
+                score += 5
+        
+        for nw in self.context_negative:
+            if nw in found:
+                score -= 15
+        
+        for line, line_kws in zip(lines, line_found):
+            line = line.strip()
+            # Check for section titles
+            if any(kw in line_kws for kw in self.keywords):
+                if len(line) < 60 and (
+                    line.startswith('十') or 
+                    line.startswith('九') or 
+                    line.startswith('八') or 
+                    line.startswith('七') or 
+                    line.startswith('（') or 
+                    line[0].isdigit() or
+                    self.rules.heading_pattern.match(line)
+                ):
+                    score += 30
+                if '......' in line: 
+                    score -= 50 # TOC
+                if '政策' in line or '规划' in line or '原则' in line:
+                    score -= 5
+
+        return score
+
+    def _find_section_window(self, page_text):
+        """
+        Returns the page indices of the dividend section (股利分配 / 利润分配) located via
+        the PDF outline, or via the printed 目录 when there is no usable outline.
+        Returns None if neither identifies the section.
+        """
+        section_pages = set()
+        for start, end in self._outline_sections(page_text.pdf) or self._toc_sections(page_text):
+            start = max(0, start)
+            end = min(len(page_text), max(end, start + 3) + 2, start + self.section_window_max)
+            section_pages.update(range(start, end))
+        return sorted(section_pages) or None
+
+    def _outline_sections(self, pdf):
+        """[(start, end)] page ranges of outline entries whose title names the dividend section."""
+        try:
+            from pdfminer.pdftypes import resolve1
+            from pdfminer.psparser import PSLiteral
+
+            page_index = {page.page_obj.pageid: i for i, page in enumerate(pdf.pages)}
+            entries = []
+            for level, title, dest, action, _ in pdf.doc.get_outlines():
+                if dest is None and action is not None:
+                    action = resolve1(action)
+                    if isinstance(action, dict):
+                        dest = action.get('D')
+                dest = resolve1(dest)
+                if isinstance(dest, (PSLiteral, bytes, str)):
+                    name = dest.name if isinstance(dest, PSLiteral) else dest
+                    dest = resolve1(pdf.doc.get_dest(name))
+                if isinstance(dest, dict):
+                    dest = resolve1(dest.get('D'))
+                if isinstance(dest, list) and dest:
+                    objid = getattr(dest[0], 'objid', None)
+                    if objid in page_index:
+                        entries.append((level, str(title or ''), page_index[objid]))
+        except Exception:
+            # No outline (PDFNoOutlines) or a malformed one
+            return []
+
+        sections = []
+        for k, (level, title, page_num) in enumerate(entries):
+            if not any(kw in title for kw in self.section_keywords):
+                continue
+            end = page_num + self.section_window_max
+            for next_level, _, next_page in entries[k + 1:]:
+                if next_level <= level and next_page > page_num:
+                    end = next_page
+                    break
+            sections.append((page_num, end))
+        return sections[:5]
+
+    def _toc_sections(self, page_text):
+        """[(start, end)] page ranges parsed from the printed 目录 in the first pages."""
+        toc_entries = []
+        for i in range(min(15, len(page_text))):
+            for line in page_text.locate_text(i).split('\n'):
+                m = self.toc_line_pattern.match(line.strip())
+                if m:
+                    toc_entries.append((m.group(1), int(m.group(2))))
+        if not toc_entries:
+            return []
+
+        offset = self._page_number_offset(page_text)
+        sections = []
+        for k, (title, printed) in enumerate(toc_entries):
+            if not any(kw in title for kw in self.section_keywords):
+                continue
+            next_printed = [p for _, p in toc_entries[k + 1:] if p > printed]
+            end_printed = next_printed[0] if next_printed else printed + self.section_window_max
+            if offset is None:
+                # Unknown front matter length: widen the window past the printed number
+                sections.append((printed - 1, end_printed + 30))
+            else:
+                sections.append((printed + offset, end_printed + offset))
+        return sections[:5]
+
+    def _page_number_offset(self, page_text):
+        """
+        Physical page index minus printed page number, read from page footers/headers
+        (e.g. "23" or "1-1-23") of a few body pages. None if no page numbers are found.
+        """
+        offsets = {}
+        for i in range(5, min(15, len(page_text))):
+            lines = [l.strip() for l in page_text.locate_text(i).split('\n') if l.strip()]
+            for line in lines[-1:] + lines[:1]:
+                m = self.page_number_pattern.match(line)
+                if m:
+                    offset = i - int(m.group(1))
+                    offsets[offset] = offsets.get(offset, 0) + 1
+                    break
+        if not offsets:
+            return None
+        return max(offsets.items(), key=lambda x: x[1])[0]
+
+    def _extract_page_tables(self, page, text):
+        """
+        Table extraction restricted to the regions around dividend keywords.
+        Each region is a horizontal band around the keyword hits, grown to the full extent of
+        the ruling lines crossing it so a ruled table is never cut. The strategy is chosen per
+        axis from the page's line/rect objects: 'lines' where rulings exist, 'text' where they
+        do not (e.g. three-line tables without vertical rules).
+        Returns None when the page is skipped: no keyword that _process_tables could accept,
+        or no table-like geometry (no rulings and no column-aligned words) around the hits.
+        When the text has a keyword but the page's chars yield no band, the whole page is used.
+        """
+        if self.table_mode == 'full':
+            return page.extract_tables()
+
+        # Rows without a table keyword are discarded by _process_tables anyway
+        if not self.table_scanner.contains_any(text):
+            return None
+
+        bands = self._keyword_bands(page)
+        if not bands:
+            # The layout text has a keyword the stream-ordered chars do not reproduce:
+            # no band to restrict to, so take the whole page as before
+            logger.debug(f"页面 {page.page_number} 关键字未能定位到字符，整页提取表格")
+            return page.extract_tables()
+
+        edges = self._ruling_edges(page)
+        tables = []
+        extracted = False
+        for top, bottom in bands:
+            top, bottom, has_h, has_v = self._grow_band(top, bottom, edges)
+            x0, page_top, x1, page_bottom = page.bbox
+            region = page.crop((x0, max(page_top, top - 2), x1, min(page_bottom, bottom + 2)))
+
+            if not has_v and not self._has_text_columns(region):
+                continue
+
+            settings = {
+                'vertical_strategy': 'lines' if has_v else 'text',
+                'horizontal_strategy': 'lines' if has_h else 'text',
+                # Columns were already confirmed by _has_text_columns (header + one data row is enough)
+                'min_words_vertical': 2,
+            }
+            if has_h != has_v:
+                # Text-derived edges stop at the words, short of the ruling lines on the other axis
+                settings['intersection_tolerance'] = 10
+            tables.extend(region.extract_tables(settings))
+            extracted = True
+
+        return tables if extracted else None
+
+    def _keyword_bands(self, page):
+        """
+        Merged (top, bottom) bands around the table keyword hits of the page's chars.
+        A pdfminer char may carry more or less than one code point (ligatures, ToUnicode
+        mappings), so hit offsets are mapped back to chars through an offset index.
+        """
+        chars = page.chars
+        owner = []  # offset in char_text -> index in chars
+        for i, c in enumerate(chars):
+            owner.extend([i] * len(c['text']))
+        char_text = ''.join(c['text'] for c in chars)
+        spans = []
+        for pos, kw in self.table_scanner.hits(char_text):
+            top = chars[owner[pos]]['top'] - self.table_margin_above
+            bottom = chars[owner[pos + len(kw) - 1]]['bottom'] + self.table_margin_below
+            spans.append((top, bottom))
+
+        bands = []
+        for top, bottom in sorted(spans):
+            if bands and top <= bands[-1][1]:
+                bands[-1] = (bands[-1][0], max(bands[-1][1], bottom))
+            else:
+                bands.append((top, bottom))
+        return bands
+
+    def _ruling_edges(self, page):
+        """(x0, top, x1, bottom, orientation) of the page's ruling lines; rects give their four sides."""
+        edges = []
+        for obj in page.lines:
+            orientation = 'h' if abs(obj['bottom'] - obj['top']) < 2 else 'v' if abs(obj['x1'] - obj['x0']) < 2 else None
+            if orientation:
+                edges.append((obj['x0'], obj['top'], obj['x1'], obj['bottom'], orientation))
+        for obj in page.rects:
+            x0, top, x1, bottom = obj['x0'], obj['top'], obj['x1'], obj['bottom']
+            if bottom - top < 2:
+                edges.append((x0, top, x1, bottom, 'h'))
+            elif x1 - x0 < 2:
+                edges.append((x0, top, x1, bottom, 'v'))
+            else:
+                edges.append((x0, top, x1, top, 'h'))
+                edges.append((x0, bottom, x1, bottom, 'h'))
+                edges.append((x0, top, x0, bottom, 'v'))
+                edges.append((x1, top, x1, bottom, 'v'))
+        return edges
+
+    def _grow_band(self, top, bottom, edges):
+        """Extends the band to every ruling connected to it; reports which orientations it holds."""
+        members = set()
+        changed = True
+        while changed:
+            changed = False
+            for i, (x0, e_top, x1, e_bottom, orientation) in enumerate(edges):
+                if i in members or e_bottom < top - 2 or e_top > bottom + 2:
+                    continue
+                members.add(i)
+                if e_top < top or e_bottom > bottom:
+                    top, bottom = min(top, e_top), max(bottom, e_bottom)
+                    changed = True
+        orientations = {edges[i][4] for i in members}
+        return top, bottom, 'h' in orientations, 'v' in orientations
+
+    def _has_text_columns(self, region, min_rows=2, min_columns=3):
+        """True if at least min_columns x-positions start a word on min_rows or more text lines."""
+        rows = {}
+        for word in region.extract_words():
+            rows.setdefault(round(word['top'] / 3), set()).add(round(word['x0'] / 10))
+        if len(rows) < min_rows:
+            return False
+        column_rows = {}
+        for xs in rows.values():
+            for x in xs:
+                column_rows[x] = column_rows.get(x, 0) + 1
+        return sum(1 for n in column_rows.values() if n >= min_rows) >= min_columns
 
     def _process_tables(self, tables, page_num, context_text=""):
         extracted_data = []
@@ -275,11 +842,12 @@ class ProspectusExtractor:
 
         # Keywords that MUST be present in the row for it to be a valid dividend row
         # We need a stricter check because tables often have "Cash Flow" or "Assets" mixed in
-        strict_keywords = ['分红', '股利', '利润分配', '现金分配']
+        strict_keywords = self.table_keywords
         
         # Keywords that, if found in the row, might invalidate it as a "dividend" row 
         # unless strongly overridden (e.g., "Cash received" -> invalid)
-        negative_keywords = ['收到', '流入', '流出', '支付', '筹资', '投资', '资产', '余额', '净额', '费用', '收入', '成本', '总额', '净利润', '未分配利润']
+        negative_keywords = self.rules.table_negative_keywords
+        row_scanner = self.rules.table_row_scanner
 
         for i, table in enumerate(tables):
             # Pre-filter table: must contain keywords to be relevant?
@@ -307,8 +875,8 @@ class ProspectusExtractor:
                     cell_str = str(cell).replace('\n', '')
                     matches = self.year_pattern.findall(cell_str)
                     if matches:
-                        # Valid years: 2015-2024 (approx) - filter out future years or too old
-                        valid_years = [y for y in matches if 2015 <= int(y) <= 2024]
+                        # Valid years: rules.min_year..max_year - filter out future years or too old
+                        valid_years = [y for y in matches if self.rules.valid_year(y)]
                         if valid_years:
                             # Use the last valid year found in the cell (e.g. 2022.12.31/2022年度 -> 2022)
                             current_row_years[c_idx] = valid_years[-1]
@@ -322,13 +890,14 @@ class ProspectusExtractor:
                 for r_idx in range(header_row_idx + 1, len(table)):
                     row = table[r_idx]
                     row_text = ''.join([str(c) for c in row if c])
+                    row_found = row_scanner.found(row_text)
                     
                     # STRICTER CHECK:
                     # 1. Must have at least one strict keyword (Dividend/Cash Dividend)
                     # 2. Must NOT have negative keywords (received, flow, assets) UNLESS explicitly "Cash Dividend" is there
                     
-                    has_strict_kw = any(kw in row_text for kw in strict_keywords)
-                    has_negative_kw = any(nkw in row_text for nkw in negative_keywords)
+                    has_strict_kw = any(kw in row_found for kw in strict_keywords)
+                    has_negative_kw = any(nkw in row_found for nkw in negative_keywords)
                     
                     # Special Case: "现金分红" is very strong, overrides negative keywords (rare but possible)
                     # But usually "支付其他与筹资活动有关的现金" contains "现金", so we must be careful.
@@ -338,7 +907,7 @@ class ProspectusExtractor:
                     if has_strict_kw:
                         is_valid_row = True
                         # Double check for false positives like "Cash received from dividend" (investing activity)
-                        if '收到' in row_text or '流入' in row_text:
+                        if '收到' in row_found or '流入' in row_found:
                             is_valid_row = False
                             
                     if not is_valid_row:
@@ -378,24 +947,25 @@ class ProspectusExtractor:
                 if not year_matches:
                     continue
                 # Year validation
-                years = sorted(list(set([y for y in year_matches if 2015 <= int(y) <= 2024])))
+                years = sorted(list(set([y for y in year_matches if self.rules.valid_year(y)])))
                 if not years: continue
                 
                 year = years[0] # Take the first found year in the row
 
                 # STRICTER CHECK for Horizontal Rows too
-                has_strict_kw = any(kw in row_text for kw in strict_keywords)
-                has_negative_kw = any(nkw in row_text for nkw in negative_keywords)
+                row_found = row_scanner.found(row_text)
+                has_strict_kw = any(kw in row_found for kw in strict_keywords)
+                has_negative_kw = any(nkw in row_found for nkw in negative_keywords)
                 
                 if not has_strict_kw:
                      continue
-                if '收到' in row_text or '流入' in row_text:
+                if '收到' in row_found or '流入' in row_found:
                      continue
                 
                 amounts = []
                 for cell in row_clean:
                     # Enhanced extraction for mixed text cells
-                    matches = re.findall(r'(\d{1,3}(,\d{3})*(\.\d+)?)\s*(万?元|亿元)', cell)
+                    matches = self.amount_unit_pattern.findall(cell)
                     if matches:
                         for amt_str, _, _, unit in matches:
                             try:
@@ -488,20 +1058,22 @@ class ProspectusExtractor:
             
         if not full_text: return []
         
-        lines = full_text.split('\n')
+        # One keyword pass over the text; line_found[i] holds the keywords present in lines[i]
+        lines, line_found = self.text_scanner.line_hits(full_text)
         
         for i, line in enumerate(lines):
+            kws = line_found[i]
             # 1. Standard Pattern: Same line has Year and Amount
             # STRICTER: Must NOT contain negative keywords like "Cash Flow", "Assets" unless "Dividend" is explicit
-            if ('分红' in line or '派发' in line or '利润分配' in line) and self.year_pattern.search(line):
+            if ('分红' in kws or '派发' in kws or '利润分配' in kws) and self.year_pattern.search(line):
                 # Filter out obvious false positives
-                if any(bad in line for bad in ['现金流量', '资产总额', '净利润', '筹资', '投资', '流入', '流出']):
-                    if '分红' not in line and '股利' not in line: # If no explicit dividend keyword, skip
+                if any(bad in kws for bad in ['现金流量', '资产总额', '净利润', '筹资', '投资', '流入', '流出']):
+                    if '分红' not in kws and '股利' not in kws: # If no explicit dividend keyword, skip
                         continue
 
                 year = self.year_pattern.search(line).group()
                 # Pattern: 1000.00万元
-                matches = re.findall(r'(\d{1,3}(,\d{3})*(\.\d+)?)\s*(万?元|亿元)', line)
+                matches = self.amount_unit_pattern.findall(line)
                 if matches:
                     for m in matches:
                         amt_str = m[0].replace(',', '')
@@ -515,7 +1087,7 @@ class ProspectusExtractor:
                                 final_val = val / 10000
                             
                             # Year Check
-                            if 2015 <= int(year[:4]) <= 2024:
+                            if self.rules.valid_year(year[:4]):
                                 if final_val > 1:
                                     results.append({
                                         'year': year,
@@ -539,7 +1111,7 @@ class ProspectusExtractor:
                 year_match = self.year_pattern.search(clean_line)
                 if year_match:
                     year = year_match.group()
-                    if not (2015 <= int(year[:4]) <= 2024):
+                    if not self.rules.valid_year(year[:4]):
                         continue
 
                     # Look ahead up to 15 lines for amount keywords
@@ -547,14 +1119,15 @@ class ProspectusExtractor:
                     for j in range(1, 16):
                         if i + j < len(lines):
                             next_line = lines[i + j]
+                            next_kws = line_found[i + j]
                             context_paragraph.append(next_line.strip())
                             # Broaden keywords for descriptive paragraphs
-                            if any(kw in next_line for kw in ['派发', '分红', '分配', '股利', '利润分配']):
+                            if any(kw in next_kws for kw in ['派发', '分红', '分配', '股利', '利润分配']):
                                 # Reject negative context
-                                if any(bad in next_line for bad in ['现金流量', '资产', '筹资', '投资']):
+                                if any(bad in next_kws for bad in ['现金流量', '资产', '筹资', '投资']):
                                     continue
                                 
-                                amt_matches = re.findall(r'(\d{1,3}(,\d{3})*(\.\d+)?)\s*(万?元|亿元)', next_line)
+                                amt_matches = self.amount_unit_pattern.findall(next_line)
                                 if amt_matches:
                                     for m in amt_matches:
                                         try:
@@ -576,13 +1149,13 @@ class ProspectusExtractor:
                                     break 
                                     
             # 3. Heuristic Pattern: "Cash Dividend ... 3200.00" without year in line, infer from context
-            elif ('现金分红' in line or '分红金额' in line or '利润分配' in line or '股利分配' in line) and not self.year_pattern.search(line):
+            elif ('现金分红' in kws or '分红金额' in kws or '利润分配' in kws or '股利分配' in kws) and not self.year_pattern.search(line):
                 # STRICTER: Must not contain negative keywords
-                if any(bad in line for bad in ['现金流量', '资产', '筹资', '投资', '流入', '流出']):
+                if any(bad in kws for bad in ['现金流量', '资产', '筹资', '投资', '流入', '流出']):
                     continue
                 
                 # Check for amount with optional unit
-                matches = re.findall(r'(\d{1,3}(,\d{3})*(\.\d+)?)\s*(万?元|亿元)?', line)
+                matches = self.rules.amount_optional_unit_pattern.findall(line)
                 valid_matches = []
                 for m in matches:
                     try:
@@ -604,7 +1177,7 @@ class ProspectusExtractor:
                             context_lines.insert(0, prev_line.strip())
                             yms = self.year_pattern.findall(prev_line)
                             if yms:
-                                found_years = [y for y in yms if 2015 <= int(y) <= 2024]
+                                found_years = [y for y in yms if self.rules.valid_year(y)]
                                 if found_years:
                                     break
                     
@@ -632,18 +1205,18 @@ class ProspectusExtractor:
                         })
 
             # 4. Pattern: "Year ... Distribute ... Amount" (Long description)
-            if ('分红' in line or '分配' in line) and ('万元' in line or '亿元' in line):
+            if ('分红' in kws or '分配' in kws) and ('万元' in kws or '亿元' in kws):
                  # Reject negative context
-                 if any(bad in line for bad in ['现金流量', '资产', '筹资', '投资']):
+                 if any(bad in kws for bad in ['现金流量', '资产', '筹资', '投资']):
                     continue
 
                  year_match = self.year_pattern.search(line)
                  if year_match:
                      year = year_match.group()
-                     if not (2015 <= int(year[:4]) <= 2024):
+                     if not self.rules.valid_year(year[:4]):
                         continue
 
-                     amount_matches = re.findall(r'(\d{1,3}(,\d{3})*(\.\d+)?)\s*(万?元|亿元)', line)
+                     amount_matches = self.amount_unit_pattern.findall(line)
                      for amt_str, _, _, unit in amount_matches:
                          try:
                              val = float(amt_str.replace(',', ''))
@@ -692,36 +1265,115 @@ class ProspectusExtractor:
 
         return sorted(final_data.values(), key=lambda x: x['year'], reverse=True)
 
-def process_pdf_worker(pdf_file, pdf_dir, log_queue=None):
+# Documents with more pages than this get their page-scoring pass split into
+# page-range shards that run across the extraction process pool.
+PAGE_SHARD_THRESHOLD = 400
+PAGE_SHARD_SIZE = 150
+# Files smaller than this are never planned for sharding (saves opening them twice)
+PAGE_SHARD_MIN_BYTES = 2 * 1024 * 1024
+# A document is re-queued at most this many times while waiting for the OCR pool
+# (locator pages, fallback pages, scan pages); after that it runs OCR inline.
+OCR_DEFER_ROUNDS = 4
+
+def _setup_worker_logging(log_queue):
+    """Route this worker process's logs to the manager's log queue."""
+    if not log_queue:
+        return
+    logger = logging.getLogger()
+    # Clear default handlers to avoid duplicates or lost logs
+    # Check if QueueHandler is already attached (though usually it's clean in new process)
+    is_configured = any(h.__class__.__name__ == 'QueueHandler' for h in logger.handlers)
+    if not is_configured:
+        logger.handlers = []
+        
+        # Define simple QueueHandler locally to avoid import issues or dependency
+        class QueueHandler(logging.Handler):
+            def __init__(self, q):
+                super().__init__()
+                self.q = q
+            def emit(self, record):
+                try:
+                    self.q.put_nowait(record)
+                except Exception:
+                    self.handleError(record)
+                    
+        logger.addHandler(QueueHandler(log_queue))
+        logger.setLevel(logging.INFO)
+
+def plan_page_shards(pdf_file, pdf_dir, log_queue=None, text_backend=DEFAULT_TEXT_BACKEND):
+    """
+    Worker function deciding whether a document's page-scoring pass should be sharded.
+    Returns (pdf_file, shards, error). shards is None when the document is below
+    PAGE_SHARD_THRESHOLD, looks scanned, or its section is reachable via outline/TOC;
+    otherwise a list of (first_page, stop_page, end_page) ranges for score_page_shard.
+    """
+    try:
+        _setup_worker_logging(log_queue)
+        pdf_path = os.path.join(pdf_dir, pdf_file)
+        extractor = ProspectusExtractor(text_backend=text_backend)
+        with pdfplumber.open(pdf_path) as pdf:
+            total_pages = len(pdf.pages)
+            if total_pages <= PAGE_SHARD_THRESHOLD:
+                return pdf_file, None, None
+
+            corpus = get_corpus()
+            file_hash = corpus.file_hash(pdf_path)
+            with PageTextCache(pdf, pdf_file, corpus, file_hash, text_backend=open_locator_backend(text_backend, pdf_path)) as page_text:
+                extractor.doc_type = extractor._document_type(pdf, corpus, file_hash, pdf_file)
+                start_page, end_page = extractor._scan_range(total_pages)
+                if extractor._looks_scanned(page_text, start_page, end_page):
+                    return pdf_file, None, None
+                if extractor.locator_mode == 'toc' and extractor._find_section_window(page_text):
+                    return pdf_file, None, None
+
+        shards = [
+            (first, min(first + PAGE_SHARD_SIZE, end_page), end_page)
+            for first in range(start_page, end_page, PAGE_SHARD_SIZE)
+        ]
+        logging.getLogger().info(f"大文件分片扫描: {pdf_file} ({total_pages} 页) 拆分为 {len(shards)} 个分片")
+        return pdf_file, shards, None
+    except Exception as e:
+        return pdf_file, None, str(e)
+
+def score_page_shard(pdf_file, pdf_dir, shard, log_queue=None, rss_budget_mb=None, text_backend=DEFAULT_TEXT_BACKEND):
+    """
+    Worker function scoring one page-range shard of a large text PDF.
+    Returns (pdf_file, {page_num: score}, error); the manager merges all shards
+    and passes the result to process_pdf_worker as page_scores.
+    rss_budget_mb: run the shard in memory-bounded mode with this per-worker budget.
+    text_backend: backend used for page text (see text_backends).
+    """
+    try:
+        _setup_worker_logging(log_queue)
+        first_page, stop_page, end_page = shard
+        pdf_path = os.path.join(pdf_dir, pdf_file)
+        extractor = ProspectusExtractor(text_backend=text_backend)
+        corpus = get_corpus()
+        with pdfplumber.open(pdf_path) as pdf, PageTextCache(pdf, pdf_file, corpus, corpus.file_hash(pdf_path), rss_budget_mb=rss_budget_mb,
+                                                             text_backend=open_locator_backend(text_backend, pdf_path)) as page_text:
+            scores = extractor._score_pages(page_text, range(first_page, stop_page), False, end_page)
+        return pdf_file, scores, None
+    except Exception as e:
+        return pdf_file, {}, str(e)
+
+def process_pdf_worker(pdf_file, pdf_dir, log_queue=None, page_scores=None, defer_ocr=False, rss_budget_mb=None, text_backend=DEFAULT_TEXT_BACKEND,
+                       early_exit=False):
     """
     Worker function for multiprocessing.
     Instantiates its own extractor to avoid pickling issues and ensure thread/process safety.
+    page_scores: merged shard scores for large documents (see plan_page_shards).
+    defer_ocr: leave uncached OCR pages to the manager's OCR pool; the result is then a
+    single 'ocr_pending' entry listing the page images to recognise.
+    rss_budget_mb: run in memory-bounded mode with this per-worker RSS budget.
+    text_backend: backend used to locate pages ('pdfium' / 'pdfplumber').
+    early_exit: stop scanning once the result is complete and consistent (see ProspectusExtractor).
+    Every returned row carries the document's peak_rss_mb and the rules_version stamp.
     """
     try:
         import os
         
         # Configure logging if log_queue is provided
-        if log_queue:
-            logger = logging.getLogger()
-            # Clear default handlers to avoid duplicates or lost logs
-            # Check if QueueHandler is already attached (though usually it's clean in new process)
-            is_configured = any(h.__class__.__name__ == 'QueueHandler' for h in logger.handlers)
-            if not is_configured:
-                logger.handlers = []
-                
-                # Define simple QueueHandler locally to avoid import issues or dependency
-                class QueueHandler(logging.Handler):
-                    def __init__(self, q):
-                        super().__init__()
-                        self.q = q
-                    def emit(self, record):
-                        try:
-                            self.q.put_nowait(record)
-                        except Exception:
-                            self.handleError(record)
-                            
-                logger.addHandler(QueueHandler(log_queue))
-                logger.setLevel(logging.INFO)
+        _setup_worker_logging(log_queue)
 
         # Log startup with PID
         logger = logging.getLogger()
@@ -730,8 +1382,10 @@ def process_pdf_worker(pdf_file, pdf_dir, log_queue=None):
         pdf_path = os.path.join(pdf_dir, pdf_file)
         
         # Initialize extractor inside the process
-        extractor = ProspectusExtractor()
-        dividends = extractor.extract(pdf_path)
+        extractor = ProspectusExtractor(ocr_mode='deferred' if defer_ocr else 'inline', rss_budget_mb=rss_budget_mb,
+                                        text_backend=text_backend, early_exit=early_exit)
+        dividends = extractor.extract(pdf_path, page_scores)
+        peak_rss_mb = extractor.last_stats.get('peak_rss_mb')
         
         stock_code = pdf_file.split('_')[0]
         stock_name = pdf_file.split('_')[1].replace('.pdf', '') if '_' in pdf_file else 'Unknown'
@@ -743,6 +1397,8 @@ def process_pdf_worker(pdf_file, pdf_dir, log_queue=None):
                 div['code'] = stock_code
                 div['name'] = stock_name
                 div['source_file'] = pdf_file
+                div['peak_rss_mb'] = round(peak_rss_mb) if peak_rss_mb else None
+                div['rules_version'] = extractor.rules.stamp
                 
                 # Ensure fields exist even if it's an error/note object
                 if 'year' not in div: div['year'] = 'N/A'
@@ -763,7 +1419,8 @@ def process_pdf_worker(pdf_file, pdf_dir, log_queue=None):
                 'source_file': pdf_file,
                 'method': 'N/A',
                 'context': '',
-                'note': '未提取到数据'
+                'note': '未提取到数据',
+                'rules_version': extractor.rules.stamp
             })
             
         return pdf_file, cleaned_results, None
@@ -0,0 +1,78 @@
+import re
+import bisect
+
+AMOUNT_NUM = r"-?\d{1,4}(?:,\d{3})*(?:\.\d+)?"
+AMOUNT_UNIT = r"万?元|亿元|亿"
+# Years are looked up at most this far before a value list ("2021年、2020年...分别为")
+LIST_YEAR_LOOKBACK = 120
+# Per-share amounts ("每10股派发现金1元") are not totals
+PER_SHARE_LOOKBACK = 6
+PER_SHARE_MARKERS = ('每10股', '每股', '每十股')
+
+
+class FinancialMatcher:
+    """
+    Year/value extraction for dividend total, net profit and operating cash flow.
+
+    field_labels maps an output field to (label regex, max gap before the amount). Every
+    label regex and gap is bounded, so a match attempt at any position looks at a bounded
+    number of characters and one finditer pass is linear in the chunk length (no `.*?`
+    runs that backtrack across the whole chunk).
+
+    Each value goes to the nearest year mentioned before it (the chunk's first year when
+    none precedes it); a value list after one label ("分别为 A、B 和 C") is mapped in
+    order onto the years listed just before it. Returns one record per year, carrying
+    the first value found for each field of that year.
+    """
+    def __init__(self, field_labels, year_pattern):
+        self.year_pattern = year_pattern
+        alternatives = []
+        for field, (label, gap) in field_labels.items():
+            alternatives.append(f"(?P<{field}>{label})[^0-9\\n]{{0,{gap}}}?")
+        self.pattern = re.compile(
+            f"(?:{'|'.join(alternatives)})"
+            f"(?P<num>{AMOUNT_NUM})\\s*(?P<unit>{AMOUNT_UNIT})"
+            f"(?P<rest>(?:\\s*[、，,和及与]\\s*{AMOUNT_NUM}\\s*(?:{AMOUNT_UNIT})?){{0,5}})"
+        )
+        self.rest_pattern = re.compile(f"({AMOUNT_NUM})\\s*({AMOUNT_UNIT})?")
+        self.fields = list(field_labels)
+
+    def match(self, text, normalize):
+        """
+        Records [{'year', field: value, ...}] for text; normalize(value, unit) converts
+        an amount to the output unit.
+        """
+        years = [(m.start(), m.group(1)) for m in self.year_pattern.finditer(text)]
+        if not years:
+            return []
+        year_pos = [p for p, _ in years]
+        records = {}
+
+        def put(year, field, value):
+            record = records.setdefault(year, {'year': year})
+            record.setdefault(field, value)
+
+        for m in self.pattern.finditer(text):
+            field = next(f for f in self.fields if m.group(f) is not None)
+            start = m.start()
+            if field == 'amount_text' and any(mark in text[max(0, start - PER_SHARE_LOOKBACK):start] for mark in PER_SHARE_MARKERS):
+                continue
+            values = [(m.group('num'), m.group('unit'))]
+            unit = m.group('unit')
+            for v in self.rest_pattern.finditer(m.group('rest')):
+                values.append((v.group(1), v.group(2) or unit))
+
+            k = bisect.bisect_left(year_pos, start)
+            if len(values) > 1:
+                # Distinct years listed shortly before the label, in order of appearance
+                listed = []
+                for p, y in years[bisect.bisect_left(year_pos, start - LIST_YEAR_LOOKBACK):k]:
+                    if y not in listed:
+                        listed.append(y)
+                if len(listed) >= len(values):
+                    for year, (num, u) in zip(listed[-len(values):], values):
+                        put(year, field, normalize(num, u))
+                    continue
+            year = years[k - 1][1] if k else years[0][1]
+            put(year, field, normalize(*values[0]))
+        return list(records.values())
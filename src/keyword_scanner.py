@@ -0,0 +1,82 @@
+import re
+import bisect
+from functools import lru_cache
+
+
+class KeywordScanner:
+    """
+    Multi-keyword scanner returning every (position, keyword) hit of a text in one pass,
+    including overlapping and nested keywords (e.g. 派发现金 / 现金分红 / 分红).
+
+    The keyword set is compiled once into a single longest-first alternation, which the
+    C regex engine walks as a trie; after each hit the scan resumes at the next character
+    so overlapping keywords are not skipped, and shorter keywords that are prefixes of
+    the matched one are emitted from a precomputed table. This yields the same hit set as
+    an Aho-Corasick automaton while keeping the per-character loop out of Python.
+    """
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(k for k in keywords if k))
+        ordered = sorted(self.keywords, key=len, reverse=True)
+        self.max_len = len(ordered[0]) if ordered else 0
+        self._pattern = re.compile('|'.join(re.escape(k) for k in ordered)) if ordered else None
+        self._prefixes = {
+            k: [p for p in self.keywords if p != k and k.startswith(p)]
+            for k in self.keywords
+        }
+
+    def hits(self, text):
+        """All (position, keyword) hits, ordered by position."""
+        results = []
+        if not text or self._pattern is None:
+            return results
+        search = self._pattern.search
+        m = search(text)
+        while m:
+            pos, kw = m.start(), m.group()
+            results.append((pos, kw))
+            for prefix in self._prefixes[kw]:
+                results.append((pos, prefix))
+            m = search(text, pos + 1)
+        return results
+
+    def search(self, text, pos=0):
+        """First (position, keyword) hit at or after pos (longest keyword at that position), or None."""
+        if not text or self._pattern is None:
+            return None
+        m = self._pattern.search(text, pos)
+        return (m.start(), m.group()) if m else None
+
+    def found(self, text):
+        """Set of keywords present in text."""
+        return {kw for _, kw in self.hits(text)}
+
+    def contains_any(self, text):
+        return bool(text) and self._pattern is not None and self._pattern.search(text) is not None
+
+    def line_hits(self, text):
+        """
+        Splits text into lines and maps every hit to its line.
+        Returns (lines, found_per_line) where found_per_line[i] is the keyword set of lines[i].
+        """
+        lines = text.split('\n')
+        found_per_line = [set() for _ in lines]
+        hits = self.hits(text)
+        if hits:
+            line_starts = []
+            offset = 0
+            for line in lines:
+                line_starts.append(offset)
+                offset += len(line) + 1
+            for pos, kw in hits:
+                found_per_line[bisect.bisect_right(line_starts, pos) - 1].add(kw)
+        return lines, found_per_line
+
+
+@lru_cache(maxsize=None)
+def _build_scanner(keywords):
+    return KeywordScanner(keywords)
+
+
+def get_scanner(keywords):
+    """Scanner for this keyword list, built once per process."""
+    return _build_scanner(tuple(keywords))
@@ -0,0 +1,278 @@
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+from src.txt_extractor import AI_MODEL, AI_TEXT_HEADER, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MOCK_PORT = 8765
+DEFAULT_ERROR_STATUSES = (429, 500, 503)
+# Granularity (characters) of the simulated context cache: a prompt hits on the longest
+# prefix, in whole units, that an earlier prompt started with
+PREFIX_CACHE_UNIT = 64
+
+# Chunk markers of a packed prompt (TxtExtractor._ai_packed_prompt)
+CHUNK_MARKER = re.compile(r'\[(C\d+)\] ')
+# Fiscal years the synthetic answers report
+SYNTHETIC_YEAR = re.compile(r'(20[12]\d)\s*年')
+
+
+def replay_key(model, prompt_content):
+    """Key of a recorded exchange: model and the exact prompt sent."""
+    return hashlib.sha256(f"{model}\x00{prompt_content}".encode('utf-8')).hexdigest()
+
+
+class MockLlmServer:
+    """
+    Local stand-in for the DeepSeek chat-completions endpoint, for benchmarking and
+    regression-testing the AI path offline (point DEEPSEEK_API_URL or AiDispatcher's url
+    at `url`).
+
+    A request is answered, in order of preference:
+    - from `replay` (JSONL written by record mode), matched on model + exact prompt;
+    - in record mode (`record` + `upstream`), by forwarding it upstream with the
+      caller's headers and appending the exchange to `record`;
+    - otherwise with a deterministic synthetic answer: one record per fiscal year the
+      chunk mentions (per chunk ID for packed prompts), values derived from a hash of
+      the chunk, so reruns get identical answers.
+
+    latency / jitter (seconds, gaussian) are slept before every answer; error_rate of
+    the requests fail with a status from error_statuses and malformed_rate get a 200
+    whose content is not JSON. Synthetic usage counts estimate_tokens of the prompt and
+    the answer unless prompt_tokens / completion_tokens fix them, and with prefix_cache
+    splits the prompt into prompt_cache_hit_tokens / prompt_cache_miss_tokens the way
+    the provider's context cache does (shared prefix with earlier prompts). Draws come
+    from one seeded generator. GET /stats returns the counters.
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_MOCK_PORT, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_statuses=DEFAULT_ERROR_STATUSES, malformed_rate=0.0, prompt_tokens=None, completion_tokens=None,
+                 replay=None, record=None, upstream=None, seed=0, prefix_cache=True):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses) or DEFAULT_ERROR_STATUSES
+        self.malformed_rate = malformed_rate
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.record = record
+        self.upstream = upstream
+        self.rng = random.Random(seed)
+        self.prefix_cache = prefix_cache
+        self._prefixes = set()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "replayed": 0, "recorded": 0, "synthetic": 0, "errors": 0, "malformed": 0,
+                      "prompt_tokens": 0, "prompt_cache_hit_tokens": 0, "prompt_cache_miss_tokens": 0, "completion_tokens": 0}
+        self.recordings = {}
+        if replay:
+            with open(replay, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recordings[entry["key"]] = entry["response"]
+            logger.info(f"已加载 {len(self.recordings)} 条录制的 AI 响应: {replay}")
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/chat/completions"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def answer(self, body, headers):
+        """(status, response dict or text) for one chat-completions request body."""
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = max(0.0, self.rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            draw = self.rng.random()
+            error_status = self.rng.choice(self.error_statuses)
+        if delay:
+            time.sleep(delay)
+        if draw < self.error_rate:
+            with self._lock:
+                self.stats["errors"] += 1
+            return error_status, {"error": {"message": "mock llm server: injected error", "type": "mock_error"}}
+
+        model = body.get("model", AI_MODEL)
+        prompt_content = body["messages"][-1]["content"]
+        key = replay_key(model, prompt_content)
+        if key in self.recordings:
+            with self._lock:
+                self.stats["replayed"] += 1
+                self._count_usage(self.recordings[key].get("usage", {}))
+            return 200, self.recordings[key]
+        if self.record and self.upstream:
+            return self._forward(key, body, headers)
+
+        if draw < self.error_rate + self.malformed_rate:
+            content = "抱歉，我无法按要求返回 JSON。"
+            with self._lock:
+                self.stats["malformed"] += 1
+        else:
+            content = json.dumps(_synthetic_items(prompt_content), ensure_ascii=False)
+            with self._lock:
+                self.stats["synthetic"] += 1
+        usage = {
+            "prompt_tokens": self.prompt_tokens if self.prompt_tokens is not None else estimate_tokens(prompt_content),
+            "completion_tokens": self.completion_tokens if self.completion_tokens is not None else estimate_tokens(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if self.prefix_cache:
+            hit = min(usage["prompt_tokens"], self._cached_prefix_tokens(prompt_content))
+            usage["prompt_cache_hit_tokens"] = hit
+            usage["prompt_cache_miss_tokens"] = usage["prompt_tokens"] - hit
+        with self._lock:
+            self._count_usage(usage)
+        return 200, {
+            "id": f"mock-{key[:16]}",
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    def _forward(self, key, body, headers):
+        response = requests.post(self.upstream, json=body, timeout=120,
+                                 headers={"Content-Type": "application/json", "Authorization": headers.get("Authorization", "")})
+        if response.status_code != 200:
+            with self._lock:
+                self.stats["errors"] += 1
+            return response.status_code, response.text
+        result = response.json()
+        with self._lock:
+            self.recordings[key] = result
+            self.stats["recorded"] += 1
+            self._count_usage(result.get("usage", {}))
+            with open(self.record, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"key": key, "response": result}, ensure_ascii=False) + "\n")
+        return 200, result
+
+    def _cached_prefix_tokens(self, prompt_content):
+        """Tokens of the longest unit-aligned prefix seen before; remembers this prompt's prefixes."""
+        hit_chars = 0
+        with self._lock:
+            for end in range(PREFIX_CACHE_UNIT, len(prompt_content) + 1, PREFIX_CACHE_UNIT):
+                digest = hashlib.sha1(prompt_content[:end].encode('utf-8')).digest()
+                if digest in self._prefixes:
+                    hit_chars = end
+                else:
+                    self._prefixes.add(digest)
+        return estimate_tokens(prompt_content[:hit_chars]) - 1 if hit_chars else 0
+
+    def _count_usage(self, usage):
+        hit = usage.get("prompt_cache_hit_tokens", 0)
+        self.stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+        self.stats["prompt_cache_hit_tokens"] += hit
+        self.stats["prompt_cache_miss_tokens"] += usage.get("prompt_cache_miss_tokens", usage.get("prompt_tokens", 0) - hit)
+        self.stats["completion_tokens"] += usage.get("completion_tokens", 0)
+
+
+def _synthetic_items(prompt_content):
+    """Deterministic answer for a prompt: records per year mentioned in each chunk."""
+    # The instructions before the text carry an example with a year; only the text counts
+    text = prompt_content.rsplit(AI_TEXT_HEADER, 1)[-1]
+    markers = list(CHUNK_MARKER.finditer(text))
+    if markers:
+        chunks = [(m.group(1), text[m.end():markers[i + 1].start() if i + 1 < len(markers) else len(text)])
+                  for i, m in enumerate(markers)]
+    else:
+        chunks = [(None, text)]
+    items = []
+    for chunk_id, chunk in chunks:
+        digest = hashlib.sha256(chunk.encode('utf-8')).digest()
+        years = sorted(set(SYNTHETIC_YEAR.findall(chunk)))[:3]
+        for i, year in enumerate(years):
+            item = {
+                "year": year,
+                "amount": str(500 + int.from_bytes(digest[i * 6:i * 6 + 2], 'big') % 5000),
+                "net_profit": str(5000 + int.from_bytes(digest[i * 6 + 2:i * 6 + 4], 'big') % 50000),
+                "operating_cash_flow": str(2000 + int.from_bytes(digest[i * 6 + 4:i * 6 + 6], 'big') % 30000),
+            }
+            if chunk_id:
+                item = {"chunk_id": chunk_id, **item}
+            items.append(item)
+    return items
+
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            except (ValueError, json.JSONDecodeError):
+                return self._send(400, {"error": {"message": "invalid JSON body"}})
+            try:
+                status, payload = server.answer(body, self.headers)
+            except Exception as e:
+                logger.error(f"模拟 AI 服务处理失败: {e}")
+                status, payload = 500, {"error": {"message": str(e)}}
+            self._send(status, payload)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/stats':
+                return self._send(200, dict(server.stats))
+            self._send(404, {"error": {"message": "not found"}})
+
+        def _send(self, status, payload):
+            data = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+            data = data.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Local mock of the DeepSeek chat-completions endpoint (synthetic, replay or record)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_MOCK_PORT)
+    parser.add_argument('--latency', type=float, default=300, help="Mean latency in ms")
+    parser.add_argument('--jitter', type=float, default=100, help="Latency standard deviation in ms")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with an HTTP error")
+    parser.add_argument('--error-statuses', default=",".join(map(str, DEFAULT_ERROR_STATUSES)))
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="Share of 200 answers whose content is not JSON")
+    parser.add_argument('--prompt-tokens', type=int, default=None, help="Fixed prompt_tokens in usage (default: estimated)")
+    parser.add_argument('--completion-tokens', type=int, default=None, help="Fixed completion_tokens in usage (default: estimated)")
+    parser.add_argument('--replay', help="JSONL of recorded responses to serve")
+    parser.add_argument('--record', help="Append upstream responses to this JSONL (needs --upstream)")
+    parser.add_argument('--upstream', help="Real endpoint to forward unmatched requests to in record mode")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-prefix-cache', action='store_true', help="Report every prompt token as a context-cache miss")
+    args = parser.parse_args()
+
+    mock = MockLlmServer(args.host, args.port, args.latency / 1000, args.jitter / 1000, args.error_rate,
+                         [int(s) for s in args.error_statuses.split(',') if s.strip()], args.malformed_rate,
+                         args.prompt_tokens, args.completion_tokens, args.replay, args.record, args.upstream, args.seed,
+                         prefix_cache=not args.no_prefix_cache)
+    logger.info(f"模拟 AI 服务已启动: {mock.url} (设置 DEEPSEEK_API_URL 指向该地址)")
+    try:
+        mock.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.httpd.server_close()
@@ -0,0 +1,211 @@
+import os
+import io
+import shutil
+import hashlib
+import zlib
+import logging
+import subprocess
+
+from src.text_corpus import CACHE_DIR, connect_db
+
+logger = logging.getLogger(__name__)
+
+OCR_CACHE_DB = os.path.join(CACHE_DIR, 'ocr_cache.sqlite')
+# Rendered pages waiting for the OCR pool, named <image_hash>.png
+OCR_SPOOL_DIR = os.path.join(CACHE_DIR, 'ocr_spool')
+
+OCR_RESOLUTION = 300
+OCR_LANG = 'chi_sim+eng'
+# --oem 1 (LSTM), --psm 6 (Assume a single uniform block of text)
+OCR_CONFIG = '--oem 1 --psm 6'
+OCR_TIMEOUT = 300
+
+# TESSERACT_CMD overrides discovery, e.g. a stub binary such as scripts/tesseract_stub.py
+COMMON_TESSERACT_PATHS = [
+    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+    r'C:\Users\wxx11\AppData\Local\Tesseract-OCR\tesseract.exe',
+    r'D:\Program Files\Tesseract-OCR\tesseract.exe'
+]
+
+
+def tesseract_cmd():
+    """Path of the tesseract binary, or None if it cannot be found."""
+    cmd = os.environ.get('TESSERACT_CMD')
+    if cmd:
+        return cmd if os.path.exists(cmd) else shutil.which(cmd)
+    for path in COMMON_TESSERACT_PATHS:
+        if os.path.exists(path):
+            return path
+    return shutil.which('tesseract')
+
+
+def run_tesseract(png_bytes, lang=OCR_LANG, config=OCR_CONFIG, cmd=None, timeout=OCR_TIMEOUT):
+    """
+    Runs tesseract as a subprocess on one PNG image (stdin -> stdout).
+    Raises RuntimeError if the binary is missing or exits with an error.
+    """
+    cmd = cmd or tesseract_cmd()
+    if not cmd:
+        raise RuntimeError("tesseract is not installed")
+    proc = subprocess.run(
+        [cmd, 'stdin', 'stdout', '-l', lang] + config.split(),
+        input=png_bytes, capture_output=True, timeout=timeout
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"tesseract exited with {proc.returncode}: {proc.stderr.decode('utf-8', 'ignore').strip()[:200]}")
+    return proc.stdout.decode('utf-8', 'ignore')
+
+
+def render_page(page, resolution=OCR_RESOLUTION):
+    """PNG bytes of a pdfplumber page rendered for OCR."""
+    buf = io.BytesIO()
+    page.to_image(resolution=resolution).original.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def image_hash(png_bytes):
+    return hashlib.sha1(png_bytes).hexdigest()
+
+
+class OcrCache:
+    """
+    OCR text keyed by page-image hash (+ language/config), so the same rendered page is
+    recognised once no matter which file or run it comes from.
+    page_images maps (file hash, page, resolution) to the image hash, which lets a rerun
+    find the cached text without rendering the page again.
+    """
+    def __init__(self, db_path=OCR_CACHE_DB):
+        self.db_path = db_path
+        self.conn = connect_db(db_path)
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS ocr_text ('
+                'image_hash TEXT, config TEXT, text BLOB, PRIMARY KEY (image_hash, config))'
+            )
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS page_images ('
+                'file_hash TEXT, page_no INTEGER, resolution INTEGER, image_hash TEXT, '
+                'PRIMARY KEY (file_hash, page_no, resolution))'
+            )
+
+    def get(self, img_hash, lang=OCR_LANG, config=OCR_CONFIG):
+        row = self.conn.execute(
+            'SELECT text FROM ocr_text WHERE image_hash = ? AND config = ?', (img_hash, f"{lang} {config}")
+        ).fetchone()
+        return zlib.decompress(row[0]).decode('utf-8') if row else None
+
+    def put(self, img_hash, text, lang=OCR_LANG, config=OCR_CONFIG):
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO ocr_text (image_hash, config, text) VALUES (?, ?, ?)',
+                (img_hash, f"{lang} {config}", zlib.compress((text or '').encode('utf-8')))
+            )
+
+    def page_image(self, file_hash, page_no, resolution=OCR_RESOLUTION):
+        row = self.conn.execute(
+            'SELECT image_hash FROM page_images WHERE file_hash = ? AND page_no = ? AND resolution = ?',
+            (file_hash, page_no, resolution)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_page_image(self, file_hash, page_no, img_hash, resolution=OCR_RESOLUTION):
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO page_images (file_hash, page_no, resolution, image_hash) VALUES (?, ?, ?, ?)',
+                (file_hash, page_no, resolution, img_hash)
+            )
+
+
+_cache_instance = None
+_cache_pid = None
+
+def get_ocr_cache():
+    """Per-process OCR cache connection (re-opened after fork)."""
+    global _cache_instance, _cache_pid
+    if _cache_instance is None or _cache_pid != os.getpid():
+        _cache_instance = OcrCache()
+        _cache_pid = os.getpid()
+    return _cache_instance
+
+
+class PageOcr:
+    """
+    OCR of one document's pages through the cache.
+    inline: cache misses run tesseract in this process.
+    deferred: cache misses are rendered into the spool directory and listed in `pending`
+    for the OCR pool (run_spooled_ocr); the page reads as empty until the OCR is done.
+    """
+    def __init__(self, file_hash=None, deferred=False, cache=None, stats=None):
+        self.file_hash = file_hash
+        self.deferred = deferred
+        self.cache = cache
+        self.pending = []
+        self.stats = stats if stats is not None else {}
+        self.stats.update({'ocr_cache_hits': 0, 'tesseract_runs': 0, 'ocr_deferred': 0})
+
+    def __call__(self, page):
+        # Opened on first use, so text-only documents never touch the OCR cache
+        if self.cache is None:
+            self.cache = get_ocr_cache()
+        page_no = page.page_number - 1
+        img_hash = self.cache.page_image(self.file_hash, page_no) if self.file_hash else None
+        text = self.cache.get(img_hash) if img_hash else None
+        png_bytes = None
+        if text is None:
+            png_bytes = render_page(page)
+            img_hash = image_hash(png_bytes)
+            if self.file_hash:
+                self.cache.put_page_image(self.file_hash, page_no, img_hash)
+            text = self.cache.get(img_hash)
+        if text is not None:
+            self.stats['ocr_cache_hits'] += 1
+            return text
+
+        if self.deferred:
+            spool_image(img_hash, png_bytes)
+            if img_hash not in self.pending:
+                self.pending.append(img_hash)
+            self.stats['ocr_deferred'] += 1
+            return ""
+
+        text = run_tesseract(png_bytes)
+        self.cache.put(img_hash, text)
+        self.stats['tesseract_runs'] += 1
+        return text
+
+
+def spool_image(img_hash, png_bytes):
+    os.makedirs(OCR_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(OCR_SPOOL_DIR, f"{img_hash}.png")
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(png_bytes)
+        os.replace(tmp_path, path)
+    return path
+
+
+def run_spooled_ocr(img_hash, log_queue=None):
+    """
+    OCR pool worker: recognises one spooled page image and stores the text in the cache.
+    Returns (image_hash, chars, error).
+    """
+    try:
+        if log_queue is not None:
+            from src.extractor import _setup_worker_logging
+            _setup_worker_logging(log_queue)
+        cache = get_ocr_cache()
+        path = os.path.join(OCR_SPOOL_DIR, f"{img_hash}.png")
+        if cache.get(img_hash) is not None:
+            # Recognised meanwhile for another file; drop a re-spooled copy
+            if os.path.exists(path):
+                os.remove(path)
+            return img_hash, 0, None
+        with open(path, 'rb') as f:
+            png_bytes = f.read()
+        text = run_tesseract(png_bytes)
+        cache.put(img_hash, text)
+        os.remove(path)
+        return img_hash, len(text), None
+    except Exception as e:
+        return img_hash, 0, str(e)
@@ -0,0 +1,64 @@
+import re
+
+from src.txt_tables import UNIT_MARK
+
+# Sentence ends inside a line; the split keeps the punctuation with its sentence
+SENTENCE_END = re.compile(r'(?<=[。；;！？!?])')
+# Layout whitespace inside a line (columns, full-width and non-breaking spaces)
+LAYOUT_SPACE = re.compile(r'[ \t　\xa0]+')
+# A bare year is a table header cell (possibly wrapped onto its own line), never a page number
+YEAR_VALUE = re.compile(r'(?:19|20)\d{2}')
+
+
+class PromptCompactor:
+    """
+    Shrinks a chunk before it is embedded in an AI prompt. Keeps only the sentences that
+    mention a year, an amount or one of the scanner's keywords, collapses layout
+    whitespace to single spaces and drops page-number lines and repeated lines (running
+    headers, tables printed twice). A bare number only counts as a page number on the
+    first or last line of a page (pages split on form feeds) or of the chunk, and never
+    when it is a year, so wrapped table cells such as "2021" or "350" stay. Unit captions
+    ("单位：元") are always kept whole: without them the AI cannot tell 元 from 万元. Table rows
+    are single lines without sentence ends, so a header row (years) and its value rows
+    (amounts) survive whole and stay aligned.
+    When nothing qualifies, the whitespace-collapsed chunk is returned instead of an
+    empty prompt.
+    """
+    def __init__(self, scanner, year_pattern, amount_pattern, page_number_pattern):
+        self.scanner = scanner
+        self.year_pattern = year_pattern
+        self.amount_pattern = amount_pattern
+        self.page_number_pattern = page_number_pattern
+
+    def compact(self, text):
+        kept, seen = [], set()
+        for page in text.split('\f'):
+            lines = [line for line in (LAYOUT_SPACE.sub(' ', raw).strip() for raw in page.splitlines()) if line]
+            for i, line in enumerate(lines):
+                unit = UNIT_MARK.search(line)
+                # A caption repeated above a second table still applies to that table
+                if (line in seen and not unit) or self._page_number(line, i == 0 or i == len(lines) - 1):
+                    continue
+                seen.add(line)
+                if unit:
+                    out = line
+                else:
+                    out = ''.join(s for s in SENTENCE_END.split(line) if self._relevant(s)).strip()
+                if out and (out == line or out not in seen):
+                    seen.add(out)
+                    kept.append(out)
+        if not kept:
+            return LAYOUT_SPACE.sub(' ', text).strip()
+        return '\n'.join(kept)
+
+    def _page_number(self, line, at_edge):
+        if not self.page_number_pattern.match(line):
+            return False
+        # Prospectus page numbers (1-1-35) cannot be table cells
+        if '-' in line:
+            return True
+        return at_edge and not YEAR_VALUE.fullmatch(line)
+
+    def _relevant(self, sentence):
+        return bool(self.year_pattern.search(sentence) or self.amount_pattern.search(sentence)
+                    or self.scanner.contains_any(sentence))
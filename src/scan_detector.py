@@ -0,0 +1,147 @@
+import re
+import time
+import logging
+
+from pdfminer.pdftypes import resolve1, PDFStream
+
+logger = logging.getLogger(__name__)
+
+# A page counts as text when its content stream shows at least this many string bytes
+TEXT_PAGE_MIN_BYTES = 40
+# ...and as a scan when images cover at least this share of the page (and it has no text)
+IMAGE_PAGE_MIN_COVERAGE = 0.5
+# Pages inspected per document (spread evenly over the whole file)
+PROBE_MAX_PAGES = 40
+# Document labels from the share of text / image pages among the sampled pages
+TEXT_DOC_MIN_RATIO = 0.8
+SCANNED_DOC_MAX_TEXT_RATIO = 0.1
+
+# Shown strings of Tj / ' / " (literal or hex) and TJ arrays
+_SHOW_TEXT = re.compile(rb'(\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>)\s*(?:Tj|\'|")|\[((?:\\.|[^\]\\])*)\]\s*TJ', re.S)
+_ARRAY_STRING = re.compile(rb'\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>')
+# Placement matrix followed by an XObject paint, e.g. "595 0 0 842 0 0 cm /Im0 Do"
+_NUMBER = rb'(-?\d*\.?\d+)'
+_CM_DO = re.compile(rb'\s+'.join([_NUMBER] * 6) + rb'\s+cm\s*/([^\s/\[\]()<>]+)\s+Do')
+_DO = re.compile(rb'/([^\s/\[\]()<>]+)\s+Do')
+
+
+def _name(obj):
+    obj = resolve1(obj)
+    return getattr(obj, 'name', obj)
+
+
+def _stream_data(contents):
+    contents = resolve1(contents)
+    if contents is None:
+        return b''
+    if not isinstance(contents, list):
+        contents = [contents]
+    data = []
+    for ref in contents:
+        stream = resolve1(ref)
+        if isinstance(stream, PDFStream):
+            data.append(stream.get_data())
+    return b'\n'.join(data)
+
+
+def _string_bytes(token):
+    if token.startswith(b'<'):
+        return len(re.sub(rb'\s', b'', token[1:-1])) // 2
+    return len(token) - 2
+
+
+def _text_bytes(data):
+    total = 0
+    for m in _SHOW_TEXT.finditer(data):
+        if m.group(1) is not None:
+            total += _string_bytes(m.group(1))
+        else:
+            total += sum(_string_bytes(s) for s in _ARRAY_STRING.findall(m.group(2)))
+    return total
+
+
+def probe_page(page_obj, page_area):
+    """
+    Structural look at one pdfminer page: no layout analysis, no text extraction.
+    Returns {'kind': 'text'|'image'|'empty', 'text_bytes', 'image_coverage', 'has_fonts'}.
+    Text inside Form XObjects (one level) is counted as page text.
+    """
+    resources = resolve1(page_obj.resources) or {}
+    has_fonts = bool(resolve1(resources.get('Font')))
+    xobjects = resolve1(resources.get('XObject')) or {}
+
+    data = _stream_data(page_obj.attrs.get('Contents'))
+    text_bytes = _text_bytes(data) if has_fonts else 0
+
+    image_area = 0.0
+    placed = set()
+    for m in _CM_DO.finditer(data):
+        a, b, c, d = (float(v) for v in m.groups()[:4])
+        name = m.group(7).decode('latin-1')
+        xobj = resolve1(xobjects.get(name))
+        if isinstance(xobj, PDFStream) and _name(xobj.attrs.get('Subtype')) == 'Image':
+            image_area += abs(a * d - b * c)
+            placed.add(name)
+
+    for m in _DO.finditer(data):
+        name = m.group(1).decode('latin-1')
+        xobj = resolve1(xobjects.get(name))
+        if not isinstance(xobj, PDFStream):
+            continue
+        if _name(xobj.attrs.get('Subtype')) == 'Form':
+            form_resources = resolve1(xobj.attrs.get('Resources')) or {}
+            if has_fonts or resolve1(form_resources.get('Font')):
+                text_bytes += _text_bytes(xobj.get_data())
+        elif _name(xobj.attrs.get('Subtype')) == 'Image' and name not in placed:
+            # Painted without a readable placement matrix: assume it fills the page
+            image_area += page_area
+            placed.add(name)
+
+    image_coverage = min(1.0, image_area / page_area) if page_area else 0.0
+    if text_bytes >= TEXT_PAGE_MIN_BYTES:
+        kind = 'text'
+    elif image_coverage >= IMAGE_PAGE_MIN_COVERAGE:
+        kind = 'image'
+    else:
+        kind = 'empty'
+    return {'kind': kind, 'text_bytes': text_bytes, 'image_coverage': round(image_coverage, 3), 'has_fonts': has_fonts}
+
+
+def classify_document(pdf, max_pages=PROBE_MAX_PAGES):
+    """
+    Labels a pdfplumber document 'text', 'mixed' or 'scanned' from the page structure of
+    up to max_pages evenly spread pages.
+    Returns {'label', 'sampled', 'text_pages', 'image_pages', 'elapsed_ms'}.
+    """
+    start = time.perf_counter()
+    total = len(pdf.pages)
+    if total <= max_pages:
+        indices = list(range(total))
+    else:
+        indices = sorted({int(i * (total - 1) / (max_pages - 1)) for i in range(max_pages)})
+
+    counts = {'text': 0, 'image': 0, 'empty': 0}
+    for i in indices:
+        page = pdf.pages[i]
+        try:
+            kind = probe_page(page.page_obj, float(page.width * page.height))['kind']
+        except Exception as e:
+            logger.debug(f"页面结构探测失败 (page {i + 1}): {e}")
+            kind = 'empty'
+        counts[kind] += 1
+
+    sampled = len(indices)
+    text_ratio = counts['text'] / sampled if sampled else 0.0
+    if text_ratio >= TEXT_DOC_MIN_RATIO:
+        label = 'text'
+    elif text_ratio <= SCANNED_DOC_MAX_TEXT_RATIO and counts['image'] >= sampled / 2:
+        label = 'scanned'
+    else:
+        label = 'mixed'
+    return {
+        'label': label,
+        'sampled': sampled,
+        'text_pages': counts['text'],
+        'image_pages': counts['image'],
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+    }
@@ -9,10 +9,13 @@ import queue
 import logging
 import time
 import multiprocessing
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from typing import Dict, List, Any, Optional
 from src.downloader import Downloader
-from src.extractor import ProspectusExtractor, process_pdf_worker
+from src.extractor import ProspectusExtractor, process_pdf_worker, plan_page_shards, score_page_shard, PAGE_SHARD_MIN_BYTES, OCR_DEFER_ROUNDS
+from src.ocr_service import run_spooled_ocr
+from src.text_backends import TEXT_BACKENDS, FAST_TEXT_BACKEND
 from src.config import PDF_DIR, DATA_DIR, OUTPUT_DIR
 import pandas as pd
 import json
@@ -27,6 +30,16 @@ class TaskManager:
             "current_action": "Idle",
             "download_concurrency": 4,
             "extract_concurrency": 4,
+            "ocr_concurrency": 2,
+            # Per-worker RSS budget (MB) for memory-bounded extraction; None = unbounded
+            "worker_rss_budget_mb": None,
+            # Text backend used to locate pages ('pdfium' / 'pdfplumber'); tables always use pdfplumber
+            "text_backend": FAST_TEXT_BACKEND,
+            # Stop scanning a document once its result is complete and consistent; may differ
+            # from a full scan on a few documents (scripts/bench_early_exit.py), switch off for audits
+            "early_exit": True,
+            # Highest per-document peak RSS seen in the current run (MB), for sizing concurrency
+            "peak_rss_mb": 0,
             "start_time": None,
             "elapsed_time": 0
         }
@@ -136,13 +149,32 @@ class TaskManager:
             self.status["elapsed_time"] = int(time.time() - self.status["start_time"])
         return self.status
 
-    def set_concurrency(self, download: Optional[int] = None, extract: Optional[int] = None):
+    def set_concurrency(self, download: Optional[int] = None, extract: Optional[int] = None, ocr: Optional[int] = None):
         with self._lock:
             if download is not None:
                 self.status["download_concurrency"] = max(1, min(download, 50))
             if extract is not None:
                 self.status["extract_concurrency"] = max(1, min(extract, 50))
-            logging.info(f"Concurrency updated: Download={self.status.get('download_concurrency')}, Extract={self.status.get('extract_concurrency')}")
+            if ocr is not None:
+                self.status["ocr_concurrency"] = max(1, min(ocr, 50))
+            logging.info(f"Concurrency updated: Download={self.status.get('download_concurrency')}, Extract={self.status.get('extract_concurrency')}, OCR={self.status.get('ocr_concurrency')}")
+
+    def set_memory_budget(self, rss_budget_mb: Optional[int]):
+        with self._lock:
+            self.status["worker_rss_budget_mb"] = max(256, rss_budget_mb) if rss_budget_mb else None
+            logging.info(f"Worker RSS budget updated: {self.status['worker_rss_budget_mb'] or 'unbounded'}")
+
+    def set_text_backend(self, backend: str):
+        if backend not in TEXT_BACKENDS:
+            raise ValueError(f"unknown text backend: {backend}")
+        with self._lock:
+            self.status["text_backend"] = backend
+            logging.info(f"Text backend updated: {backend}")
+
+    def set_early_exit(self, enabled: bool):
+        with self._lock:
+            self.status["early_exit"] = bool(enabled)
+            logging.info(f"Early exit updated: {self.status['early_exit']}")
 
     def start_tasks(self, action: str = "all", limit: Optional[int] = None):
         if self.status["is_running"]:
@@ -239,6 +271,13 @@ class TaskManager:
                 self._run_audit_phase()
                 logging.info("Step 1.5: Audit phase completed.")
 
+            # 1.6. Text corpus build (extracts every PDF's page text once, in parallel)
+            if action in ["corpus"] and not self.stop_event.is_set():
+                self.status["current_action"] = "Building Corpus"
+                logging.info(f"Step 1.6: Building extracted-text corpus [PID:{os.getpid()}]...")
+                self._run_corpus_phase()
+                logging.info("Step 1.6: Corpus build completed.")
+
             # 2. Extract if needed
             if action in ["all", "extract"] and not self.stop_event.is_set():
                 self.status["current_action"] = "Extracting"
@@ -280,6 +319,17 @@ class TaskManager:
         except Exception as e:
             logging.error(f"Audit phase failed: {e}")
 
+    def _run_corpus_phase(self):
+        """
+        Builds the persistent page text corpus so extraction, backfill and audit reuse it.
+        """
+        from src.text_corpus import build_corpus
+        concurrency = self.status.get("extract_concurrency", 4)
+        try:
+            build_corpus(PDF_DIR, concurrency=concurrency, backend=self.status["text_backend"])
+        except Exception as e:
+            logging.error(f"Corpus build failed: {e}")
+
     def _run_download_phase(self, stock_list_path: str, limit: Optional[int]):
         """
         Executes the download phase using chunk-based parallelism.
@@ -365,6 +415,7 @@ class TaskManager:
         self.status["total_tasks"] = len(pdf_files)
         self.status["completed_tasks"] = 0
         self.status["failed_tasks"] = 0
+        self.status["peak_rss_mb"] = 0
 
         if not pdf_files:
             logging.info("No new files to extract.")
@@ -376,30 +427,106 @@ class TaskManager:
         # Must use Manager Queue for logging in multiprocessing
         # Note: self.mp_log_queue is already a Manager Queue created in __init__
         
-        with ProcessPoolExecutor(max_workers=self.status["extract_concurrency"]) as executor:
-            from functools import partial
+        # OCR runs in its own pool so a scanned prospectus does not hold an extraction slot:
+        # extraction workers spool uncached page images and return 'ocr_pending', the images are
+        # recognised here, and the file is re-queued (its OCR text is then served from the cache).
+        with ProcessPoolExecutor(max_workers=self.status["extract_concurrency"]) as executor, \
+             ProcessPoolExecutor(max_workers=self.status["ocr_concurrency"]) as ocr_executor:
             # Prepare tasks
-            # Pass mp_log_queue to worker
-            futures = {executor.submit(process_pdf_worker, f, PDF_DIR, self.mp_log_queue): f for f in pdf_files}
+            # Tasks are fed to the pool from this queue with only a few in flight, so shard tasks
+            # of large documents (pushed to the front) start as soon as a worker frees up.
+            # Large files are planned first: their page scoring may be split into shards.
+            pending = deque()
+            for f in pdf_files:
+                if os.path.getsize(os.path.join(PDF_DIR, f)) >= PAGE_SHARD_MIN_BYTES:
+                    pending.appendleft(('plan', f, None))
+                else:
+                    pending.append(('extract', f, None))
+            futures = {}
+            shard_state = {} # pdf_file -> {'pending': n, 'scores': {}, 'failed': bool}
+            max_in_flight = self.status["extract_concurrency"] * 2
+            ocr_queue = deque()
+            ocr_futures = {} # future -> image hash
+            ocr_waiters = {} # image hash -> files waiting for it
+            ocr_state = {} # pdf_file -> {'waiting': set of image hashes, 'page_scores': ...}
+            ocr_rounds = {} # pdf_file -> number of times it returned 'ocr_pending'
+            self._submit_extraction_tasks(executor, futures, pending, max_in_flight, ocr_rounds)
             
-            while futures and not self.stop_event.is_set():
-                # Check log queue while waiting
-                # We need to drain the logs proactively if the listener thread isn't fast enough
-                # OR just rely on listener thread. The listener thread is independent.
-                
+            while (futures or pending or ocr_futures or ocr_queue) and not self.stop_event.is_set():
                 # Wait for at least one future to complete or timeout to check stop_event
-                done, not_done = wait(futures.keys(), timeout=0.5, return_when=FIRST_COMPLETED)
+                done, not_done = wait(list(futures) + list(ocr_futures), timeout=0.5, return_when=FIRST_COMPLETED)
                 
                 for future in done:
+                    if future in ocr_futures:
+                        img_hash = ocr_futures.pop(future)
+                        try:
+                            _, _, error = future.result()
+                        except Exception as e:
+                            error = str(e)
+                        if error:
+                            logging.warning(f"OCR failed for page image {img_hash}: {error}")
+                        for waiting_file in ocr_waiters.pop(img_hash, ()):
+                            state = ocr_state[waiting_file]
+                            state['waiting'].discard(img_hash)
+                            if not state['waiting']:
+                                del ocr_state[waiting_file]
+                                pending.appendleft(('extract', waiting_file, state['page_scores']))
+                        continue
+
+                    # Remove processed future from the dictionary
+                    kind, pdf_file, arg = futures.pop(future)
 
                     try:
+                        if kind == 'plan':
+                            _, shards, error = future.result()
+                            if error:
+                                logging.warning(f"Shard planning failed for {pdf_file}, extracting without shards: {error}")
+                            if shards:
+                                shard_state[pdf_file] = {'pending': len(shards), 'scores': {}, 'failed': False}
+                                for shard in shards:
+                                    pending.appendleft(('shard', pdf_file, shard))
+                            else:
+                                pending.appendleft(('extract', pdf_file, None))
+                            continue
+
+                        if kind == 'shard':
+                            _, scores, error = future.result()
+                            state = shard_state[pdf_file]
+                            if error:
+                                logging.warning(f"Page shard failed for {pdf_file}: {error}")
+                                state['failed'] = True
+                            state['scores'].update(scores)
+                            state['pending'] -= 1
+                            if state['pending'] == 0:
+                                del shard_state[pdf_file]
+                                # Any failed shard -> let the worker run its own full scan
+                                page_scores = None if state['failed'] else state['scores']
+                                pending.appendleft(('extract', pdf_file, page_scores))
+                            continue
+
                         pdf_file, dividends, error = future.result()
+                        ocr_images = self._pending_ocr_images(dividends)
+                        if ocr_images and not error:
+                            ocr_rounds[pdf_file] = ocr_rounds.get(pdf_file, 0) + 1
+                            ocr_state[pdf_file] = {'waiting': set(ocr_images), 'page_scores': arg}
+                            for img_hash in ocr_images:
+                                if img_hash not in ocr_waiters:
+                                    ocr_waiters[img_hash] = set()
+                                    ocr_queue.append(img_hash)
+                                ocr_waiters[img_hash].add(pdf_file)
+                            logging.info(f"{pdf_file}: {len(ocr_images)} pages queued for OCR (round {ocr_rounds[pdf_file]})")
+                            continue
+
                         if error:
                             logging.error(f"Error processing {pdf_file}: {error}")
                             self.status["failed_tasks"] += 1
                         else:
                             if dividends:
                                 all_dividends.extend(dividends)
+                                peak_rss_mb = dividends[0].get('peak_rss_mb')
+                                if peak_rss_mb and peak_rss_mb > self.status["peak_rss_mb"]:
+                                    self.status["peak_rss_mb"] = peak_rss_mb
+                                    logging.info(f"New per-document peak RSS: {peak_rss_mb} MB ({pdf_file})")
                             self.status["completed_tasks"] += 1
                         
                         processed_files.add(pdf_file)
@@ -413,13 +540,17 @@ class TaskManager:
                     except Exception as e:
                         logging.error(f"Future result error: {e}")
                         self.status["failed_tasks"] += 1
-                    
-                    # Remove processed future from the dictionary
-                    del futures[future]
+
+                self._submit_extraction_tasks(executor, futures, pending, max_in_flight, ocr_rounds)
+                while ocr_queue and len(ocr_futures) < self.status["ocr_concurrency"] * 2:
+                    img_hash = ocr_queue.popleft()
+                    ocr_futures[ocr_executor.submit(run_spooled_ocr, img_hash, self.mp_log_queue)] = img_hash
 
             # If stopped, cancel remaining
             if self.stop_event.is_set():
-                for f in futures:
+                pending.clear()
+                ocr_queue.clear()
+                for f in list(futures) + list(ocr_futures):
                     f.cancel()
                 logging.info("Task execution cancelled.")
 
@@ -427,6 +558,32 @@ class TaskManager:
         generate_report(os.path.join(DATA_DIR, 'stock_list.csv'))
         logging.info(f"Extraction completed. Success: {self.status['completed_tasks']}, Failed: {self.status['failed_tasks']}")
 
+    def _submit_extraction_tasks(self, executor, futures, pending, max_in_flight, ocr_rounds):
+        """
+        Submits queued extraction tasks until max_in_flight are running.
+        pending holds (kind, pdf_file, arg): 'plan' -> plan_page_shards, 'shard' -> score_page_shard
+        (arg = page range), 'extract' -> process_pdf_worker (arg = merged page scores or None).
+        Extraction defers OCR to the OCR pool until the file has used up OCR_DEFER_ROUNDS.
+        """
+        while pending and len(futures) < max_in_flight:
+            kind, pdf_file, arg = pending.popleft()
+            if kind == 'plan':
+                future = executor.submit(plan_page_shards, pdf_file, PDF_DIR, self.mp_log_queue, self.status["text_backend"])
+            elif kind == 'shard':
+                future = executor.submit(score_page_shard, pdf_file, PDF_DIR, arg, self.mp_log_queue, self.status["worker_rss_budget_mb"],
+                                         self.status["text_backend"])
+            else:
+                defer_ocr = ocr_rounds.get(pdf_file, 0) < OCR_DEFER_ROUNDS
+                future = executor.submit(process_pdf_worker, pdf_file, PDF_DIR, self.mp_log_queue, arg, defer_ocr, self.status["worker_rss_budget_mb"],
+                                         self.status["text_backend"], self.status["early_exit"])
+            futures[future] = (kind, pdf_file, arg)
+
+    def _pending_ocr_images(self, dividends):
+        """Page image hashes of an 'ocr_pending' extraction result, else None."""
+        if dividends and len(dividends) == 1 and dividends[0].get('status') == 'ocr_pending':
+            return dividends[0].get('ocr_images') or None
+        return None
+
 def _worker_download_chunk(stock_list_chunk, log_queue, stop_event=None):
     """
     Worker process for downloading a chunk of stocks.
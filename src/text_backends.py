@@ -0,0 +1,86 @@
+import logging
+
+try:
+    import pypdfium2 as pdfium
+    HAS_PDFIUM = True
+except ImportError:
+    HAS_PDFIUM = False
+
+logger = logging.getLogger(__name__)
+
+TEXT_BACKENDS = ('pdfplumber', 'pdfium')
+# Library default: callers that do not choose a backend keep pdfplumber's text
+DEFAULT_TEXT_BACKEND = 'pdfplumber'
+# Raw-text backend for locating pages and bulk text, opted into by TaskManager's setting;
+# pdfplumber stays in charge of target pages that need tables/layout. pypdfium2 ships
+# with pdfplumber, so it is normally present.
+FAST_TEXT_BACKEND = 'pdfium' if HAS_PDFIUM else 'pdfplumber'
+
+
+class PdfplumberBackend:
+    """Page text through pdfminer layout analysis (what the table pass sees)."""
+    name = 'pdfplumber'
+
+    def __init__(self, pdf_path):
+        import pdfplumber
+        self.pdf = pdfplumber.open(pdf_path)
+
+    def __len__(self):
+        return len(self.pdf.pages)
+
+    def page_text(self, page_num):
+        page = self.pdf.pages[page_num]
+        text = page.extract_text() or ""
+        page.close()
+        return text
+
+    def close(self):
+        self.pdf.close()
+
+
+class PdfiumBackend:
+    """Raw page text from PDFium's text layer: no layout objects, several times faster."""
+    name = 'pdfium'
+
+    def __init__(self, pdf_path):
+        self.doc = pdfium.PdfDocument(pdf_path)
+
+    def __len__(self):
+        return len(self.doc)
+
+    def page_text(self, page_num):
+        page = self.doc[page_num]
+        textpage = page.get_textpage()
+        try:
+            text = textpage.get_text_range()
+        finally:
+            textpage.close()
+            page.close()
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    def close(self):
+        self.doc.close()
+
+
+def open_text_backend(name, pdf_path):
+    """Opens pdf_path with the named backend; falls back to pdfplumber if pdfium is unavailable."""
+    return open_locator_backend(name, pdf_path) or PdfplumberBackend(pdf_path)
+
+
+def open_locator_backend(name, pdf_path):
+    """
+    Fast backend for PageTextCache, or None when the choice resolves to pdfplumber: the
+    cache then reads the pdfplumber document the caller already has open.
+    """
+    name = name or DEFAULT_TEXT_BACKEND
+    if name not in TEXT_BACKENDS:
+        raise ValueError(f"unknown text backend: {name}")
+    if name == 'pdfium':
+        if not HAS_PDFIUM:
+            logger.warning("pypdfium2 不可用，回退到 pdfplumber 文本提取")
+        else:
+            try:
+                return PdfiumBackend(pdf_path)
+            except Exception as e:
+                logger.warning(f"pypdfium2 无法打开 {pdf_path}，回退到 pdfplumber: {e}")
+    return None
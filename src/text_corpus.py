@@ -0,0 +1,234 @@
+import os
+import sys
+import sqlite3
+import hashlib
+import zlib
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Adjusting to allow running as "python src/text_corpus.py" from root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import DATA_DIR, PDF_DIR
+from src.text_backends import open_text_backend, DEFAULT_TEXT_BACKEND
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(DATA_DIR, 'cache')
+CORPUS_DB = os.path.join(CACHE_DIR, 'text_corpus.sqlite')
+
+
+def connect_db(db_path):
+    """
+    Opens a SQLite connection that is safe to share between worker processes
+    (WAL journal + busy timeout). Each process must open its own connection.
+    """
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class TextCorpus:
+    """
+    Persistent extracted-text corpus for PDFs.
+    Page text is stored zlib-compressed, keyed by (file hash, text source, page number),
+    so a changed file gets a new hash and never reads stale text.
+    """
+    def __init__(self, db_path=CORPUS_DB):
+        self.db_path = db_path
+        self.conn = connect_db(db_path)
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS files ('
+                'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, file_hash TEXT)'
+            )
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS pages ('
+                'file_hash TEXT, source TEXT, page_no INTEGER, text BLOB, '
+                'PRIMARY KEY (file_hash, source, page_no))'
+            )
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS documents ('
+                'file_hash TEXT, source TEXT, page_count INTEGER, complete INTEGER, '
+                'PRIMARY KEY (file_hash, source))'
+            )
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS doc_types ('
+                'file_hash TEXT PRIMARY KEY, label TEXT, sampled INTEGER, text_pages INTEGER, image_pages INTEGER)'
+            )
+
+    def file_hash(self, pdf_path):
+        """
+        Content hash of the file. Re-hashed only when size/mtime change;
+        pages of a replaced hash are dropped when no other path refers to it.
+        """
+        st = os.stat(pdf_path)
+        path = os.path.abspath(pdf_path)
+        row = self.conn.execute(
+            'SELECT size, mtime_ns, file_hash FROM files WHERE path = ?', (path,)
+        ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+
+        h = hashlib.sha1()
+        with open(pdf_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(block)
+        file_hash = h.hexdigest()
+
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO files (path, size, mtime_ns, file_hash) VALUES (?, ?, ?, ?)',
+                (path, st.st_size, st.st_mtime_ns, file_hash)
+            )
+            if row and row[2] != file_hash:
+                self._drop_orphan(row[2])
+        return file_hash
+
+    def _drop_orphan(self, old_hash):
+        in_use = self.conn.execute('SELECT 1 FROM files WHERE file_hash = ? LIMIT 1', (old_hash,)).fetchone()
+        if not in_use:
+            self.conn.execute('DELETE FROM pages WHERE file_hash = ?', (old_hash,))
+            self.conn.execute('DELETE FROM documents WHERE file_hash = ?', (old_hash,))
+            self.conn.execute('DELETE FROM doc_types WHERE file_hash = ?', (old_hash,))
+            logger.info(f"文本语料已失效 (文件已变更): {old_hash}")
+
+    def get_pages(self, file_hash, source='pdfplumber'):
+        rows = self.conn.execute(
+            'SELECT page_no, text FROM pages WHERE file_hash = ? AND source = ?', (file_hash, source)
+        ).fetchall()
+        return {page_no: zlib.decompress(blob).decode('utf-8') for page_no, blob in rows}
+
+    def put_pages(self, file_hash, pages, source='pdfplumber', page_count=None):
+        """pages: {page_no: text}. Marks the document complete once every page is stored."""
+        if not pages:
+            return
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO pages (file_hash, source, page_no, text) VALUES (?, ?, ?, ?)',
+                [(file_hash, source, n, zlib.compress((t or '').encode('utf-8'))) for n, t in pages.items()]
+            )
+            if page_count is not None:
+                stored = self.conn.execute(
+                    'SELECT COUNT(*) FROM pages WHERE file_hash = ? AND source = ?', (file_hash, source)
+                ).fetchone()[0]
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO documents (file_hash, source, page_count, complete) VALUES (?, ?, ?, ?)',
+                    (file_hash, source, page_count, int(stored >= page_count))
+                )
+
+    def is_complete(self, file_hash, source='pdfplumber'):
+        row = self.conn.execute(
+            'SELECT complete FROM documents WHERE file_hash = ? AND source = ?', (file_hash, source)
+        ).fetchone()
+        return bool(row and row[0])
+
+    def get_doc_type(self, file_hash):
+        """Recorded scan_detector result for this file, or None."""
+        row = self.conn.execute(
+            'SELECT label, sampled, text_pages, image_pages FROM doc_types WHERE file_hash = ?', (file_hash,)
+        ).fetchone()
+        if not row:
+            return None
+        return {'label': row[0], 'sampled': row[1], 'text_pages': row[2], 'image_pages': row[3]}
+
+    def put_doc_type(self, file_hash, info):
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO doc_types (file_hash, label, sampled, text_pages, image_pages) VALUES (?, ?, ?, ?, ?)',
+                (file_hash, info['label'], info['sampled'], info['text_pages'], info['image_pages'])
+            )
+
+
+_corpus_instance = None
+_corpus_pid = None
+
+def get_corpus():
+    """Per-process corpus connection (re-opened after fork)."""
+    global _corpus_instance, _corpus_pid
+    if _corpus_instance is None or _corpus_pid != os.getpid():
+        _corpus_instance = TextCorpus()
+        _corpus_pid = os.getpid()
+    return _corpus_instance
+
+
+def read_pages(pdf_path, page_numbers=None, corpus=None, backend=DEFAULT_TEXT_BACKEND):
+    """
+    Returns {page_no: text} for the requested pages (all pages if None),
+    reading from the corpus and extracting only the pages it does not have yet.
+    backend: text backend name (see text_backends); the corpus keeps one copy per backend.
+    """
+    corpus = corpus or get_corpus()
+    file_hash = corpus.file_hash(pdf_path)
+    cached = corpus.get_pages(file_hash, source=backend)
+
+    if page_numbers is not None and all(n in cached for n in page_numbers):
+        return {n: cached[n] for n in page_numbers}
+
+    new_pages = {}
+    reader = open_text_backend(backend, pdf_path)
+    try:
+        total = len(reader)
+        wanted = range(total) if page_numbers is None else [n for n in page_numbers if n < total]
+        for n in wanted:
+            if n not in cached:
+                new_pages[n] = reader.page_text(n)
+        corpus.put_pages(file_hash, new_pages, source=reader.name, page_count=total)
+    finally:
+        reader.close()
+
+    cached.update(new_pages)
+    return {n: cached[n] for n in wanted}
+
+
+def document_text(pdf_path, corpus=None, backend=DEFAULT_TEXT_BACKEND):
+    """Full document text in page order, as the TXT pipeline consumes it."""
+    pages = read_pages(pdf_path, corpus=corpus, backend=backend)
+    return "".join(pages[n] + "\n" for n in sorted(pages) if pages[n])
+
+
+def _build_worker(pdf_path, backend=DEFAULT_TEXT_BACKEND):
+    try:
+        pages = read_pages(pdf_path, backend=backend)
+        return pdf_path, len(pages), None
+    except Exception as e:
+        return pdf_path, 0, str(e)
+
+
+def build_corpus(pdf_dir=PDF_DIR, concurrency=4, backend=DEFAULT_TEXT_BACKEND):
+    """
+    Extracts every PDF under pdf_dir into the corpus in parallel with the given text backend.
+    Files already complete (same content hash) are skipped.
+    """
+    corpus = get_corpus()
+    files = []
+    for root, dirs, names in os.walk(pdf_dir):
+        for name in names:
+            if name.lower().endswith('.pdf'):
+                files.append(os.path.join(root, name))
+
+    pending = [f for f in files if not corpus.is_complete(corpus.file_hash(f), source=backend)]
+    logger.info(f"文本语料构建: 共 {len(files)} 个 PDF, 需提取 {len(pending)} 个 (并发数: {concurrency})")
+
+    completed = 0
+    with ProcessPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(_build_worker, f, backend): f for f in pending}
+        for future in as_completed(futures):
+            pdf_path, page_count, error = future.result()
+            if error:
+                logger.error(f"语料提取失败 {os.path.basename(pdf_path)}: {error}")
+            completed += 1
+            if completed % 50 == 0:
+                logger.info(f"语料构建进度: {completed}/{len(pending)}...")
+
+    logger.info("文本语料构建完成。")
+
+
+if __name__ == "__main__":
+    from multiprocessing import freeze_support
+    freeze_support()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [PID:%(process)d] - %(message)s')
+    logging.getLogger("pdfminer").setLevel(logging.WARNING)
+    build_corpus(concurrency=8)
@@ -1,36 +1,63 @@
 import re
 import os
 import time
-import random
 import json
-import requests
 import logging
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from src.extraction_rules import get_rules
+from src.txt_ingest import iter_text
+from src.ai_cache import get_ai_cache, cache_key
+from src.ai_budget import get_budget_ledger, open_budget_run
+from src.ai_client import get_ai_client
+
+# Files handed to a pool worker at a time by extract_many_parallel
+BATCH_SIZE = 16
+# Overridable to point the AI path at a local stand-in (src/mock_llm_server.py)
+AI_API_URL = os.environ.get("DEEPSEEK_API_URL", "https://api.deepseek.com/chat/completions")
+AI_MODEL = "deepseek-chat"
+# Bump whenever the prompt template in _extract_with_ai or the compaction changes (part of the AI cache key)
+AI_PROMPT_VERSION = "5"
+# Same for the multi-chunk template (_ai_packed_prompt); answers from it are cached per chunk
+AI_PACKED_PROMPT_VERSION = "p5"
+# Appended to the prompt version when chunks are sent without compaction (see compact_prompts)
+AI_RAW_PROMPT_SUFFIX = "-raw"
+# Line after which both prompt templates carry the chunk text (always the prompt's tail)
+AI_TEXT_HEADER = "文本:"
+# Price in yuan per million tokens, and the completion size assumed per chunk when a
+# request's cost is estimated before sending it (see estimate_ai_cost). Prompt tokens
+# served from the provider's context cache (usage.prompt_cache_hit_tokens) are billed
+# at AI_PRICE_PROMPT_CACHE_HIT, the rest at AI_PRICE_PROMPT.
+AI_PRICE_PROMPT = 2.0
+AI_PRICE_PROMPT_CACHE_HIT = 0.5
+AI_PRICE_COMPLETION = 3.0
+AI_EXPECTED_COMPLETION_TOKENS = 120
 
 class TxtExtractor:
     def __init__(self):
-        pass
+        # Keyword sets, patterns and thresholds come from the per-process rule registry
+        self.rules = get_rules()
+        # AI response cache counters over this extractor's lifetime (see ai_cache_delta)
+        self.ai_cache_stats = {"hits": 0, "misses": 0, "saved_cost": 0.0}
+        # Chunks are compacted (rules.txt_prompt_compactor) before they go into a prompt
+        self.compact_prompts = True
+        # Chunks answered by AI and their estimated tokens before / after compaction
+        self.compaction_stats = {"chunks": 0, "raw_tokens": 0, "sent_tokens": 0}
+        # Billed usage of the answered requests (see ai_usage_cost)
+        self.ai_usage_stats = {"requests": 0, "prompt_tokens": 0, "prompt_cache_hit_tokens": 0,
+                               "prompt_cache_miss_tokens": 0, "completion_tokens": 0, "cost": 0.0}
 
-    def extract_from_file(self, file_path, api_key=None, cost_limit=0.0, current_cost=0.0, force_ai=False):
+    def extract_from_file(self, file_path, api_key=None, cost_limit=0.0, current_cost=0.0, force_ai=False, defer_ai=False, budget_run=None):
         """
         Extracts company financial information from a single TXT file.
         Returns dict with data and cost incurred.
+        The file is memory-mapped and decoded incrementally (see txt_ingest); chunks are
+        scanned as the text streams in.
+        defer_ai: chunks that need AI are returned under "ai_jobs" instead of being sent
+        (see ai_dispatcher).
+        budget_run: AI budget ledger run (ai_budget.open_budget_run) shared with other
+        workers; replaces the cost_limit / current_cost snapshot check.
         """
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            try:
-                with open(file_path, 'r', encoding='gbk') as f:
-                    content = f.read()
-            except Exception as e:
-                try:
-                    # Final attempt with gb18030 (superset of gbk)
-                    with open(file_path, 'r', encoding='gb18030') as f:
-                        content = f.read()
-                except Exception as final_e:
-                    logging.error(f"读取文件失败 {file_path}: {final_e}")
-                    return None
-
         # Extract company name from filename
         filename = os.path.basename(file_path)
         parts = filename.split('_')
@@ -40,23 +67,68 @@ class TxtExtractor:
             company_name = filename.replace(".txt", "")
         
         use_ai = bool(api_key)
-        # Pass force_ai down
-        financials, cost = self.extract_financials_enhanced(
-            content, 
-            use_ai=use_ai, 
-            api_key=api_key,
-            cost_limit=cost_limit,
-            current_cost=current_cost,
-            force_ai=force_ai
-        )
+        ingest = {}
+        tables = []
+        cache_before = dict(self.ai_cache_stats)
+        ai_jobs = [] if defer_ai else None
+        try:
+            # Tables are read from each streamed piece before its chunks are processed
+            chunks = self.rules.txt_chunk_scanner.scan_stream(
+                iter_text(file_path, info=ingest),
+                on_piece=lambda base, piece: tables.extend(self._find_tables(piece, base))
+            )
+            # Pass force_ai down
+            financials, cost = self.extract_financials_from_chunks(
+                chunks, 
+                use_ai=use_ai, 
+                api_key=api_key,
+                cost_limit=cost_limit,
+                current_cost=current_cost,
+                force_ai=force_ai,
+                tables=tables,
+                ai_jobs=ai_jobs,
+                budget_run=budget_run
+            )
+        except (OSError, ValueError) as e:
+            logging.error(f"读取文件失败 {file_path}: {e}")
+            return None
         
         return {
             "company_name": company_name,
             "filename": filename,
             "dividends": financials, # Keeping key 'dividends' for compatibility, but contains all info
-            "cost": cost
+            "cost": cost,
+            "encoding": ingest.get('encoding'),
+            "ai_cache": self.ai_cache_delta(cache_before),
+            "ai_jobs": ai_jobs
         }
 
+    def ai_cache_delta(self, before):
+        """AI cache hits/misses/saved cost since the ai_cache_stats snapshot `before`."""
+        return {k: self.ai_cache_stats[k] - before.get(k, 0) for k in self.ai_cache_stats}
+
+    def extract_many(self, paths, api_key=None, cost_limit=0.0, current_cost=0.0, force_ai=False, defer_ai=False, budget_run=None):
+        """
+        Streams extract_from_file over paths (any iterable, consumed lazily), yielding
+        (file_path, data, elapsed_seconds) per file as soon as it is done; data is None
+        when the file could not be read. The compiled rules are reused across files and
+        nothing is kept between files, so memory stays flat however long the batch is.
+        AI cost accumulates over the batch against cost_limit (or the budget_run ledger).
+        """
+        spent = 0.0
+        for file_path in paths:
+            start = time.perf_counter()
+            try:
+                data = self.extract_from_file(file_path, api_key=api_key, cost_limit=cost_limit,
+                                              current_cost=current_cost + spent, force_ai=force_ai, defer_ai=defer_ai,
+                                              budget_run=budget_run)
+            except Exception as e:
+                logging.error(f"处理文件失败 {file_path}: {e}")
+                data = None
+            if data:
+                spent += data.get('cost', 0.0)
+            yield file_path, data, time.perf_counter() - start
+
     def extract_dividends(self, content):
         """
         Legacy wrapper.
@@ -70,105 +142,156 @@ class TxtExtractor:
         """
         return self.extract_financials_enhanced(content, use_ai, api_key, cost_limit, current_cost, force_ai)
 
-    def extract_financials_enhanced(self, content, use_ai=False, api_key=None, cost_limit=0.0, current_cost=0.0, force_ai=False):
+    def extract_financials_enhanced(self, content, use_ai=False, api_key=None, cost_limit=0.0, current_cost=0.0, force_ai=False, ai_jobs=None, budget_run=None):
         """
         Enhanced extraction of financial information (Dividends, Net Profit, Cash Flow).
         Returns a tuple: (data_list, cost_incurred)
+        ai_jobs, budget_run: see extract_financials_from_chunks.
+        """
+        # Bounded windows around the keyword hits (paragraphs where short enough), in one pass
+        relevant_chunks = self.rules.txt_chunk_scanner.chunks(content)
+        return self.extract_financials_from_chunks(relevant_chunks, use_ai, api_key, cost_limit, current_cost, force_ai,
+                                                   tables=self._find_tables(content), ai_jobs=ai_jobs, budget_run=budget_run)
+
+    def extract_financials_from_chunks(self, relevant_chunks, use_ai=False, api_key=None, cost_limit=0.0, current_cost=0.0, force_ai=False, tables=None, ai_jobs=None, budget_run=None):
+        """
+        extract_financials_enhanced over already located (start, end, chunk_text) windows,
+        e.g. ChunkScanner.scan_stream() output. Returns (data_list, cost_incurred).
+        tables: (start, end, records) from _find_tables, in the same offsets as the chunks
+        (may keep growing while the chunks are consumed). A chunk overlapping a table takes
+        the table's records and is not sent to AI for values the table already resolved.
+        Chunks that need AI are sent once the scan is done, the ones that may fill the
+        most missing (year, field) pairs per estimated yuan first (ai_chunk_value), each
+        reserving its estimated cost in the budget_run ledger when one is given.
+        ai_jobs: when a list is given, chunks that need AI are not sent here but appended
+        to it as {"chunk_span", "text", "regex_results", "value"} for the AI dispatcher
+        (the cost limit is then enforced there); finish with apply_ai_result + merge_financials.
         """
         data_list = []
         cost_incurred = 0.0
-        
-        # Keywords for relevant paragraphs
-        # Financials Keywords
-        keywords = [
-            "分红", "股利分配", "现金分红", "派发现金", "利润分配", "股利支付", 
-            "权益分派", "分配方案", "每10股", "利益分配", 
-            "归属于母公司所有者的净利润", "归母净利润", "净利润",
-            "经营活动产生的现金流量净额", "经营现金净流", "现金流量净额"
-        ]
-        keyword_pattern = "|".join(keywords)
-        
-        # Split content into paragraphs or chunks
-        chunks = re.split(r'\n\s*\n', content) 
-        
-        relevant_chunks = []
-        for chunk in chunks:
-            if re.search(keyword_pattern, chunk):
-                clean_chunk = chunk.strip()
-                if len(clean_chunk) > 10 and len(clean_chunk) < 3000: # Increased limit slightly for context
-                    relevant_chunks.append(clean_chunk)
-        
-        if not relevant_chunks:
-            # Fallback for splitting failure
-            matches = re.finditer(f"(.{{0,200}})({keyword_pattern})(.{{0,300}})", content, re.DOTALL)
-            for m in matches:
-                relevant_chunks.append(m.group(0).strip())
+        tables = tables if tables is not None else []
+        tables_used = set()
+        candidates = []
 
         # Process chunks
-        for chunk in relevant_chunks:
-            extracted = []
-            is_ai_used = False
-            
+        for start, end, chunk in relevant_chunks:
             # 1. Try Regex First (Always try regex to have a baseline context)
             regex_results = self._extract_financials_with_regex(chunk)
+            in_table = False
+            for i, (t_start, t_end, records) in enumerate(tables):
+                if t_start < end and start < t_end:
+                    in_table = True
+                    if i not in tables_used:
+                        tables_used.add(i)
+                        # Table cells first: their year columns are explicit
+                        regex_results = [dict(r) for r in records] + regex_results
             if regex_results:
                  logging.debug(f"正则提取到 {len(regex_results)} 候选条目 - 原文片段: {chunk[:20]}...")
 
             # 2. Decide AI usage
             # Use AI if:
             # - Force AI is ON (and check for extracting extracted text in prompt)
-            # - OR (Use AI is ON AND (Regex failed or not perfect) AND Cost limit ok)
-            
-            should_use_ai = False
-            ai_reason = ""
-            
-            if use_ai:
+            # - OR (Use AI is ON AND (Regex failed or not perfect)); the cost limit is
+            #   checked per request once all candidates are known
+            if use_ai and (force_ai or (not regex_results and not in_table)):
+                candidates.append({"chunk_span": (start, end), "text": chunk, "regex_results": regex_results})
+                continue
+
+            for item in regex_results:
+                item['is_ai'] = False
+                item['is_forced_ai'] = force_ai
+                item['chunk_span'] = (start, end)
+            data_list.extend(regex_results)
+
+        # Tables no keyword window reached
+        for i, (t_start, t_end, records) in enumerate(tables):
+            if i not in tables_used:
+                for item in records:
+                    data_list.append(dict(item, is_ai=False, is_forced_ai=force_ai, chunk_span=(t_start, t_end)))
+
+        merged = self.merge_financials(data_list)
+        if not candidates:
+            return merged, cost_incurred
+        for job in candidates:
+            job["value"] = self.ai_chunk_value(job["text"], merged)
+        if ai_jobs is not None:
+            ai_jobs.extend(candidates)
+            return merged, cost_incurred
+
+        # Most missing fields per estimated yuan first: a tight budget goes where it fills most
+        estimates = {id(job): estimate_ai_cost(self._ai_prompt(job["text"])) for job in candidates}
+        candidates.sort(key=lambda job: job["value"] / estimates[id(job)], reverse=True)
+        ledger = get_budget_ledger(budget_run) if budget_run else None
+        ai_reason = "强制AI模式开启" if force_ai else "正则未提取到数据且费用额度充足"
+        ai_records = []
+        for job in candidates:
+            text, span, regex_results = job["text"], job["chunk_span"], job["regex_results"]
+            answer = self.ai_cached(text)
+            if answer is None:
+                estimate = 0.0 if force_ai else estimates[id(job)]
                 if force_ai:
-                    # If force AI is on, we process ALL relevant chunks with AI
-                    should_use_ai = True
-                    ai_reason = "强制AI模式开启"
-                elif ((current_cost + cost_incurred) < cost_limit):
-                     # If not forced, use heuristic: Use AI if regex didn't find good data
-                     # What is "good data"? Let's say if we found nothing valid.
-                     if not regex_results:
-                         should_use_ai = True
-                         ai_reason = "正则未提取到数据且费用额度充足"
-            
-            if should_use_ai:
-                logging.info(f"调用 AI 提取 ({ai_reason})...")
-                ai_results, cost, prompt_used, raw_resp = self._extract_with_ai(chunk, api_key)
-                cost_incurred += cost
-                
-                if ai_results:
-                    logging.info(f"AI 提取成功: 找到 {len(ai_results)} 条记录, 本次费用: ¥{cost:.4f}")
-                    extracted = ai_results
-                    is_ai_used = True
-                    for item in extracted:
-                        item['ai_prompt'] = prompt_used
-                        item['ai_response'] = raw_resp
-                        item['ai_cost'] = cost
+                    allowed = True
+                elif ledger is not None:
+                    allowed = ledger.reserve(estimate)
                 else:
-                    logging.warning(f"AI 提取失败或返回空结果。")
-                    # AI failed, fallback to regex
-                    extracted = regex_results
-                    if extracted:
-                        for item in extracted:
-                            item['ai_prompt'] = prompt_used
-                            item['ai_response'] = raw_resp
-                            item['ai_cost'] = cost
-                            item['is_ai_fallback'] = True
-            else:
-                extracted = regex_results
-                if not extracted and use_ai:
-                     if (current_cost + cost_incurred) >= cost_limit:
-                         logging.info("跳过 AI: 费用达到上限")
+                    allowed = (current_cost + cost_incurred) < cost_limit
+                if not allowed:
+                    logging.info("跳过 AI: 费用达到上限")
+                    for item in regex_results:
+                        item.update({'is_ai': False, 'is_forced_ai': force_ai, 'chunk_span': span})
+                    ai_records.extend(regex_results)
+                    continue
+                logging.info(f"调用 AI 提取 ({ai_reason})...")
+                answer = self._request_ai(text, api_key, budget_run)
+                if ledger is not None:
+                    ledger.settle(estimate, answer[1])
+            ai_results, cost, prompt_used, raw_resp = answer
+            cost_incurred += cost
+            ai_records.extend(self.apply_ai_result(regex_results, ai_results, cost, prompt_used, raw_resp, span, force_ai))
 
-            if extracted:
-                for item in extracted:
-                    item['is_ai'] = is_ai_used
-                    item['is_forced_ai'] = force_ai
-                data_list.extend(extracted)
+        return self.merge_financials(merged + ai_records), cost_incurred
 
+    def ai_chunk_value(self, text, records):
+        """
+        Expected gain of sending a chunk to AI: the (year, field) pairs it hints at (years
+        mentioned x fields whose hint words appear) that records still lack. Without a
+        year mention, the hinted fields no record has yet.
+        """
+        fields = [f for f, p in self.rules.txt_field_hints.items() if p.search(text)]
+        filled = {(r.get('year'), f) for r in records for f in fields if _has_value(r.get(f))}
+        years = {m.group(1) for m in self.rules.txt_year_pattern.finditer(text)}
+        if years:
+            return sum(1 for y in years for f in fields if (y, f) not in filled)
+        filled_fields = {f for _, f in filled}
+        return sum(1 for f in fields if f not in filled_fields)
+
+    def apply_ai_result(self, regex_results, ai_results, cost, prompt_used, raw_resp, chunk_span, force_ai=False):
+        """
+        Records for one chunk once its AI answer is in: the AI records, or the regex
+        records marked as AI fallback when the AI returned nothing.
+        """
+        if ai_results:
+            logging.info(f"AI 提取成功: 找到 {len(ai_results)} 条记录, 本次费用: ¥{cost:.4f}")
+            extracted = ai_results
+            is_ai_used = True
+        else:
+            logging.warning(f"AI 提取失败或返回空结果。")
+            # AI failed, fallback to regex
+            extracted = regex_results
+            is_ai_used = False
+            for item in extracted:
+                item['is_ai_fallback'] = True
+        for item in extracted:
+            item['ai_prompt'] = prompt_used
+            item['ai_response'] = raw_resp
+            item['ai_cost'] = cost
+            item['is_ai'] = is_ai_used
+            item['is_forced_ai'] = force_ai
+            item['chunk_span'] = chunk_span
+        return extracted
+
+    def merge_financials(self, data_list):
+        """Deduplicates records by year, filling missing fields and preferring AI records."""
         # Deduplicate Logic
         merged_data = {} # Year -> Data Dict
         
@@ -200,50 +323,29 @@ class TxtExtractor:
                 if d.get('raw_text') and d['raw_text'] not in curr.get('raw_text', ''):
                     curr['raw_text'] = (curr.get('raw_text', '') + " || " + d['raw_text']).strip(" || ")
 
-        return list(merged_data.values()), cost_incurred
+        return list(merged_data.values())
 
     def _extract_financials_with_regex(self, text):
         """
         Regex extraction for Dividends, Net Profit, and Cash Flow.
+        One record per year found with a value (see FinancialMatcher).
         """
-        results = []
-        year_pattern = r"(20(?:1[7-9]|2[0-5]))年(?:度)?"
-        years = re.findall(year_pattern, text)
-        if not years:
-            return []
-        year = years[0]
-        
-        data = {"year": year, "raw_text": text, "unit": "万元"}
-        
-        # Helper Patterns
-        amount_num = r"(-?\d{1,4}(?:,\d{3})*(?:\.\d+)?)"
-        amount_unit = r"(?:万?元|亿元|亿)"
-
-        # 1. Dividends
-        total_keywords = r"(?:合计|共计|总额|总计|派发现金|现金分红)"
-        p_div = re.compile(f"({total_keywords}[^0-9\n]{{0,50}}?{amount_num}\s*({amount_unit}))")
-        m_div = p_div.findall(text)
-        if m_div:
-            val, unit = m_div[0][1], m_div[0][2]
-            data['amount_text'] = self._normalize_amount(val, unit)
-
-        # 2. Net Profit (归母净利润)
-        p_np = re.compile(f"(归.*?净利润)[^0-9\n]{{0,30}}?{amount_num}\s*({amount_unit})")
-        m_np = p_np.findall(text)
-        if m_np:
-            val, unit = m_np[0][1], m_np[0][2]
-            data['net_profit'] = self._normalize_amount(val, unit)
-        
-        # 3. Operating Cash Flow (经营现金流)
-        p_ocf = re.compile(f"(经营.*?现金流量净额)[^0-9\n]{{0,30}}?{amount_num}\s*({amount_unit})")
-        m_ocf = p_ocf.findall(text)
-        if m_ocf:
-            val, unit = m_ocf[0][1], m_ocf[0][2]
-            data['operating_cash_flow'] = self._normalize_amount(val, unit)
+        results = self.rules.txt_financial_matcher.match(text, self._normalize_amount)
+        for data in results:
+            data.update({"raw_text": text, "unit": "万元"})
+        return results
 
-        if 'amount_text' in data or 'net_profit' in data or 'operating_cash_flow' in data:
-            return [data]
-        return []
+    def _find_tables(self, text, base=0):
+        """
+        Multi-year tables of text (see TxtTableDetector) as (start, end, records), offsets
+        shifted by base; every record carries the table text.
+        """
+        found = []
+        for start, end, records in self.rules.txt_table_detector.tables(text, self._normalize_amount):
+            for data in records:
+                data.update({"raw_text": text[start:end], "unit": "万元"})
+            found.append((base + start, base + end, records))
+        return found
 
     def _normalize_amount(self, val_str, unit):
         try:
@@ -263,13 +365,184 @@ class TxtExtractor:
             return '0'
 
     def _extract_with_ai(self, text, api_key):
-        time.sleep(random.uniform(0.5, 1.5))
-        url = "https://api.deepseek.com/chat/completions"
-        headers = { "Content-Type": "application/json", "Authorization": f"Bearer {api_key}" }
-        
-        prompt_content = f"""
-        请从以下文本中提取公司财务信息。
-        文本: "{text}"
+        """
+        AI extraction of one chunk. Parsed responses are cached by model, prompt version
+        and chunk text (see ai_cache); a cache hit costs nothing and skips the request.
+        """
+        cached = self.ai_cached(text)
+        if cached is not None:
+            return cached
+        return self._request_ai(text, api_key)
+
+    def _request_ai(self, text, api_key, budget_run=None):
+        """
+        The uncached half of _extract_with_ai: one chat-completions request through the
+        process's AiClient (retries, deadline, circuit breaker), which alone paces requests.
+        With a budget_run the breaker is shared by every process of that run.
+        """
+        prompt_content = self._ai_prompt(text)
+        try:
+            response, error, discarded = get_ai_client(budget_run).send(AI_API_URL, ai_headers(api_key), ai_request_body(prompt_content))
+        except Exception as e:
+            return [], 0.0, prompt_content, f"Exception: {str(e)}"
+        retry_cost = self.book_discarded(discarded)
+        if response is None:
+            return [], retry_cost, prompt_content, error
+        items, cost, prompt_used, raw_response = self.ai_parse_response(text, prompt_content, response)
+        return items, cost + retry_cost, prompt_used, raw_response
+
+    def book_discarded(self, usages):
+        """Books the billed usage of malformed answers AiClient retried; returns their cost."""
+        total = 0.0
+        for usage in usages:
+            usage = dict(usage)
+            usage.setdefault('prompt_tokens', 0)
+            usage.setdefault('completion_tokens', 0)
+            cost = ai_usage_cost(usage)
+            self._count_usage(usage, cost)
+            total += cost
+        return total
+
+    def ai_prompt_version(self, packed=False):
+        """Prompt version of the AI cache key for this extractor's prompt layout."""
+        version = AI_PACKED_PROMPT_VERSION if packed else AI_PROMPT_VERSION
+        return version if self.compact_prompts else version + AI_RAW_PROMPT_SUFFIX
+
+    def ai_cached(self, text, packed=False):
+        """(results, 0.0, prompt, raw_response) from the AI response cache, or None on a miss."""
+        cached = get_ai_cache().get(cache_key(AI_MODEL, self.ai_prompt_version(packed), text))
+        if cached is None:
+            self.ai_cache_stats["misses"] += 1
+            return None
+        items, raw_response, saved = cached
+        self.ai_cache_stats["hits"] += 1
+        self.ai_cache_stats["saved_cost"] += saved or 0.0
+        for item in items:
+            item['raw_text'] = text
+        logging.debug(f"AI 缓存命中，节省 ¥{saved or 0.0:.4f}")
+        prompt = self._ai_packed_prompt([text]) if packed else self._ai_prompt(text)
+        return items, 0.0, prompt, raw_response
+
+    def ai_parse_response(self, text, prompt_content, response):
+        """
+        (results, cost, prompt, raw_response) from a chat-completions HTTP response
+        (anything with status_code / json() / text); parsed answers go to the cache.
+        """
+        items, cost, prompt_tokens, completion_tokens, raw_response = self._read_completion(prompt_content, response)
+        self._count_compaction([text])
+        if items is None:
+            return [], cost, prompt_content, raw_response
+        # Parsed results are cached without the chunk text (it is the key)
+        version = self.ai_prompt_version()
+        get_ai_cache().put(cache_key(AI_MODEL, version, text), AI_MODEL, version,
+                           items, raw_response, prompt_tokens, completion_tokens, cost)
+        for item in items:
+            item['raw_text'] = text
+        return items, cost, prompt_content, raw_response
+
+    def ai_parse_packed_response(self, texts, prompt_content, response):
+        """
+        Per-chunk (results, cost, prompt, raw_response) for a packed request over texts
+        (see _ai_packed_prompt): answers are mapped back through their chunk_id and the
+        request cost is split over the chunks by estimated tokens. Each chunk's answer is
+        cached on its own.
+        """
+        items, cost, prompt_tokens, completion_tokens, raw_response = self._read_completion(prompt_content, response)
+        weights = [estimate_tokens(t) for t in texts]
+        total = sum(weights) or 1
+        shares = [cost * w / total for w in weights]
+        if items is None:
+            return [([], share, prompt_content, raw_response) for share in shares]
+        self._count_compaction(texts)
+        version = self.ai_prompt_version(packed=True)
+        by_chunk = [[] for _ in texts]
+        for item in items:
+            cid = str(item.pop('chunk_id', '') or '').strip().lstrip('Cc')
+            if cid.isdigit() and 1 <= int(cid) <= len(texts):
+                by_chunk[int(cid) - 1].append(item)
+            elif len(texts) == 1:
+                by_chunk[0].append(item)
+            else:
+                logging.warning(f"AI 打包返回的条目缺少有效片段ID，已忽略: {item}")
+        out = []
+        for text, chunk_items, share, w in zip(texts, by_chunk, shares, weights):
+            get_ai_cache().put(cache_key(AI_MODEL, version, text), AI_MODEL, version,
+                               chunk_items, raw_response, round(prompt_tokens * w / total), round(completion_tokens * w / total), share)
+            for item in chunk_items:
+                item['raw_text'] = text
+            out.append((chunk_items, share, prompt_content, raw_response))
+        return out
+
+    def _count_compaction(self, texts):
+        for text in texts:
+            self.compaction_stats["chunks"] += 1
+            self.compaction_stats["raw_tokens"] += estimate_tokens(text)
+            self.compaction_stats["sent_tokens"] += estimate_tokens(self.ai_input(text))
+
+    def _count_usage(self, usage, cost):
+        hit, miss = _cache_split(usage)
+        stats = self.ai_usage_stats
+        stats["requests"] += 1
+        stats["prompt_tokens"] += usage['prompt_tokens']
+        stats["prompt_cache_hit_tokens"] += hit
+        stats["prompt_cache_miss_tokens"] += miss
+        stats["completion_tokens"] += usage['completion_tokens']
+        stats["cost"] += cost
+
+    def ai_input(self, text):
+        """The chunk text as embedded in a prompt (compacted unless compact_prompts is off)."""
+        return self.rules.txt_prompt_compactor.compact(text) if self.compact_prompts else text
+
+    def _read_completion(self, prompt_content, response):
+        """
+        (items, cost, prompt_tokens, completion_tokens, raw_response) of a chat-completions
+        HTTP response; items is None when there is no JSON list answer (raw_response then
+        carries the error).
+        """
+        try:
+            if response.status_code != 200:
+                return None, 0.0, 0, 0, f"Error: {response.status_code} - {response.text}"
+            result = response.json()
+
+            usage = dict(result.get('usage', {}))
+            usage.setdefault('prompt_tokens', len(prompt_content))
+            usage.setdefault('completion_tokens', 100)
+            prompt_tokens = usage['prompt_tokens']
+            completion_tokens = usage['completion_tokens']
+
+            cost = ai_usage_cost(usage)
+            self._count_usage(usage, cost)
+        except Exception as e:
+            return None, 0.0, 0, 0, f"Exception: {str(e)}"
+
+        # Billed from here on: a malformed answer still returns its cost
+        raw_response = ""
+        try:
+            content = result['choices'][0]['message']['content']
+            raw_response = content
+            # Cleanup output
+            content_clean = content.replace("```json", "").replace("```", "").strip()
+            extracted_data = json.loads(content_clean)
+        except (KeyError, IndexError, TypeError, AttributeError, ValueError) as e:
+            return None, cost, prompt_tokens, completion_tokens, raw_response or f"Exception: {str(e)}"
+        if not isinstance(extracted_data, list) or not all(isinstance(item, dict) for item in extracted_data):
+            return None, cost, prompt_tokens, completion_tokens, raw_response
+
+        # Normalize keys
+        for item in extracted_data:
+            item['amount_text'] = str(item.get('amount', '') or '')
+            item['net_profit'] = str(item.get('net_profit', '') or '')
+            item['operating_cash_flow'] = str(item.get('operating_cash_flow', '') or '')
+            item['unit'] = '万元'
+        return extracted_data, cost, prompt_tokens, completion_tokens, raw_response
+
+    def _ai_prompt(self, text):
+        """
+        Instructions first and the chunk last: every request starts with the same bytes,
+        so the provider's context cache can serve the instruction block.
+        """
+        return f"""
+        请从文本中提取公司财务信息。文本在本提示的末尾。
         
         任务:
         1. 提取 **年份** (会计年度)。
@@ -284,53 +557,148 @@ class TxtExtractor:
         - **JSON格式**: 返回列表，如: [{{"year": "2020", "amount": "1000", "net_profit": "5000", "operating_cash_flow": "2000"}}]
         - 如果某项信息缺失，对应字段填 null 或空字符串 ""。
         - 仅返回 JSON 列表 array，不要包含 Markdown 格式 (如 ```json ... ```)。不要包含其他文字。
-        """
         
-        data = {
-            "model": "deepseek-chat",
-            "messages": [{"role": "user", "content": prompt_content}],
-            "temperature": 0.1,
-            "stream": False
-        }
+        {AI_TEXT_HEADER}
+{self.ai_input(text)}"""
+
+    def _ai_packed_prompt(self, texts):
+        """One prompt for several chunks, each tagged with its chunk ID (C1, C2, ...); chunks last, as in _ai_prompt."""
+        numbered = "\n".join(f"[C{i}] {self.ai_input(text)}" for i, text in enumerate(texts, 1))
+        return f"""
+        请从多个文本片段中分别提取公司财务信息。文本片段在本提示的末尾，每个片段以 [片段ID] 开头。
         
-        cost = 0.0
-        raw_response = ""
-        prompt_used = prompt_content
+        任务 (逐个片段处理):
+        1. 提取 **年份** (会计年度)。
+        2. 提取 **现金分红总金额** (amount)。
+        3. 提取 **归属于母公司所有者的净利润** (net_profit)。
+        4. 提取 **经营活动产生的现金流量净额** (operating_cash_flow)。
         
-        try:
-            response = requests.post(url, headers=headers, data=json.dumps(data), timeout=30)
-            if response.status_code == 200:
-                result = response.json()
-                
-                usage = result.get('usage', {})
-                prompt_tokens = usage.get('prompt_tokens', len(prompt_content))
-                completion_tokens = usage.get('completion_tokens', 100)
-                
-                cost = (prompt_tokens / 1_000_000 * 2.0) + (completion_tokens / 1_000_000 * 3.0)
-                
-                content = result['choices'][0]['message']['content']
-                raw_response = content
-                
-                # Cleanup output
-                content_clean = content.replace("```json", "").replace("```", "").strip()
-                
-                try:
-                    extracted_data = json.loads(content_clean)
-                    # Normalize keys
-                    for item in extracted_data:
-                        item['amount_text'] = str(item.get('amount', '') or '')
-                        item['net_profit'] = str(item.get('net_profit', '') or '')
-                        item['operating_cash_flow'] = str(item.get('operating_cash_flow', '') or '')
-                        item['unit'] = '万元'
-                        item['raw_text'] = text
-                        
-                    return extracted_data, cost, prompt_used, raw_response
-                except json.JSONDecodeError:
-                    return [], cost, prompt_used, raw_response
-            else:
-                return [], 0.0, prompt_used, f"Error: {response.status_code} - {response.text}"
-        except Exception as e:
-            return [], 0.0, prompt_used, f"Exception: {str(e)}"
+        要求:
+        - 每条记录必须带上其来源片段的ID (chunk_id)，只使用该片段内的信息。
+        - 统一将金额转换为 **万元**。如果是元除以10000，如果是亿元乘以10000。
+        - **分红总金额**: 忽略每股金额，只取总额。若无总额但有每股及股本可估算，若不可估算则留空。
+        - **金额格式**: 纯数字，不要千分位逗号。
+        - **JSON格式**: 返回列表，如: [{{"chunk_id": "C1", "year": "2020", "amount": "1000", "net_profit": "5000", "operating_cash_flow": "2000"}}]
+        - 如果某项信息缺失，对应字段填 null 或空字符串 ""。片段中没有任何信息时不返回该片段的记录。
+        - 仅返回 JSON 列表 array，不要包含 Markdown 格式 (如 ```json ... ```)。不要包含其他文字。
+        
+        {AI_TEXT_HEADER}
+{numbered}"""
+
+
+def estimate_tokens(text):
+    """
+    Local prompt-token estimate (no tokenizer call): about 0.6 tokens per CJK character
+    and 0.3 per other character.
+    """
+    cjk = sum(1 for ch in text if ch >= '\u2e80')
+    return int(cjk * 0.6 + (len(text) - cjk) * 0.3) + 1
+
+
+def _cache_split(usage):
+    """(cache hit, cache miss) prompt tokens of a usage dict; all misses when not reported."""
+    hit = usage.get('prompt_cache_hit_tokens', 0) or 0
+    miss = usage.get('prompt_cache_miss_tokens')
+    if miss is None:
+        miss = max(0, usage.get('prompt_tokens', 0) - hit)
+    return hit, miss
+
+
+def ai_usage_cost(usage):
+    """Yuan billed for a chat-completions usage dict, context-cache hits at their own price."""
+    hit, miss = _cache_split(usage)
+    return (hit * AI_PRICE_PROMPT_CACHE_HIT + miss * AI_PRICE_PROMPT
+            + usage.get('completion_tokens', 0) * AI_PRICE_COMPLETION) / 1_000_000
+
+
+def estimate_ai_cost(prompt_content, n_chunks=1):
+    """
+    Yuan a request is expected to cost, from the local token estimate of its prompt.
+    Every prompt token is priced as a cache miss, so budget reservations err high.
+    """
+    completion_tokens = AI_EXPECTED_COMPLETION_TOKENS * n_chunks
+    return estimate_tokens(prompt_content) / 1_000_000 * AI_PRICE_PROMPT + completion_tokens / 1_000_000 * AI_PRICE_COMPLETION
+
+
+def _has_value(val):
+    return bool(val) and str(val).lower() not in ('nan', 'null', 'none', '')
+
+
+def pack_ai_jobs(ai_jobs, token_budget, overhead_tokens=0):
+    """
+    Groups deferred AI jobs (in order) so that each group's chunk text plus
+    overhead_tokens (the instruction block) stays within token_budget; a chunk larger
+    than the budget gets a group of its own.
+    """
+    groups, current, used = [], [], overhead_tokens
+    for job in ai_jobs:
+        tokens = estimate_tokens(job["text"])
+        if current and used + tokens > token_budget:
+            groups.append(current)
+            current, used = [], overhead_tokens
+        current.append(job)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def ai_headers(api_key):
+    return {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
+
+
+def ai_request_body(prompt_content):
+    """Chat-completions request body for one extraction prompt."""
+    return {
+        "model": AI_MODEL,
+        "messages": [{"role": "user", "content": prompt_content}],
+        "temperature": 0.1,
+        "stream": False
+    }
+
+
+_extractor_instance = None
+_extractor_pid = None
+
+def get_txt_extractor():
+    """Per-process TxtExtractor (re-created after fork)."""
+    global _extractor_instance, _extractor_pid
+    if _extractor_instance is None or _extractor_pid != os.getpid():
+        _extractor_instance = TxtExtractor()
+        _extractor_pid = os.getpid()
+    return _extractor_instance
+
+
+def _extract_batch(paths, api_key=None, cost_limit=0.0, current_cost=0.0, force_ai=False, budget_run=None):
+    """Pool worker: extract_many over one batch. Returns [(file_path, data, elapsed_seconds)]."""
+    return list(get_txt_extractor().extract_many(paths, api_key, cost_limit, current_cost, force_ai, budget_run=budget_run))
+
+
+def extract_many_parallel(paths, max_workers=4, batch_size=BATCH_SIZE, api_key=None, cost_limit=0.0, current_cost=0.0, force_ai=False):
+    """
+    extract_many across a process pool: paths are cut into batches of batch_size and at
+    most two batches per worker are in flight, so memory stays bounded by the batches
+    in flight rather than the corpus size. Yields (file_path, data, elapsed_seconds)
+    in completion order. With an api_key, every worker reserves its AI calls against
+    one budget ledger (cost_limit, starting from current_cost), so batches running side
+    by side cannot overshoot the limit between them.
+    """
+    paths = iter(paths)
+    budget_run = open_budget_run(cost_limit, current_cost) if api_key else None
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        while True:
+            while len(pending) < max_workers * 2:
+                batch = list(islice(paths, batch_size))
+                if not batch:
+                    break
+                pending.add(executor.submit(_extract_batch, batch, api_key, cost_limit, current_cost, force_ai, budget_run))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for file_path, data, elapsed in future.result():
+                    yield file_path, data, elapsed
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,149 @@
+import os
+import mmap
+import codecs
+import logging
+
+from src.text_corpus import CACHE_DIR, connect_db
+
+logger = logging.getLogger(__name__)
+
+TXT_ENCODING_DB = os.path.join(CACHE_DIR, 'txt_encodings.sqlite')
+# Bytes sampled (at the start, middle and end of the file) to tell UTF-8 from GBK
+SNIFF_SAMPLE_BYTES = 64 * 1024
+# Bytes handed to the incremental decoder at a time
+DECODE_BLOCK_BYTES = 1024 * 1024
+# Checked longest first: the UTF-32 LE BOM starts with the UTF-16 LE one
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+# Non-UTF-8 conversions are GBK; gb18030 is its superset and decodes it identically
+FALLBACK_ENCODING = 'gb18030'
+
+
+class EncodingCache:
+    """
+    Encoding detected for each TXT file, keyed by path and re-checked against size/mtime,
+    so later runs decode directly without sniffing.
+    """
+    def __init__(self, db_path=TXT_ENCODING_DB):
+        self.db_path = db_path
+        self.conn = connect_db(db_path)
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS txt_encodings ('
+                'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, encoding TEXT)'
+            )
+
+    def get(self, path, st):
+        row = self.conn.execute(
+            'SELECT size, mtime_ns, encoding FROM txt_encodings WHERE path = ?', (os.path.abspath(path),)
+        ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        return None
+
+    def put(self, path, st, encoding):
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO txt_encodings (path, size, mtime_ns, encoding) VALUES (?, ?, ?, ?)',
+                (os.path.abspath(path), st.st_size, st.st_mtime_ns, encoding)
+            )
+
+
+_cache_instance = None
+_cache_pid = None
+
+def get_encoding_cache():
+    """Per-process encoding cache connection (re-opened after fork)."""
+    global _cache_instance, _cache_pid
+    if _cache_instance is None or _cache_pid != os.getpid():
+        _cache_instance = EncodingCache()
+        _cache_pid = os.getpid()
+    return _cache_instance
+
+
+def _is_utf8(sample, at_start):
+    if not at_start:
+        # Skip the tail of a character cut by the sample boundary
+        skip = 0
+        while skip < 3 and skip < len(sample) and 0x80 <= sample[skip] <= 0xBF:
+            skip += 1
+        sample = sample[skip:]
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def sniff_encoding(data, sample_bytes=SNIFF_SAMPLE_BYTES):
+    """
+    Encoding of a TXT conversion from its BOM, or from UTF-8 validity of byte samples
+    taken at the start, middle and end of data (bytes or mmap); GBK family otherwise.
+    """
+    head = data[:4]
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    size = len(data)
+    offsets = sorted({0, max(0, size // 2 - sample_bytes // 2), max(0, size - sample_bytes)})
+    if all(_is_utf8(data[off:off + sample_bytes], off == 0) for off in offsets):
+        return 'utf-8'
+    return FALLBACK_ENCODING
+
+
+def iter_text(path, block_bytes=DECODE_BLOCK_BYTES, cache=None, info=None):
+    """
+    Yields the decoded text of a TXT file block by block. The file is memory-mapped,
+    its encoding sniffed once (or taken from the encoding cache) and decoded with an
+    incremental decoder, so the raw bytes are never copied or decoded twice.
+    info: optional dict filled with 'encoding', 'sniffed' and 'bytes'.
+    """
+    st = os.stat(path)
+    if info is not None:
+        info.update({'encoding': None, 'sniffed': False, 'bytes': st.st_size})
+    if st.st_size == 0:
+        return
+    cache = cache or get_encoding_cache()
+    encoding = cache.get(path, st)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if encoding is None:
+            encoding = sniff_encoding(mm)
+            cache.put(path, st, encoding)
+            if info is not None:
+                info['sniffed'] = True
+        if info is not None:
+            info['encoding'] = encoding
+        decoder = codecs.getincrementaldecoder(encoding)()
+        size = len(mm)
+        for off in range(0, size, block_bytes):
+            block = mm[off:off + block_bytes]
+            final = off + block_bytes >= size
+            pending = decoder.getstate()[0]
+            try:
+                text = decoder.decode(block, final=final)
+            except UnicodeDecodeError as e:
+                if encoding == FALLBACK_ENCODING:
+                    raise
+                # The sniff samples missed it: what precedes the bad bytes is valid in `encoding`,
+                # the rest (with the bytes the decoder was holding) is re-decoded as GBK, and the
+                # cache is corrected so later runs decode the whole file that way
+                data = pending + block
+                good = e.start if e.object == data else 0
+                logger.warning(f"按 {encoding} 解码失败 ({os.path.basename(path)} @ {off - len(pending) + good})，其余内容按 {FALLBACK_ENCODING} 解码")
+                head = data[:good].decode(encoding)
+                encoding = FALLBACK_ENCODING
+                cache.put(path, st, encoding)
+                if info is not None:
+                    info['encoding'] = encoding
+                decoder = codecs.getincrementaldecoder(encoding)()
+                text = head + decoder.decode(data[good:], final=final)
+            if text:
+                yield text
+
+
+def read_text(path, info=None):
+    """Whole decoded text of a TXT file (see iter_text)."""
+    return ''.join(iter_text(path, info=info))
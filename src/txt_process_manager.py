@@ -8,7 +8,11 @@ import multiprocessing
 import re
 from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, Any, Optional, List
-from src.txt_extractor import TxtExtractor
+from src.txt_extractor import get_txt_extractor
+from src.ai_dispatcher import AiDispatcher, DEFAULT_AI_CONCURRENCY, DEFAULT_AI_RATE_LIMIT, DEFAULT_AI_PACK_TOKENS
+from src.ai_budget import open_budget_run, get_budget_ledger
+from src.extraction_rules import get_rules
+from src.text_backends import TEXT_BACKENDS, DEFAULT_TEXT_BACKEND
 from src.config import DATA_DIR
 from src.enrich_data import search_stock_cninfo
 
@@ -30,8 +34,23 @@ class TxtProcessManager:
             "elapsed_time": 0,
             "total_ai_cost": 0.0,
             "ai_cost_limit": 10.0, # Default limit 10.00 CNY
-            "force_ai": False # Force AI usage for all extractions
+            "force_ai": False, # Force AI usage for all extractions
+            "text_backend": DEFAULT_TEXT_BACKEND, # Backend for on-the-fly PDF text ('pdfium' / 'pdfplumber')
+            "ai_cache_hits": 0, # AI responses served from the response cache this run
+            "ai_cache_misses": 0,
+            "ai_cache_saved_cost": 0.0, # Cost of the cached calls, i.e. not paid again
+            "ai_concurrency": DEFAULT_AI_CONCURRENCY, # Concurrent AI requests (dispatcher in this process)
+            "ai_rate_limit": DEFAULT_AI_RATE_LIMIT, # AI requests per second
+            "ai_pack_tokens": DEFAULT_AI_PACK_TOKENS, # Token budget for packing several chunks into one AI request (0: off)
+            "ai_packing": {}, # This run: chunks / requests / prompt_tokens / unpacked_prompt_tokens (estimated)
+            "ai_dispatch": {}, # Dispatcher counters: queued / in_flight / requests / errors / cache_hits / skipped_budget
+            "ai_budget": {}, # Budget ledger of this run: limit / spent / reserved (shared by all AI callers)
+            "ai_compaction": {}, # Chunks sent to AI this run: chunks / raw_tokens / sent_tokens (estimated, after compaction)
+            "ai_client": {}, # AI client this run: attempts / retries / failures / malformed / deadline_exceeded / breaker_trips / skipped_breaker
+            "ai_usage": {} # Billed usage this run: requests / prompt_tokens / prompt_cache_hit_tokens / prompt_cache_miss_tokens / completion_tokens / cost
         }
+        self.ai_dispatcher = None
+        self.budget_run = None
         
         # Web UI Queue (Thread-safe)
         self.log_queue = queue.Queue(maxsize=1000)
@@ -137,8 +156,33 @@ class TxtProcessManager:
     def get_status(self) -> Dict[str, Any]:
         if self.status["is_running"] and self.status["start_time"]:
             self.status["elapsed_time"] = int(time.time() - self.status["start_time"])
+        dispatcher = self.ai_dispatcher
+        if dispatcher:
+            self.status["ai_dispatch"] = dict(dispatcher.stats)
+            self.status["ai_client"] = dict(dispatcher.client.stats)
+        if self.budget_run:
+            self.status["ai_budget"] = get_budget_ledger(self.budget_run).snapshot()
         return self.status
 
+    def _add_ai_packing(self, packing, stock_info):
+        """Accumulates a document's AI request packing and logs its reduction."""
+        if not packing or not packing["chunks"]:
+            return
+        total = self.status["ai_packing"]
+        for k in ("chunks", "requests", "prompt_tokens", "unpacked_prompt_tokens"):
+            total[k] = total.get(k, 0) + packing[k]
+        if packing["requests"] < packing["chunks"]:
+            saved = 1 - packing["prompt_tokens"] / max(1, packing["unpacked_prompt_tokens"])
+            name = (stock_info or {}).get("filename", "")
+            logging.info(f"AI 打包 {name}: {packing['chunks']} 个片段 → {packing['requests']} 次请求，"
+                         f"提示词约 {packing['unpacked_prompt_tokens']} → {packing['prompt_tokens']} tokens (-{saved:.0%})")
+
+    def _add_ai_cache_stats(self, ai_cache_stats):
+        if ai_cache_stats:
+            self.status["ai_cache_hits"] += ai_cache_stats["hits"]
+            self.status["ai_cache_misses"] += ai_cache_stats["misses"]
+            self.status["ai_cache_saved_cost"] += ai_cache_stats["saved_cost"]
+
     def set_concurrency(self, concurrency: int):
         with self._lock:
             self.status["concurrency"] = max(1, min(concurrency, 50))
@@ -147,6 +191,8 @@ class TxtProcessManager:
     def set_cost_limit(self, limit: float):
         with self._lock:
             self.status["ai_cost_limit"] = max(0.0, limit)
+            if self.budget_run:
+                get_budget_ledger(self.budget_run).set_limit(self.status["ai_cost_limit"])
             logging.info(f"AI Cost Limit updated: ¥{self.status['ai_cost_limit']:.4f}")
 
     def set_force_ai(self, enabled: bool):
@@ -154,6 +200,28 @@ class TxtProcessManager:
             self.status["force_ai"] = bool(enabled)
             logging.info(f"Force AI extraction set to: {self.status['force_ai']}")
 
+    def set_ai_concurrency(self, concurrency: int):
+        with self._lock:
+            self.status["ai_concurrency"] = max(1, min(concurrency, 64))
+            logging.info(f"AI dispatch concurrency updated (next run): {self.status['ai_concurrency']}")
+
+    def set_ai_rate_limit(self, rate: float):
+        with self._lock:
+            self.status["ai_rate_limit"] = max(0.1, rate)
+            logging.info(f"AI rate limit updated (next run): {self.status['ai_rate_limit']:.1f} req/s")
+
+    def set_ai_pack_tokens(self, tokens: int):
+        with self._lock:
+            self.status["ai_pack_tokens"] = max(0, tokens)
+            logging.info(f"AI prompt packing budget updated (next run): {self.status['ai_pack_tokens']} tokens")
+
+    def set_text_backend(self, backend: str):
+        if backend not in TEXT_BACKENDS:
+            raise ValueError(f"unknown text backend: {backend}")
+        with self._lock:
+            self.status["text_backend"] = backend
+            logging.info(f"Text backend set to: {backend}")
+
     def start_tasks(self, limit: Optional[int] = None):
         if self.status["is_running"]:
             logging.warning("TXT tasks are already running")
@@ -167,6 +235,14 @@ class TxtProcessManager:
         self.status["completed_tasks"] = 0
         self.status["failed_tasks"] = 0
         self.status["total_ai_cost"] = 0.0 # Reset cost for new run? Or keep cumulative? Let's reset.
+        self.status["ai_cache_hits"] = 0
+        self.status["ai_cache_misses"] = 0
+        self.status["ai_cache_saved_cost"] = 0.0
+        self.status["ai_packing"] = {}
+        self.status["ai_budget"] = {}
+        self.status["ai_compaction"] = {}
+        self.status["ai_client"] = {}
+        self.status["ai_usage"] = {}
         
         threading.Thread(target=self._run_extraction, args=(limit,), daemon=True).start()
 
@@ -329,7 +405,7 @@ class TxtProcessManager:
                             'amount_with_unit': '分红金额(万元)', 'net_profit': '归母净利润(万元)',
                             'operating_cash_flow': '经营现金净流(万元)', 'raw_context': 'AI输入(原文)',
                             'filename': '来源文件', 'is_ai': '是否AI提取', 'ai_prompt': 'AI提示词',
-                            'ai_response': 'AI输出(原始)', 'ai_cost': 'AI费用(元)'
+                            'ai_response': 'AI输出(原始)', 'ai_cost': 'AI费用(元)', 'rules_version': '规则版本'
                         }.items()}
                         
                         df_existing_div = df_existing_div.rename(columns=rev_cols_map_div)
@@ -371,37 +447,98 @@ class TxtProcessManager:
             else:
                 logging.info("未检测到 DeepSeek API Key，仅使用正则提取。")
 
+            # AI calls run in this process on the dispatcher's event loop; workers only
+            # hand back the chunks that need AI. Every AI caller reserves against one
+            # budget ledger, so requests in flight count before their cost is known
+            if api_key:
+                self.budget_run = open_budget_run(self.status["ai_cost_limit"])
+                self.ai_dispatcher = AiDispatcher(
+                    api_key,
+                    concurrency=self.status["ai_concurrency"],
+                    rate_limit=self.status["ai_rate_limit"],
+                    pack_tokens=self.status["ai_pack_tokens"],
+                    budget_run=self.budget_run
+                )
+
             with ProcessPoolExecutor(max_workers=self.status["concurrency"]) as executor:
                 force_ai_status = self.status.get("force_ai", False)
-                futures = {
-                    executor.submit(_process_txt_worker, f, self.mp_log_queue, self.stock_metadata, api_key, self.status["ai_cost_limit"], self.status["total_ai_cost"], force_ai_status): f 
-                    for f in final_files
-                }
-                
-                while futures and not self.stop_event.is_set():
-                    done, _ = wait(futures.keys(), timeout=0.5, return_when=FIRST_COMPLETED)
+                defer_ai = self.ai_dispatcher is not None
+                # Files are submitted as workers free up (two per worker in flight), so the
+                # pending futures stay bounded however many files the run covers
+                pending_files = iter(final_files)
+                futures = {}
+                ai_futures = {}  # dispatcher Future -> (ai_pending, stock_info)
+
+                def keep_regex_rows(ai_pending, res_stock_info):
+                    # The file's non-AI records, when its AI chunks never come back
+                    merged = self.ai_dispatcher.extractor.merge_financials(ai_pending["dividends"])
+                    results.extend(_dividend_rows(merged, res_stock_info, get_rules().stamp))
+
+                def submit_more():
+                    while len(futures) < self.status["concurrency"] * 2 and not self.stop_event.is_set():
+                        f = next(pending_files, None)
+                        if f is None:
+                            return
+                        futures[executor.submit(_process_txt_worker, f, self.mp_log_queue, self.stock_metadata, api_key, self.status["ai_cost_limit"], self.status["total_ai_cost"], force_ai_status, self.status["text_backend"], defer_ai, self.budget_run)] = f
+
+                submit_more()
+                while (futures or ai_futures) and not self.stop_event.is_set():
+                    done, _ = wait(list(futures) + list(ai_futures), timeout=0.5, return_when=FIRST_COMPLETED)
                     
                     for future in done:
+                        if future in ai_futures:
+                            ai_pending, res_stock_info = ai_futures.pop(future)
+                            try:
+                                ai_records, ai_cost, ai_cache_stats, packing = future.result()
+                                self._add_ai_packing(packing, res_stock_info)
+                                self.status["ai_compaction"] = dict(self.ai_dispatcher.extractor.compaction_stats)
+                                self.status["ai_usage"] = dict(self.ai_dispatcher.extractor.ai_usage_stats)
+                                merged = self.ai_dispatcher.extractor.merge_financials(ai_pending["dividends"] + ai_records)
+                                results.extend(_dividend_rows(merged, res_stock_info, get_rules().stamp))
+                                self.status["total_ai_cost"] += ai_cost
+                                self._add_ai_cache_stats(ai_cache_stats)
+                                self.status["completed_tasks"] += 1
+                                self._save_to_excel(results, stock_info_list, base_dir)
+                            except Exception as e:
+                                logging.error(f"AI 任务失败，保留正则提取结果: {e}")
+                                self.status["failed_tasks"] += 1
+                                keep_regex_rows(ai_pending, res_stock_info)
+                                self._save_to_excel(results, stock_info_list, base_dir)
+                            continue
                         try:
-                            res_dividends, res_stock_info, cost_incurred = future.result()
+                            res_dividends, res_stock_info, cost_incurred, ai_cache_stats, ai_pending = future.result()
                             if res_dividends:
                                 results.extend(res_dividends)
                             if res_stock_info:
                                 stock_info_list.append(res_stock_info)
                             
                             self.status["total_ai_cost"] += cost_incurred
-                            self.status["completed_tasks"] += 1
-                            
-                            # Incremental Save (Every 1 task as requested, or small batch)
-                            # User asked for "extract one write one", so we save frequently.
-                            # To balance performance, we can save every 1 task since concurrency is low (4).
-                            self._save_to_excel(results, stock_info_list, base_dir)
+                            self._add_ai_cache_stats(ai_cache_stats)
+                            if ai_pending:
+                                # Finished (and saved) once the dispatcher has answered its chunks
+                                ai_futures[self.ai_dispatcher.submit(ai_pending["ai_jobs"], ai_pending["force_ai"])] = (ai_pending, res_stock_info)
+                            else:
+                                self.status["completed_tasks"] += 1
+                                
+                                # Incremental Save (Every 1 task as requested, or small batch)
+                                # User asked for "extract one write one", so we save frequently.
+                                # To balance performance, we can save every 1 task since concurrency is low (4).
+                                self._save_to_excel(results, stock_info_list, base_dir)
                             
                         except Exception as e:
                             logging.error(f"任务失败: {e}")
                             self.status["failed_tasks"] += 1
                         
                         del futures[future]
+                    submit_more()
+
+                if ai_futures:
+                    # Stopped with AI chunks still queued: keep the regex rows of those files
+                    logging.warning(f"{len(ai_futures)} 个文件的 AI 任务未完成，保留其正则提取结果")
+                    for future, (ai_pending, res_stock_info) in ai_futures.items():
+                        future.cancel()
+                        keep_regex_rows(ai_pending, res_stock_info)
+                    ai_futures.clear()
 
             if self.stop_event.is_set():
                  logging.warning("TXT 提取任务已被用户停止。")
@@ -412,6 +549,29 @@ class TxtProcessManager:
         except Exception as e:
             logging.error(f"TXT 处理流程出错: {e}")
         finally:
+            if self.ai_dispatcher:
+                self.status["ai_dispatch"] = dict(self.ai_dispatcher.stats)
+                self.status["ai_compaction"] = dict(self.ai_dispatcher.extractor.compaction_stats)
+                compaction = self.status["ai_compaction"]
+                if compaction["chunks"]:
+                    saved = 1 - compaction["sent_tokens"] / max(1, compaction["raw_tokens"])
+                    logging.info(f"AI 提示词压缩: {compaction['chunks']} 个片段，原文约 {compaction['raw_tokens']} → "
+                                 f"{compaction['sent_tokens']} tokens (-{saved:.0%})")
+                self.status["ai_usage"] = dict(self.ai_dispatcher.extractor.ai_usage_stats)
+                usage = self.status["ai_usage"]
+                if usage["prompt_tokens"]:
+                    logging.info(f"AI 上下文缓存: 提示词 {usage['prompt_tokens']} tokens，命中 {usage['prompt_cache_hit_tokens']} "
+                                 f"({usage['prompt_cache_hit_tokens'] / usage['prompt_tokens']:.0%})，费用 ¥{usage['cost']:.4f}")
+                self.status["ai_client"] = dict(self.ai_dispatcher.client.stats)
+                client = self.status["ai_client"]
+                if client["retries"] or client["skipped_breaker"]:
+                    logging.info(f"AI 请求重试 {client['retries']} 次，放弃 {client['failures']} 次，"
+                                 f"熔断 {client['breaker_trips']} 次，熔断跳过 {client['skipped_breaker']} 个片段")
+                self.ai_dispatcher.close()
+                self.ai_dispatcher = None
+            if self.budget_run:
+                self.status["ai_budget"] = get_budget_ledger(self.budget_run).snapshot()
+                self.budget_run = None
             self.status["is_running"] = False
             self.status["current_action"] = "Idle"
             logging.info("TXT 提取任务全部完成。")
@@ -481,7 +641,8 @@ class TxtProcessManager:
                         'is_ai': '是否AI提取',
                         'ai_prompt': 'AI提示词',
                         'ai_response': 'AI输出(原始)',
-                        'ai_cost': 'AI费用(元)'
+                        'ai_cost': 'AI费用(元)',
+                        'rules_version': '规则版本'
                     }
                     
                     # Ensure columns
@@ -505,11 +666,26 @@ class TxtProcessManager:
                     df_div.to_excel(writer, sheet_name='Dividends', index=False)
                 else:
                     # logging.warning("No dividends to save. Creating empty Dividends sheet.")
-                    pd.DataFrame(columns=['股票名称', '股票代码', '年份', '分红金额(万元)', '归母净利润(万元)', '经营现金净流(万元)', 'AI输入(原文)', '来源文件', '是否AI提取', 'AI提示词', 'AI输出(原始)', 'AI费用(元)']).to_excel(writer, sheet_name='Dividends', index=False)
+                    pd.DataFrame(columns=['股票名称', '股票代码', '年份', '分红金额(万元)', '归母净利润(万元)', '经营现金净流(万元)', 'AI输入(原文)', '来源文件', '是否AI提取', 'AI提示词', 'AI输出(原始)', 'AI费用(元)', '规则版本']).to_excel(writer, sheet_name='Dividends', index=False)
             
             # Add Summary Sheet with Cost
             pd.DataFrame([{
                 "累计AI费用(元)": self.status.get("total_ai_cost", 0.0),
+                "AI缓存命中": self.status.get("ai_cache_hits", 0),
+                "AI缓存未命中": self.status.get("ai_cache_misses", 0),
+                "缓存节省费用(元)": self.status.get("ai_cache_saved_cost", 0.0),
+                "AI片段数": self.status["ai_packing"].get("chunks", 0),
+                "AI请求数": self.status["ai_packing"].get("requests", 0),
+                "提示词tokens(估算)": self.status["ai_packing"].get("prompt_tokens", 0),
+                "不打包提示词tokens(估算)": self.status["ai_packing"].get("unpacked_prompt_tokens", 0),
+                "片段原文tokens(估算)": self.status["ai_compaction"].get("raw_tokens", 0),
+                "压缩后tokens(估算)": self.status["ai_compaction"].get("sent_tokens", 0),
+                "提示词tokens(计费)": self.status["ai_usage"].get("prompt_tokens", 0),
+                "上下文缓存命中tokens": self.status["ai_usage"].get("prompt_cache_hit_tokens", 0),
+                "上下文缓存未命中tokens": self.status["ai_usage"].get("prompt_cache_miss_tokens", 0),
+                "输出tokens": self.status["ai_usage"].get("completion_tokens", 0),
+                "AI重试次数": self.status["ai_client"].get("retries", 0),
+                "熔断跳过片段": self.status["ai_client"].get("skipped_breaker", 0),
                 "费用上限(元)": self.status.get("ai_cost_limit", 0.0),
                 "总任务数": self.status.get("total_tasks", 0),
                 "已完成": self.status.get("completed_tasks", 0)
@@ -533,10 +709,57 @@ class TxtProcessManager:
             # import traceback
             # logging.error(traceback.format_exc())
 
-def _process_txt_worker(file_path, log_queue, metadata, api_key=None, cost_limit=0.0, current_cost=0.0, force_ai=False):
+def _dividend_rows(dividends, stock_info_record, rules_stamp):
+    """Dividends sheet rows for one file's merged financial records."""
+    results = []
+    for div in dividends:
+        # Helper: Format number or 0
+        def fmt_num(val):
+            if val is None or str(val).lower() in ['nan', 'null', 'none', '']:
+                return 0
+            # Try to clean it up just in case
+            try:
+                # If it's already a clean string number from valid logic
+                return float(val)
+            except:
+                # If it has text (e.g. from raw AI), force 0 or keep text?
+                # User request: "only numbers, if null then 0"
+                # We'll try to strip non-numeric except dot/minus
+                try:
+                    import re
+                    clean = re.sub(r'[^\d\.-]', '', str(val))
+                    return float(clean)
+                except:
+                     return 0
+
+        results.append({
+            "stock_name": stock_info_record["stock_name"],
+            "stock_code": stock_info_record["stock_code"],
+            "dividend_year": div.get('year', ''),
+            "amount_with_unit": fmt_num(div.get('amount_text')),
+            "net_profit": fmt_num(div.get('net_profit')),
+            "operating_cash_flow": fmt_num(div.get('operating_cash_flow')),
+            "raw_context": div.get('raw_text', ''),
+            "filename": stock_info_record["filename"],
+            "is_ai": div.get('is_ai', False),
+            "ai_prompt": div.get('ai_prompt', ''),
+            "ai_response": div.get('ai_response', ''),
+            "ai_cost": div.get('ai_cost', 0.0),
+            "rules_version": rules_stamp
+        })
+        
+    return results
+
+def _process_txt_worker(file_path, log_queue, metadata, api_key=None, cost_limit=0.0, current_cost=0.0, force_ai=False, text_backend=DEFAULT_TEXT_BACKEND, defer_ai=False, budget_run=None):
     """
     Worker function for processing a single TXT file.
-    Returns a tuple: (list_of_dividends, stock_info_dict, cost_incurred)
+    PDF inputs are converted to text on the fly with text_backend (see text_backends).
+    defer_ai: chunks that need AI are returned for the manager's AiDispatcher instead of
+    being sent from this worker.
+    budget_run: the run's AI budget ledger; AI calls made here reserve against it.
+    Returns a tuple: (list_of_dividends, stock_info_dict, cost_incurred, ai_cache_stats, ai_pending)
+    where ai_pending is None or {"dividends", "ai_jobs", "force_ai"} (dividends still to
+    be merged with the AI answers).
     """
     import logging
     
@@ -559,37 +782,34 @@ def _process_txt_worker(file_path, log_queue, metadata, api_key=None, cost_limit
         # Log start of processing for this file
         logger.info(f"开始处理文件: {os.path.basename(file_path)}")
         
-        extractor = TxtExtractor()
+        # Compiled rules and extractor state are reused across the files of this worker
+        extractor = get_txt_extractor()
         
         # Check if file is PDF
         if file_path.lower().endswith('.pdf'):
-            # On-the-fly PDF text extraction
+            # On-the-fly PDF text extraction (served from the text corpus when already extracted)
             try:
-                import pdfplumber
-                content = ""
-                with pdfplumber.open(file_path) as pdf:
-                    # Limit pages to avoid memory issues on huge docs? 
-                    # Or just read all text. Prospectuses are large.
-                    # Let's try reading text from all pages.
-                    for page in pdf.pages:
-                        text = page.extract_text()
-                        if text:
-                            content += text + "\n"
+                from src.text_corpus import document_text
+                content = document_text(file_path, backend=text_backend)
                 
                 if not content:
                     logger.warning(f"PDF 提取失败 (似乎没有文本内容): {os.path.basename(file_path)}")
-                    return [], None, 0.0
+                    return [], None, 0.0, None, None
                     
                 # Use the content for extraction
                 # We need to manually call extract_dividends_enhanced since extract_from_file expects a file path to read
                 use_ai = bool(api_key)
+                cache_before = dict(extractor.ai_cache_stats)
+                ai_jobs = [] if defer_ai else None
                 dividends, cost = extractor.extract_financials_enhanced(
                     content, 
                     use_ai=use_ai, 
                     api_key=api_key,
                     cost_limit=cost_limit,
                     current_cost=current_cost,
-                    force_ai=force_ai
+                    force_ai=force_ai,
+                    ai_jobs=ai_jobs,
+                    budget_run=budget_run
                 )
                 
                 # Construct data dict manually
@@ -601,30 +821,36 @@ def _process_txt_worker(file_path, log_queue, metadata, api_key=None, cost_limit
                     "company_name": company_name,
                     "filename": filename,
                     "dividends": dividends,
-                    "cost": cost
+                    "cost": cost,
+                    "ai_cache": extractor.ai_cache_delta(cache_before),
+                    "ai_jobs": ai_jobs
                 }
                 
             except Exception as e:
                 logger.error(f"PDF 转换错误 {os.path.basename(file_path)}: {e}")
-                return [], None, 0.0
+                return [], None, 0.0, None, None
         else:
             # Normal TXT processing
             # Pass API Key to extractor
-            data = extractor.extract_from_file(
-                file_path, 
+            _, data, elapsed = next(extractor.extract_many(
+                [file_path], 
                 api_key=api_key,
                 cost_limit=cost_limit,
                 current_cost=current_cost,
-                force_ai=force_ai
-            )
+                force_ai=force_ai,
+                defer_ai=defer_ai,
+                budget_run=budget_run
+            ))
+            logger.debug(f"文件解析耗时 {elapsed:.2f}s: {os.path.basename(file_path)}")
         
         if not data:
             logger.warning(f"未提取到任何数据: {os.path.basename(file_path)}")
-            return [], None, 0.0
+            return [], None, 0.0, None, None
             
         full_company_name = data['company_name']
         filename = data['filename']
         cost_incurred = data.get('cost', 0.0)
+        ai_cache_stats = data.get('ai_cache')
         
         # Parse Board from path if possible
         # Expected: .../data/TXT/{Board}/{Year}/Filename.txt
@@ -736,50 +962,20 @@ def _process_txt_worker(file_path, log_queue, metadata, api_key=None, cost_limit
             "filename": filename
         }
 
+        if data.get('ai_jobs'):
+            # AI chunks are answered by the manager's AiDispatcher; rows are built there
+            ai_pending = {"dividends": data['dividends'], "ai_jobs": data['ai_jobs'], "force_ai": force_ai}
+            return [], stock_info_record, cost_incurred, ai_cache_stats, ai_pending
+
         if not data['dividends']:
-            return [], stock_info_record, cost_incurred
-            
-        results = []
-        for div in data['dividends']:
-            # Helper: Format number or 0
-            def fmt_num(val):
-                if val is None or str(val).lower() in ['nan', 'null', 'none', '']:
-                    return 0
-                # Try to clean it up just in case
-                try:
-                    # If it's already a clean string number from valid logic
-                    return float(val)
-                except:
-                    # If it has text (e.g. from raw AI), force 0 or keep text?
-                    # User request: "only numbers, if null then 0"
-                    # We'll try to strip non-numeric except dot/minus
-                    try:
-                        import re
-                        clean = re.sub(r'[^\d\.-]', '', str(val))
-                        return float(clean)
-                    except:
-                         return 0
-
-            results.append({
-                "stock_name": stock_name,
-                "stock_code": stock_code,
-                "dividend_year": div.get('year', ''),
-                "amount_with_unit": fmt_num(div.get('amount_text')),
-                "net_profit": fmt_num(div.get('net_profit')),
-                "operating_cash_flow": fmt_num(div.get('operating_cash_flow')),
-                "raw_context": div.get('raw_text', ''),
-                "filename": filename,
-                "is_ai": div.get('is_ai', False),
-                "ai_prompt": div.get('ai_prompt', ''),
-                "ai_response": div.get('ai_response', ''),
-                "ai_cost": div.get('ai_cost', 0.0)
-            })
+            return [], stock_info_record, cost_incurred, ai_cache_stats, None
             
-        return results, stock_info_record, cost_incurred
+        results = _dividend_rows(data['dividends'], stock_info_record, extractor.rules.stamp)
+        return results, stock_info_record, cost_incurred, ai_cache_stats, None
         
     except Exception as e:
         logger.error(f"处理文件出错 {os.path.basename(file_path)}: {e}")
-        return [], None, 0.0
+        return [], None, 0.0, None, None
 
 # Singleton
 _txt_manager_instance = None
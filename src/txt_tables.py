@@ -0,0 +1,177 @@
+import re
+import bisect
+import unicodedata
+
+# Number cell: 12,345.67 / -1,234 / (1,234.00) / 0.5; not part of a longer number or date
+NUM_CELL = re.compile(r'(?<![\d.,/])[-－]?[（(]?-?\d{1,3}(?:,\d{3})+(?:\.\d+)?[)）]?(?![\d,])'
+                      r'|(?<![\d.,/])[-－]?[（(]?-?\d+(?:\.\d+)?[)）]?(?![\d,])')
+UNIT_MARK = re.compile(r'单位\s*[：:]\s*(?:人民币)?\s*(亿元|万元|千元|元)')
+# Unit given in the row label itself, e.g. 净利润（元）
+ROW_UNIT_MARK = re.compile(r'[（(](亿元|万元|千元|元)[)）]')
+# Lines inspected above a header for the table's 单位 caption
+UNIT_LOOKBACK_CHARS = 300
+# Characters of label text (besides the years) a header line may carry, e.g. 项目 / 科目
+HEADER_MAX_LABEL_CHARS = 12
+
+
+def _display_col(line, idx):
+    """Column of line[idx] in a monospaced rendering (CJK characters are two columns wide)."""
+    return idx + sum(1 for ch in line[:idx] if unicodedata.east_asian_width(ch) in ('W', 'F'))
+
+
+class TxtTableDetector:
+    """
+    Rebuilds whitespace-aligned financial summary tables in TXT conversions:
+
+        单位：万元
+        项目                          2021年度      2020年度      2019年度
+        归属于母公司所有者的净利润    12,345.67     11,000.00      9,000.00
+
+    Header rows (two or more distinct years and little else) are found from one pass of
+    the year pattern over the text; the rows below a header are read until the table
+    ends, and each row whose label names a known field has its numbers mapped onto the
+    header's year columns (in order when the counts match, otherwise by display column).
+    Labels wrapped onto the previous line are joined. Returns one record per year.
+    """
+    def __init__(self, row_labels, year_regex, max_rows=60):
+        self.row_labels = [(field, re.compile(pattern)) for field, pattern in row_labels.items()]
+        self.year_token = re.compile(
+            rf'(?<![\d.,])({year_regex})'
+            rf'(年\d{{1,2}}\s*-\s*\d{{1,2}}月|年度|年末|年\d{{1,2}}月\d{{1,2}}日|年|[./-]\d{{1,2}}[./-]\d{{1,2}}|(?=[\s/]|$))'
+        )
+        self.max_rows = max_rows
+
+    def tables(self, text, normalize):
+        """
+        [(start, end, records)] for every table in text; normalize(value, unit) converts
+        a cell value to the output unit.
+        """
+        found = []
+        line_start, line_years = -1, []
+        resume = 0
+        for m in self.year_token.finditer(text):
+            start = text.rfind('\n', 0, m.start()) + 1
+            if start != line_start:
+                line_start, line_years = start, []
+            line_years.append(m)
+            if len(line_years) == 2 and start >= resume:
+                table = self._read_table(text, start, normalize)
+                if table:
+                    found.append(table)
+                    resume = table[1]
+        return found
+
+    def _header(self, line):
+        """
+        [(char_offset, year)] of the column centres when line is a header row, else None. Interim columns
+        (2022年1-6月) keep their place with year None so their cells are skipped.
+        """
+        columns, seen = [], set()
+        rest = line
+        for m in self.year_token.finditer(line):
+            rest = rest.replace(m.group(0), ' ', 1)
+            year = None if '月' in m.group(2) and '-' in m.group(2) else m.group(1)
+            if year is None or year not in seen:
+                seen.add(year)
+                columns.append(((m.start() + m.end()) // 2, year))
+        rest = rest.replace('/', ' ')
+        if len(seen - {None}) < 2 or re.search(r'\d', rest) or len(rest.strip()) > HEADER_MAX_LABEL_CHARS:
+            return None
+        return columns
+
+    def _read_table(self, text, start, normalize):
+        end = text.find('\n', start)
+        end = len(text) if end < 0 else end
+        header_line = text[start:end]
+        header = self._header(header_line)
+        if not header:
+            return None
+        caption = UNIT_MARK.search(text, max(0, start - UNIT_LOOKBACK_CHARS), end)
+        unit = caption.group(1) if caption and '\n\n' not in text[caption.end():start] else '万元'
+
+        records = {}
+        pos, carry, misses = end + 1, '', 0
+        for _ in range(self.max_rows):
+            if pos >= len(text):
+                break
+            line_end = text.find('\n', pos)
+            line_end = len(text) if line_end < 0 else line_end
+            line = text[pos:line_end]
+            if self._header(line):
+                break
+            stripped = line.strip()
+            values = self._values(line)
+            if not values:
+                if stripped:
+                    misses += 1
+                    if misses > 2:
+                        break
+                    carry = stripped if len(stripped) < 30 else ''
+                pos = line_end + 1
+                continue
+            misses = 0
+            label = (carry + line[:values[0].start()].strip()) if carry else line[:values[0].start()].strip()
+            carry = ''
+            field = self._field(label)
+            if field:
+                row_unit = ROW_UNIT_MARK.search(label)
+                for year, raw in self._assign(line, header_line, header, values):
+                    if year is None:
+                        continue
+                    value = self._number(raw, row_unit.group(1) if row_unit else unit)
+                    if value is not None:
+                        records.setdefault(year, {'year': year}).setdefault(field, normalize(*value))
+            end = line_end
+            pos = line_end + 1
+        if not records:
+            return None
+        return start, end, list(records.values())
+
+    def _values(self, line):
+        """Number cells after the row label (the label ends at its last non-numeric character)."""
+        if '%' in line:
+            return []
+        label_end = 0
+        for i in range(len(line) - 1, -1, -1):
+            ch = line[i]
+            if ch.isalpha():
+                label_end = i + 1
+                break
+        return [m for m in NUM_CELL.finditer(line, label_end)]
+
+    def _field(self, label):
+        for field, pattern in self.row_labels:
+            if pattern.search(label):
+                return field
+        return None
+
+    @staticmethod
+    def _assign(line, header_line, header, values):
+        years = [y for _, y in header]
+        if len(values) == len(header):
+            return list(zip(years, (v.group(0) for v in values)))
+        # Missing or extra cells: match by display column
+        cols = [_display_col(header_line, c) for c, _ in header]
+        pairs, used = [], set()
+        for v in values:
+            mid = _display_col(line, (v.start() + v.end()) // 2)
+            k = bisect.bisect_left(cols, mid)
+            nearest = min((i for i in (k - 1, k) if 0 <= i < len(cols)), key=lambda i: abs(cols[i] - mid))
+            if nearest not in used:
+                used.add(nearest)
+                pairs.append((years[nearest], v.group(0)))
+        return pairs
+
+    @staticmethod
+    def _number(raw, unit):
+        s = raw.replace(',', '').replace('－', '-').replace('（', '(').replace('）', ')')
+        negative = s.startswith('-') or s.startswith('(')
+        s = s.strip('-()')
+        try:
+            value = float(s)
+        except ValueError:
+            return None
+        if unit == '千元':
+            value, unit = value * 1000, '元'
+        value = -value if negative else value
+        return f"{value:.6f}".rstrip('0').rstrip('.'), unit
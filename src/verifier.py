@@ -5,12 +5,14 @@ import re
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from src.config import OUTPUT_DIR, PDF_DIR
 from src.extractor import ProspectusExtractor
+from src.keyword_scanner import get_scanner
 
 logger = logging.getLogger(__name__)
 
 def _backfill_worker(pdf_file, indices_info):
     """
     Worker function to re-extract data from a single PDF.
+    Page text is served from the shared text corpus, so backfills do not re-parse PDFs.
     indices_info: list of {'index': idx, 'year': year, 'amount': amount}
     """
     try:
@@ -70,6 +72,8 @@ class DataVerifier:
         self.positive_keywords = [
             '已实施', '派发', '现金分红金额', '实际', '报告期内', '分派'
         ]
+        self.policy_keywords = ['分配政策', '利润分配规划', '分红回报规划']
+        self.scanner = get_scanner(self.negative_keywords + self.positive_keywords + self.policy_keywords + ['每10股'])
         # self.extractor = None # Lazy init not needed for multiprocessing
 
     def verify_all(self, summary_file=None, concurrency=4):
@@ -176,11 +180,14 @@ class DataVerifier:
         if amount == 0:
             return {'verify_status': 'Skip', 'verify_note': '金额为0'}
 
+        # 单次扫描原文，得到出现的全部关键词
+        found = self.scanner.found(context)
+
         # 1. 检查否定关键词
-        found_negatives = [kw for kw in self.negative_keywords if kw in context]
+        found_negatives = [kw for kw in self.negative_keywords if kw in found]
         
         # 2. 特殊逻辑：如果是“政策”或“规划”章节，极大概率是误报
-        is_policy = any(kw in context for kw in ['分配政策', '利润分配规划', '分红回报规划'])
+        is_policy = any(kw in found for kw in self.policy_keywords)
         
         # 3. 检查年份匹配
         # context might be long, check if year is present
@@ -205,7 +212,7 @@ class DataVerifier:
             
         # 排除掉一些误报，比如“每10股派1.0元”，虽然有金额，但不是总额
         # But be careful, sometimes context is just the table row which might not say "total"
-        if '每10股' in context and amount < 50: # 假设总分红通常大于50万
+        if '每10股' in found and amount < 50: # 假设总分红通常大于50万
              status = 'Suspect'
              notes.append("可能提取的是每股分红而非总额")
 
@@ -66,27 +66,58 @@ async def verify_data():
     return {"status": "verification_started"}
 
 @app.post("/api/config")
-async def update_config(download_concurrency: int = None, extract_concurrency: int = None):
-    get_task_manager().set_concurrency(download=download_concurrency, extract=extract_concurrency)
+async def update_config(download_concurrency: int = None, extract_concurrency: int = None, ocr_concurrency: int = None, rss_budget_mb: int = None, text_backend: str = None,
+                        early_exit: bool = None):
+    get_task_manager().set_concurrency(download=download_concurrency, extract=extract_concurrency, ocr=ocr_concurrency)
+    if rss_budget_mb is not None:
+        # 0 switches memory-bounded extraction off
+        get_task_manager().set_memory_budget(rss_budget_mb)
+    if text_backend is not None:
+        try:
+            get_task_manager().set_text_backend(text_backend)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+    if early_exit is not None:
+        get_task_manager().set_early_exit(early_exit)
     return {
         "status": "updated", 
         "download_concurrency": get_task_manager().status.get("download_concurrency"),
-        "extract_concurrency": get_task_manager().status.get("extract_concurrency")
+        "extract_concurrency": get_task_manager().status.get("extract_concurrency"),
+        "ocr_concurrency": get_task_manager().status.get("ocr_concurrency"),
+        "worker_rss_budget_mb": get_task_manager().status.get("worker_rss_budget_mb"),
+        "text_backend": get_task_manager().status.get("text_backend"),
+        "early_exit": get_task_manager().status.get("early_exit")
     }
 
 @app.post("/api/txt/config")
-async def update_txt_config(concurrency: int = None, cost_limit: float = None, force_ai: bool = None):
+async def update_txt_config(concurrency: int = None, cost_limit: float = None, force_ai: bool = None, text_backend: str = None,
+                            ai_concurrency: int = None, ai_rate_limit: float = None, ai_pack_tokens: int = None):
     if concurrency:
         get_txt_manager().set_concurrency(concurrency)
     if cost_limit is not None:
         get_txt_manager().set_cost_limit(cost_limit)
     if force_ai is not None:
         get_txt_manager().set_force_ai(force_ai)
+    if ai_concurrency:
+        get_txt_manager().set_ai_concurrency(ai_concurrency)
+    if ai_rate_limit:
+        get_txt_manager().set_ai_rate_limit(ai_rate_limit)
+    if ai_pack_tokens is not None:
+        get_txt_manager().set_ai_pack_tokens(ai_pack_tokens)
+    if text_backend is not None:
+        try:
+            get_txt_manager().set_text_backend(text_backend)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
     return {
         "status": "updated",
         "concurrency": get_txt_manager().status.get("concurrency"),
         "ai_cost_limit": get_txt_manager().status.get("ai_cost_limit"),
-        "force_ai": get_txt_manager().status.get("force_ai")
+        "force_ai": get_txt_manager().status.get("force_ai"),
+        "text_backend": get_txt_manager().status.get("text_backend"),
+        "ai_concurrency": get_txt_manager().status.get("ai_concurrency"),
+        "ai_rate_limit": get_txt_manager().status.get("ai_rate_limit"),
+        "ai_pack_tokens": get_txt_manager().status.get("ai_pack_tokens")
     }
 
 @app.websocket("/ws/logs")
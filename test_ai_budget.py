@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from src.ai_budget import AiBudgetLedger, open_budget_run
+
+# Binary-exact amounts, so the limit admits an exact number of reservations
+LIMIT = 10.0
+AMOUNT = 0.25
+
+
+def reserve_many(db_path, run_id, n):
+    ledger = AiBudgetLedger(run_id, db_path)
+    return sum(ledger.reserve(AMOUNT) for _ in range(n))
+
+
+def test_reserve_and_settle(tmp_path):
+    db_path = str(tmp_path / "ai_budget.sqlite")
+    ledger = AiBudgetLedger(open_budget_run(1.0, spent=0.25, db_path=db_path), db_path)
+
+    assert ledger.reserve(0.5)
+    assert not ledger.reserve(0.5)
+    assert ledger.snapshot() == {"limit": 1.0, "spent": 0.25, "reserved": 0.5}
+    # The actual cost replaces the reservation
+    ledger.settle(0.5, 0.125)
+    assert ledger.snapshot() == {"limit": 1.0, "spent": 0.375, "reserved": 0.0}
+    # Forced calls settle without a reservation
+    ledger.settle(0, 0.5)
+    assert ledger.snapshot()["spent"] == 0.875
+    assert not ledger.reserve(0.25)
+    ledger.set_limit(2.0)
+    assert ledger.reserve(0.25)
+    # Runs don't share a ledger
+    assert AiBudgetLedger("missing", db_path).snapshot() == {"limit": 0.0, "spent": 0.0, "reserved": 0.0}
+    assert not AiBudgetLedger("missing", db_path).reserve(0.25)
+
+
+def test_concurrent_threads_never_exceed_limit(tmp_path):
+    db_path = str(tmp_path / "ai_budget.sqlite")
+    run_id = open_budget_run(LIMIT, db_path=db_path)
+    start = threading.Barrier(8)
+    granted = []
+
+    def worker():
+        ledger = AiBudgetLedger(run_id, db_path)
+        start.wait()
+        granted.append(sum(ledger.reserve(AMOUNT) for _ in range(20)))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(granted) == LIMIT / AMOUNT
+    assert AiBudgetLedger(run_id, db_path).snapshot() == {"limit": LIMIT, "spent": 0.0, "reserved": LIMIT}
+
+
+def test_concurrent_processes_never_exceed_limit(tmp_path):
+    db_path = str(tmp_path / "ai_budget.sqlite")
+    run_id = open_budget_run(LIMIT, db_path=db_path)
+
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        granted = list(pool.map(reserve_many, [db_path] * 4, [run_id] * 4, [20] * 4))
+
+    assert sum(granted) == LIMIT / AMOUNT
+    ledger = AiBudgetLedger(run_id, db_path)
+    # Settling every grant for less than reserved frees the difference for later calls
+    for _ in range(sum(granted)):
+        ledger.settle(AMOUNT, AMOUNT / 2)
+    assert ledger.snapshot() == {"limit": LIMIT, "spent": LIMIT / 2, "reserved": 0.0}
+    assert reserve_many(db_path, run_id, 100) == LIMIT / 2 / AMOUNT
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from src import ai_cache
+from src.ai_cache import cache_key
+from src.txt_extractor import TxtExtractor, AI_MODEL
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, items):
+        self.items = items
+
+    def json(self):
+        return {"choices": [{"message": {"content": json.dumps(self.items)}}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 10}}
+
+
+@pytest.fixture
+def scratch_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ai_cache, "AI_CACHE_DB", str(tmp_path / "ai_responses.sqlite"))
+
+
+def test_cache_key_covers_model_version_and_text():
+    key = cache_key(AI_MODEL, "4", "2021年度现金分红3000万元")
+
+    assert key == cache_key(AI_MODEL, "4", "2021年度现金分红3000万元")
+    assert key != cache_key("other-model", "4", "2021年度现金分红3000万元")
+    assert key != cache_key(AI_MODEL, "5", "2021年度现金分红3000万元")
+    assert key != cache_key(AI_MODEL, "4", "2021年度现金分红3001万元")
+    # Parts are separated, so moving a character across a boundary changes the key
+    assert cache_key("ab", "c", "x") != cache_key("a", "bc", "x")
+
+
+def test_answer_is_cached_per_prompt_layout(scratch_cache):
+    text = "公司2021年度派发现金红利3,000.00万元。"
+    extractor = TxtExtractor()
+    assert extractor.ai_cached(text) is None
+
+    prompt = extractor._ai_prompt(text)
+    results, cost, _, _ = extractor.ai_parse_response(text, prompt, FakeResponse([{"year": "2021", "amount": "3000"}]))
+    assert results and cost > 0
+
+    cached = extractor.ai_cached(text)
+    assert cached is not None
+    assert cached[0][0]["year"] == "2021"
+    assert extractor.ai_cache_stats["hits"] == 1
+    # Answers to the packed or uncompacted prompts are different requests
+    assert extractor.ai_cached(text, packed=True) is None
+    extractor.compact_prompts = False
+    assert extractor.ai_cached(text) is None
@@ -0,0 +1,167 @@
+import pytest
+
+from src import ai_client
+from src.ai_client import AiClient, CircuitBreaker, SharedBreakerState
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping just moves the clock."""
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content='[{"year": "2021"}]', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def json(self):
+        return {"choices": [{"message": {"content": self.content}}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 10}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ai_client, "time", clock)
+    return clock
+
+
+def trip(breaker, n=4):
+    for _ in range(n):
+        breaker.record(False)
+
+
+def test_breaker_opens_probes_once_and_closes(clock):
+    breaker = CircuitBreaker(window=4, min_calls=4, error_rate=0.5, cooldown=30)
+    breaker.record(True)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.allow() and not breaker.is_open()
+    breaker.record(False)
+    assert breaker.is_open() and breaker.trips == 1
+    assert not breaker.allow()
+
+    # Half-open: one probe, the others still wait
+    clock.sleep(30)
+    assert breaker.allow()
+    assert not breaker.allow()
+    # A failed probe re-opens for another cooldown
+    breaker.record(False)
+    assert breaker.trips == 2
+    clock.sleep(29)
+    assert not breaker.allow()
+    clock.sleep(1)
+    assert breaker.allow()
+    breaker.record(True)
+    assert not breaker.is_open()
+    assert breaker.allow() and breaker.allow()
+
+
+def test_late_answers_dont_count_while_open(clock):
+    breaker = CircuitBreaker(window=4, min_calls=4, error_rate=0.5, cooldown=30)
+    trip(breaker)
+    # Calls that were in flight when the breaker tripped report back
+    trip(breaker)
+    assert breaker.trips == 1
+    clock.sleep(30)
+    assert breaker.allow()
+    breaker.record(True)
+    # The window starts afresh after closing
+    trip(breaker, 3)
+    assert not breaker.is_open()
+
+
+def test_probe_that_raises_does_not_wedge_the_breaker(clock):
+    client = AiClient(breaker=CircuitBreaker(window=4, min_calls=4, error_rate=0.5, cooldown=30))
+    trip(client.breaker)
+    clock.sleep(30)
+
+    def post(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    client.session.post = post
+    with pytest.raises(RuntimeError):
+        client.send("http://ai", {}, {})
+    assert client.breaker.is_open() and client.breaker.trips == 2
+    clock.sleep(30)
+    assert client.breaker.allow()
+
+
+def test_client_retries_then_skips_while_open(clock):
+    malformed = FakeResponse(content="not json")
+    answers = [FakeResponse(503, headers={"Retry-After": "5"}), malformed, FakeResponse()]
+    calls = []
+
+    def post(url, headers=None, json=None, timeout=None):
+        calls.append(timeout)
+        return answers.pop(0)
+
+    client = AiClient(max_retries=2, breaker=CircuitBreaker(window=4, min_calls=4, error_rate=0.5, cooldown=30))
+    client.session.post = post
+    start = clock.now
+    response, error, discarded = client.send("http://ai", {}, {})
+
+    assert response.status_code == 200 and error is None
+    assert discarded == [malformed.json()["usage"]]
+    assert clock.now - start >= 5  # Retry-After honoured
+    assert {k: client.stats[k] for k in ("attempts", "retries", "malformed", "failures")} == \
+        {"attempts": 3, "retries": 2, "malformed": 1, "failures": 0}
+
+    trip(client.breaker)
+    response, error, _ = client.send("http://ai", {}, {}, n_chunks=3)
+    assert response is None and error.startswith("Circuit open")
+    assert client.stats["skipped_breaker"] == 3 and len(calls) == 3
+
+
+def test_client_stops_at_deadline(clock):
+    client = AiClient(max_retries=5, backoff_base=4, backoff_max=4, deadline=10,
+                      breaker=CircuitBreaker(window=20, min_calls=20))
+    client.session.post = lambda *args, **kwargs: FakeResponse(503, headers={"Retry-After": "4"})
+
+    response, error, _ = client.send("http://ai", {}, {})
+    assert response.status_code == 503
+    assert client.stats["attempts"] == 3 and client.stats["deadline_exceeded"] == 1
+    assert client.stats["failures"] == 1
+
+
+def test_breaker_state_is_shared_by_a_run(clock, tmp_path, monkeypatch):
+    db_path = str(tmp_path / "ai_budget.sqlite")
+    states = {}
+    monkeypatch.setattr(ai_client, "get_breaker_state",
+                        lambda run_id: states.setdefault(run_id, SharedBreakerState(run_id, db_path)))
+    # Breakers of two processes of one run, and one of another run
+    first, second = (CircuitBreaker(window=4, min_calls=4, cooldown=30, run_id="run") for _ in range(2))
+    other = CircuitBreaker(window=4, min_calls=4, cooldown=30, run_id="other")
+
+    trip(first)
+    assert not second.allow() and second.is_open()
+    assert other.allow()
+
+    clock.sleep(30)
+    assert first.allow()
+    assert not second.allow()  # only one probe per run
+    first.record(True)
+    assert second.allow() and not second.is_open()
+
+
+def test_abandoned_probe_lease_expires(clock, tmp_path):
+    state = SharedBreakerState("run", str(tmp_path / "ai_budget.sqlite"))
+    state.trip(30)
+    clock.sleep(30)
+    assert state.claim_probe(60)
+    assert not state.claim_probe(60)
+    clock.sleep(60)
+    assert state.claim_probe(60)
+    state.close()
+    assert state.open_until() == 0
@@ -0,0 +1,76 @@
+import re
+import json
+
+import pytest
+
+from src import ai_cache
+from src.ai_dispatcher import AiDispatcher
+from src.txt_extractor import pack_ai_jobs, estimate_tokens
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, items):
+        self.items = items
+
+    def json(self):
+        return {"choices": [{"message": {"content": json.dumps(self.items)}}],
+                "usage": {"prompt_tokens": 300, "completion_tokens": 30}}
+
+
+@pytest.fixture
+def scratch_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ai_cache, "AI_CACHE_DB", str(tmp_path / "ai_responses.sqlite"))
+
+
+def job(i, text):
+    return {"text": text, "regex_results": [], "chunk_span": (i * 100, i * 100 + 50), "value": 1}
+
+
+def test_pack_ai_jobs_respects_token_budget():
+    jobs = [job(i, "利润分配" * 20) for i in range(5)]
+    per_chunk = estimate_tokens(jobs[0]["text"])
+
+    groups = pack_ai_jobs(jobs, token_budget=10 + per_chunk * 2, overhead_tokens=10)
+    assert [len(g) for g in groups] == [2, 2, 1]
+    assert [j for g in groups for j in g] == jobs
+    # A chunk larger than the budget still gets a group of its own
+    assert [len(g) for g in pack_ai_jobs(jobs[:2], token_budget=1)] == [1, 1]
+
+
+def test_packed_answers_map_back_by_chunk_id(scratch_cache):
+    texts = ["甲：2021年度派发现金红利3,000.00万元。", "乙：2020年度派发现金红利2,500.00万元。", "丙：无分红。"]
+    sent = []
+
+    def send(url, headers, body, n_chunks=1):
+        prompt = body["messages"][0]["content"]
+        sent.append((prompt, n_chunks))
+        ids = {line.split("] ", 1)[1]: line[1:line.index("]")]
+               for line in prompt.splitlines() if re.match(r"\[C\d+\] ", line)}
+        # Out of prompt order, plus one record with an unknown chunk ID
+        return FakeResponse([
+            {"chunk_id": ids[texts[1]], "year": "2020", "amount": "2500"},
+            {"chunk_id": ids[texts[0]], "year": "2021", "amount": "3000"},
+            {"chunk_id": "C9", "year": "2019", "amount": "1"},
+        ]), None, []
+
+    dispatcher = AiDispatcher("key", concurrency=1, rate_limit=100, pack_tokens=4000)
+    dispatcher.client.send = send
+    try:
+        records, cost, _, packing = dispatcher.submit([job(i, t) for i, t in enumerate(texts)]).result(timeout=10)
+    finally:
+        dispatcher.close()
+
+    assert len(sent) == 1 and sent[0][1] == 3
+    assert sorted(re.findall(r"^\[(C\d+)\] ", sent[0][0], re.M)) == ["C1", "C2", "C3"]
+    assert packing["requests"] == 1 and packing["chunks"] == 3
+    by_text = {r["raw_text"]: r for r in records if r.get("is_ai")}
+    assert by_text[texts[0]]["year"] == "2021" and by_text[texts[0]]["chunk_span"] == (0, 50)
+    assert by_text[texts[1]]["year"] == "2020" and by_text[texts[1]]["chunk_span"] == (100, 150)
+    assert texts[2] not in by_text
+    assert all(r["year"] != "2019" for r in records)
+    assert cost > 0
+
+    # Each chunk's answer is cached on its own
+    assert dispatcher.extractor.ai_cached(texts[1], packed=True)[0][0]["amount"] == "2500"
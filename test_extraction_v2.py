@@ -1,4 +1,5 @@
 from src.txt_extractor import TxtExtractor
+from src.extraction_rules import get_rules
 import json
 
 def test_full_extraction():
@@ -19,5 +20,38 @@ def test_full_extraction():
     # To test AI logic without key, we can inspect if it tries to call headers if we provide a fake key
     # But for now, ensuring Regex works for the new fields is good enough sanity check.
     
+def test_compaction_keeps_wrapped_table_cells():
+    # Wrapped table: every header year and cell value on its own line; page footers around it
+    text = "\n".join([
+        "12",
+        "单位：万元",
+        "项目", "2021", "2020", "2019",
+        "现金分红金额", "350", "280", "1,500.00",
+        "1-1-35",
+        "36",
+    ]) + "\f" + "\n".join(["37", "公司2021年度派发现金红利350万元。", "38"])
+    compacted = get_rules().txt_prompt_compactor.compact(text)
+    lines = compacted.splitlines()
+
+    for cell in ("2021", "2020", "2019", "350", "280", "1,500.00"):
+        assert cell in lines
+    # Footers at page/chunk edges and prospectus page numbers are dropped
+    for footer in ("12", "36", "37", "38", "1-1-35"):
+        assert footer not in lines
+    assert lines.index("2021") < lines.index("2020") < lines.index("2019") < lines.index("350")
+
+def test_compaction_keeps_unit_caption():
+    # A 元-denominated table: the caption is the only thing telling the AI to divide by 10000
+    text = "\n".join([
+        "合并利润表",
+        "单位：元",
+        "项目 2021年度 2020年度",
+        "归属于母公司所有者的净利润 123,456,789.00 98,765,432.10",
+    ])
+    lines = get_rules().txt_prompt_compactor.compact(text).splitlines()
+
+    assert "单位：元" in lines
+    assert lines.index("单位：元") < lines.index("归属于母公司所有者的净利润 123,456,789.00 98,765,432.10")
+
 if __name__ == "__main__":
     test_full_extraction()